@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import itertools
+import contextlib
+import importlib.util
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+SUBTITLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 允许导入 subtitle/core 下的模块
+sys.path.append(SUBTITLE_DIR)
+
+import synth
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "cpu_baseline.json")
+CJK_CHARS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日"
+# 10 KB 级别的畸形模型输出：前置废话、缺少引号转义、尾逗号、末尾截断
+MALFORMED_PREFIX = "Sure! Here is the polished result you asked for:\n"
+
+
+class Case:
+    """一个微基准用例：prepare() 返回被测函数；before_each 在每次计时前执行 (不计时)"""
+    def __init__(self, name: str, prepare: Callable[[], Callable], repeat: int = 5,
+                 before_each: Optional[Callable] = None, extreme: bool = False):
+        self.name = name
+        self.prepare = prepare
+        self.repeat = repeat
+        self.before_each = before_each
+        self.extreme = extreme
+
+
+def measure(case: Case) -> Dict:
+    fn = case.prepare()
+    times = []
+    # 第一轮为预热，不计入结果
+    for round_idx in range(case.repeat + 1):
+        if case.before_each:
+            case.before_each()
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - started
+        if round_idx:
+            times.append(elapsed)
+    return {"min_s": min(times), "median_s": statistics.median(times), "repeat": case.repeat}
+
+
+def make_terms(count: int, seed: int = 7) -> Dict[str, str]:
+    """合成术语表：1~3 个词的英文短语 -> 2~4 个汉字"""
+    rng = random.Random(seed)
+    terms = {}
+    while len(terms) < count:
+        words = rng.choices(synth.VOCAB, k=rng.randint(1, 3))
+        source = " ".join(w.capitalize() for w in words)
+        terms[source] = "".join(rng.choice(CJK_CHARS) for _ in range(rng.randint(2, 4)))
+    return terms
+
+
+def make_malformed_response(size_bytes: int, seed: int = 3) -> str:
+    rng = random.Random(seed)
+    items, length, idx = [], 0, 1
+    while length < size_bytes:
+        text = synth.make_dialogue_line(rng).replace("a", 'a"', 1)
+        item = f'{{"id": {idx}, "polished": "{text}",}}'
+        items.append(item)
+        length += len(item)
+        idx += 1
+    body = "[\n" + ",\n".join(items)
+    return MALFORMED_PREFIX + body[:-7]
+
+
+def build_cases(workdir: str) -> List[Case]:
+    from core.srt_utils import parse_srt
+    from core.translation_pipeline import filter_relevant_glossary
+    from core.glossary_manager import GlossaryManager
+    from core.llm_client import clean_and_extract_json
+    from core.subtitle_io import SubtitleBlock
+    from core.checkpoint_journal import CheckpointJournal
+    from translate_srt_llm import save_checkpoint, assemble_output
+
+    spec = importlib.util.spec_from_file_location("ass_tool", os.path.join(SUBTITLE_DIR, "post-process", "02-post_process_ass.py"))
+    ass_tool = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ass_tool)
+    ass_head = os.path.join(SUBTITLE_DIR, "post-process", "asshead.txt")
+
+    cases: List[Case] = []
+    files: Dict[int, str] = {}
+
+    def srt_file(count: int) -> str:
+        if count not in files:
+            path = os.path.join(workdir, f"source_{count}.srt")
+            synth.write_srt(path, synth.generate_blocks(count, seed=count))
+            files[count] = path
+        return files[count]
+
+    def bilingual_file(count: int) -> str:
+        path = os.path.join(workdir, f"bilingual_{count}.srt")
+        if not os.path.exists(path):
+            rng = random.Random(count)
+            with open(path, 'w', encoding='utf-8') as f:
+                for b in synth.generate_blocks(count, seed=count):
+                    zh = "".join(rng.choice(CJK_CHARS) for _ in range(rng.randint(4, 18)))
+                    f.write(f"{b['index']}\n00:00:01,000 --> 00:00:02,000\n{b['content']}\n{zh}\n\n")
+        return path
+
+    def glossary_manager_for(count: int) -> GlossaryManager:
+        gdir = os.path.join(workdir, f"glossary_{count}")
+        os.makedirs(gdir, exist_ok=True)
+        with open(os.path.join(gdir, "terms.json"), 'w', encoding='utf-8') as f:
+            json.dump([{"source_term": s, "target_term": t, "category": "General"} for s, t in make_terms(count).items()],
+                      f, ensure_ascii=False)
+        gm = GlossaryManager()
+        gm.glossary_dir = Path(gdir)
+        gm.db_path = os.path.join(workdir, f"glossary_{count}.db")
+        gm.automaton_cache_dir = workdir
+        gm.enable_discovery = False
+        return gm
+
+    # --- parse_srt ---
+    for count, extreme in ((1000, False), (50000, True)):
+        cases.append(Case(f"parse_srt[{count}]", lambda c=count: (lambda p=srt_file(c): parse_srt(p)),
+                          repeat=3 if extreme else 10, extreme=extreme))
+
+    # --- filter_relevant_glossary：单个批次的文本 vs 术语表 ---
+    batch_text = " ".join(b['content'] for b in synth.generate_blocks(8, seed=1))
+    for count, extreme in ((2000, False), (100000, True)):
+        cases.append(Case(f"filter_relevant_glossary[batch,{count}]",
+                          lambda c=count: (lambda g=make_terms(c): filter_relevant_glossary(batch_text, g)),
+                          repeat=5 if extreme else 20, extreme=extreme))
+
+    # --- GlossaryManager.initialize (语料库已建好时的常规启动) 与 extract_terms ---
+    for count, blocks, extreme in ((2000, 1000, False), (100000, 50000, True)):
+        def prepare_init(c=count):
+            gm = glossary_manager_for(c)
+            with contextlib.redirect_stdout(io.StringIO()):
+                gm.initialize()
+
+            def run():
+                # 丢弃内存中的索引，测量新进程启动时的加载耗时
+                gm._indexes.clear()
+                gm.initialize()
+            return run
+        cases.append(Case(f"GlossaryManager.initialize[{count}]", prepare_init, repeat=3, extreme=extreme))
+
+        def prepare_switch(c=count):
+            # 批量模式下任务方向交替：两个方向的索引都已加载后，切换方向不再重新加载
+            gm = glossary_manager_for(c)
+            with contextlib.redirect_stdout(io.StringIO()):
+                gm.initialize(reverse=False)
+                gm.initialize(reverse=True)
+            directions = itertools.cycle((False, True))
+            return lambda: gm.initialize(reverse=next(directions))
+        cases.append(Case(f"GlossaryManager.initialize[{count},switch]", prepare_switch, repeat=5, extreme=extreme))
+
+        def prepare_extract(c=count, n=blocks):
+            gm = glossary_manager_for(c)
+            with contextlib.redirect_stdout(io.StringIO()):
+                gm.initialize()
+            text = "\n".join(b['content'] for b in synth.generate_blocks(n, seed=n))
+            return lambda: gm.extract_terms(text)
+        cases.append(Case(f"GlossaryManager.extract_terms[{count},{blocks}]", prepare_extract, repeat=3, extreme=extreme))
+
+    # --- GlossaryManager.save_terms：每次保存一个请求量级的新发现词条，主库与发现库各含 count 条 ---
+    for count, extreme in ((2000, False), (100000, True)):
+        def prepare_save(c=count):
+            gm = glossary_manager_for(c)
+            with contextlib.redirect_stdout(io.StringIO()):
+                gm.initialize()
+            gm.enable_discovery = True
+            discovery_db_path = gm.discovery_db_paths[False] = os.path.join(workdir, f"discovery_{c}.db")
+            if os.path.exists(discovery_db_path):
+                os.remove(discovery_db_path)
+            gm._init_db(discovery_db_path, discovery=True)
+            gm.save_terms({f"Discovered {s}": t for s, t in make_terms(c).items()})
+            rounds = iter(range(10 ** 9))
+            return lambda: gm.save_terms({f"New {next(rounds)} {i}": f"新词{i}" for i in range(50)})
+        cases.append(Case(f"GlossaryManager.save_terms[50,{count}]", prepare_save, repeat=5, extreme=extreme))
+
+    # --- clean_and_extract_json ---
+    valid = "```json\n" + json.dumps([{"id": i, "polished": f"润色后的第 {i} 句台词。"} for i in range(1, 9)], ensure_ascii=False) + "\n```"
+    cases.append(Case("clean_and_extract_json[valid,8]", lambda: (lambda: clean_and_extract_json(valid)), repeat=50))
+    malformed = make_malformed_response(10 * 1024)
+    cases.append(Case("clean_and_extract_json[malformed,10KB]", lambda: (lambda: clean_and_extract_json(malformed)),
+                      repeat=5, extreme=True))
+
+    # --- save_checkpoint：已完成 N 块后，向断点日志提交一个 8 块的批次 ---
+    for processed, extreme in ((1000, False), (50000, True)):
+        journal_path = os.path.join(workdir, f"checkpoint_{processed}.jsonl")
+        batch = [SubtitleBlock(processed + i, 1000, 2000, f"Line {i}", translation=f"第 {i} 句") for i in range(1, 9)]
+
+        def reset(jp=journal_path, n=processed):
+            journal = CheckpointJournal(jp)
+            journal.reset({i: f"第 {i} 句" for i in range(1, n + 1)})
+            return journal
+        state = {}
+
+        def before(r=reset, st=state):
+            if "journal" in st:
+                st["journal"].close()
+            st["journal"] = r()
+        cases.append(Case(f"save_checkpoint[{processed} done]",
+                          lambda b=batch, st=state: (lambda: save_checkpoint(st["journal"], b)),
+                          repeat=10, before_each=before, extreme=extreme))
+
+    # --- assemble_output：全部完成后按原文顺序一次性组装双语 SRT ---
+    for count, extreme in ((1000, False), (50000, True)):
+        def prepare_assemble(c=count):
+            blocks = parse_srt(srt_file(c))
+            translations = {b.id: f"第 {b.id} 句" for b in blocks}
+            out_path = os.path.join(workdir, f"assembled_{c}.srt")
+            return lambda: assemble_output(out_path, blocks, translations, bilingual_output=True)
+        cases.append(Case(f"assemble_output[{count}]", prepare_assemble, repeat=3 if extreme else 10, extreme=extreme))
+
+    # --- srt_to_ass ---
+    for count, extreme in ((1000, False), (50000, True)):
+        cases.append(Case(f"srt_to_ass[{count}]",
+                          lambda c=count: (lambda p=bilingual_file(c): ass_tool.srt_to_ass(p, ass_head, os.path.join(workdir, f"out_{c}.ass"))),
+                          repeat=3 if extreme else 10, extreme=extreme))
+    return cases
+
+
+def load_baseline(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU 热点函数微基准：与保存的基线对比，超过阈值即判定为性能回退")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为新的基线")
+    parser.add_argument("--threshold", type=float, default=25.0, help="允许的变慢百分比，超过则返回非零退出码")
+    parser.add_argument("--filter", default=None, help="只运行名称包含该字符串的用例")
+    parser.add_argument("--quick", action="store_true", help="跳过极端规模的用例")
+    parser.add_argument("--json", default=None, help="将本次结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    baseline_path = os.path.abspath(args.baseline)
+    json_path = os.path.abspath(args.json) if args.json else None
+    workdir = tempfile.mkdtemp(prefix="subtitle_cpu_bench_")
+    # translate_srt_llm 导入时会在当前目录创建日志文件
+    os.chdir(workdir)
+
+    baseline = load_baseline(baseline_path).get("results", {})
+    results: Dict[str, Dict] = {}
+    regressions = []
+    try:
+        for case in build_cases(workdir):
+            if args.filter and args.filter not in case.name:
+                continue
+            if args.quick and case.extreme:
+                continue
+            row = measure(case)
+            results[case.name] = row
+            base = baseline.get(case.name)
+            if base:
+                delta = (row["min_s"] / base["min_s"] - 1) * 100
+                status = "回退" if delta > args.threshold else "正常"
+                if delta > args.threshold:
+                    regressions.append(case.name)
+                print(f"{case.name:<48} {row['min_s'] * 1000:10.3f} ms | 基线 {base['min_s'] * 1000:10.3f} ms | {delta:+7.1f}% {status}")
+            else:
+                print(f"{case.name:<48} {row['min_s'] * 1000:10.3f} ms | 无基线")
+    finally:
+        os.chdir(SUBTITLE_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        merged = load_baseline(baseline_path)
+        merged.update({k: v for k, v in report.items() if k != "results"})
+        merged.setdefault("results", {}).update(results)
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存至 {baseline_path}")
+        return 0
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} 个用例变慢超过 {args.threshold:.0f}%: {', '.join(regressions)}")
+        return 1
+    print("\n✅ 未发现超过阈值的性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+import importlib.util
+from types import SimpleNamespace
+from typing import Dict, List
+
+SUBTITLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 允许导入 subtitle/core 下的模块
+sys.path.append(SUBTITLE_DIR)
+
+import synth
+from mock_llm_server import MockLLMServer, PROFILES
+
+
+def isolate_environment(workdir: str, args):
+    """
+    基准测试不能污染真实的翻译记忆、批次画像、术语库缓存、背景词频与任务缓存，也不能复用上一次运行学到的状态：
+    在导入 core 之前把相关路径指向临时目录，并关闭进度条与 RPM 限流。
+    """
+    os.environ["TM_DB_PATH"] = os.path.join(workdir, "translation_memory.db")
+    os.environ["BATCH_PROFILE_PATH"] = os.path.join(workdir, "batch_profile.json")
+    os.environ["CACHE_DIR"] = os.path.join(workdir, ".cache")
+    os.environ["GLOSSARY_DB_PATH"] = os.path.join(workdir, "glossary_cache.db")
+    os.environ["LLM_DISCOVERY_DB_PATH"] = os.path.join(workdir, "llm_discovery.db")
+    os.environ["LLM_DISCOVERY_CN_DB_PATH"] = os.path.join(workdir, "llm_discovery_cn.db")
+    os.environ["TERM_BACKGROUND_PATH"] = os.path.join(workdir, "term_background.json")
+    os.environ["ENABLE_TRANSLATION_MEMORY"] = "True" if args.with_tm else "False"
+    os.environ["ADAPTIVE_BATCH"] = "False" if args.fixed_batch else "True"
+    os.environ["RPM_LIMIT"] = str(args.rpm)
+    os.environ["RETRY_DELAY"] = str(args.retry_delay)
+    os.environ["TQDM_DISABLE"] = "1"
+    os.chdir(workdir)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SUBTITLE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_extract_tool():
+    path = os.path.join(SUBTITLE_DIR, "pre-process", "01-extract_srt.py")
+    spec = importlib.util.spec_from_file_location("extract_tool", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def run_size(count: int, args, server: MockLLMServer, workdir: str, tag: str = "") -> Dict:
+    from translate_srt_llm import run_translation
+    from core.metrics import pipeline_metrics, percentile
+
+    blocks = synth.generate_blocks(count, seed=args.seed, dup_rate=args.dup_rate, cue_rate=args.cue_rate)
+    source = os.path.join(workdir, f"bench_{count}.{args.format}")
+    (synth.write_ass if args.format == "ass" else synth.write_srt)(source, blocks)
+
+    preprocess_s = 0.0
+    srt_path = source
+    if args.format == "ass":
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            srt_path = load_extract_tool().convert_ass_file_to_srt(source)
+        preprocess_s = time.perf_counter() - started
+
+    output_file = os.path.join(workdir, f"out_{count}{tag}.srt")
+    run_args = SimpleNamespace(
+        input_file=srt_path, output_file=output_file,
+        progress_file=os.path.join(workdir, f"progress_{count}{tag}.json"),
+        glossary_cache_file=os.path.join(workdir, f"glossary_{count}{tag}.json"),
+        batch_size=args.batch_size, max_concurrent=args.concurrency, bilingual=True,
+        api_key="", api_url=server.url,
+        # 每个规模使用独立的模型名，自适应批次从相同的初始值开始
+        model_name=f"mock-bench-{count}",
+        temp_terms=0.1, temp_literal=0.3, temp_polish=0.5, target_lang="zh",
+    )
+    server.reset_stats()
+    pipeline_metrics.reset()
+
+    output = io.StringIO()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(output if not args.verbose else sys.stdout):
+        summary = await run_translation(run_args) or {}
+    wall = time.perf_counter() - started
+
+    batch_latencies: List[float] = []
+    for stage in ("literal", "polish"):
+        batch_latencies.extend(pipeline_metrics.latencies.get(stage, []))
+    stats = server.stats
+    tokens = stats["prompt_tokens"] + stats["completion_tokens"]
+    return {
+        "blocks": count,
+        "format": args.format,
+        "preprocess_s": round(preprocess_s, 4),
+        "wall_s": round(wall, 4),
+        "blocks_per_s": round(count / wall, 2) if wall else 0.0,
+        "llm_calls": stats["requests"],
+        "calls_per_block": round(stats["requests"] / count, 4),
+        "prompt_tokens_per_block": round(stats["prompt_tokens"] / count, 2),
+        "completion_tokens_per_block": round(stats["completion_tokens"] / count, 2),
+        "tokens_per_block": round(tokens / count, 2),
+        "batch_latency_p50_ms": round(percentile(batch_latencies, 50) * 1000, 2),
+        "batch_latency_p95_ms": round(percentile(batch_latencies, 95) * 1000, 2),
+        "stages": pipeline_metrics.summary(),
+        "http_errors": stats["errors"],
+        "malformed_responses": stats["malformed"],
+        "bypassed": summary.get("bypassed", 0),
+        "tm_hits": summary.get("tm_hits", 0),
+        "output_file": output_file,
+    }
+
+
+async def check_replay(count: int, args, server: MockLLMServer, workdir: str) -> Dict:
+    """
+    录制 -> 回放往返检查：先录制一次运行的全部请求，再从磁带回放同一输入，
+    回放必须全部命中、不剩余录制，且输出文件与录制时逐字节相同。
+    """
+    from core.cassette import install_cassette, close_cassette
+
+    cassette_path = os.path.join(workdir, f"cassette_{count}.jsonl")
+    install_cassette(record_path=cassette_path)
+    try:
+        recorded = await run_size(count, args, server, workdir, tag="_record")
+    finally:
+        close_cassette()
+    cassette = install_cassette(replay_path=cassette_path)
+    try:
+        replayed = await run_size(count, args, server, workdir, tag="_replay")
+        unused = sum(len(q) for q in cassette._entries.values())
+        hits, misses = cassette.hits, len(cassette.misses)
+    finally:
+        close_cassette()
+    with open(recorded["output_file"], 'rb') as a, open(replayed["output_file"], 'rb') as b:
+        identical = a.read() == b.read()
+    ok = identical and misses == 0 and unused == 0
+    print(f"{count:>7} 块 | 回放命中 {hits}，未命中 {misses}，剩余录制 {unused} | "
+          f"输出{'一致' if identical else '不一致'} {'✅' if ok else '❌'}")
+    return {"blocks": count, "hits": hits, "misses": misses, "unused": unused, "identical": identical, "ok": ok}
+
+
+def print_row(row: Dict):
+    print(f"{row['blocks']:>7} 块 | {row['wall_s']:8.2f}s | {row['blocks_per_s']:9.1f} 块/s | "
+          f"{row['calls_per_block']:.3f} 次调用/块 | {row['tokens_per_block']:7.1f} tokens/块 | "
+          f"批次延迟 p50 {row['batch_latency_p50_ms']:7.1f} ms, p95 {row['batch_latency_p95_ms']:7.1f} ms")
+
+
+def compare(previous_path: str, results: List[Dict]):
+    """与上一次的结果文件对比吞吐量与调用次数"""
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = {r["blocks"]: r for r in json.load(f).get("results", [])}
+    print(f"\n与 {previous_path} 对比:")
+    for row in results:
+        old = previous.get(row["blocks"])
+        if not old:
+            continue
+        speed = (row["blocks_per_s"] / old["blocks_per_s"] - 1) * 100 if old["blocks_per_s"] else 0.0
+        calls = (row["calls_per_block"] / old["calls_per_block"] - 1) * 100 if old["calls_per_block"] else 0.0
+        print(f"{row['blocks']:>7} 块 | 吞吐 {speed:+6.1f}% | 调用次数 {calls:+6.1f}%")
+
+
+async def run_all(args, server: MockLLMServer, workdir: str) -> List[Dict]:
+    # 所有规模在同一个事件循环中运行 (llm_client 的全局信号量与令牌桶绑定事件循环)
+    results = []
+    for count in args.sizes:
+        row = await run_size(count, args, server, workdir)
+        results.append(row)
+        print_row(row)
+    if args.check_replay:
+        print("\n录制 -> 回放往返检查:")
+        for count in args.sizes:
+            row = next(r for r in results if r["blocks"] == count)
+            row["replay"] = await check_replay(count, args, server, workdir)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端吞吐基准：合成字幕 + 本地模拟 LLM 接口运行 run_translation")
+    parser.add_argument("--sizes", default="1000,10000", help="逗号分隔的字幕块数，例如 1000,10000,100000")
+    parser.add_argument("--format", choices=["srt", "ass"], default="srt", help="合成字幕格式 (ASS 会先走预处理转换)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="fast", help="模拟接口的延迟/失败配置")
+    parser.add_argument("--latency-ms", type=float, default=None, help="覆盖配置中的基础延迟")
+    parser.add_argument("--jitter-ms", type=float, default=None, help="覆盖配置中的延迟抖动")
+    parser.add_argument("--per-item-ms", type=float, default=None, help="覆盖配置中每个字幕块的生成耗时")
+    parser.add_argument("--fail-rate", type=float, default=None, help="覆盖配置中返回缺块 JSON 的比例")
+    parser.add_argument("--error-rate", type=float, default=None, help="覆盖配置中返回 HTTP 500 的比例")
+    parser.add_argument("--batch-size", type=int, default=8, help="初始批次大小")
+    parser.add_argument("--fixed-batch", action="store_true", help="关闭自适应批次")
+    parser.add_argument("--concurrency", type=int, default=4, help="最大并发请求数")
+    parser.add_argument("--rpm", type=int, default=1000000, help="RPM 限流 (默认相当于不限流)")
+    parser.add_argument("--retry-delay", type=float, default=0.05, help="请求失败后的重试间隔 (秒)")
+    parser.add_argument("--dup-rate", type=float, default=0.08, help="合成字幕中重复台词的比例")
+    parser.add_argument("--cue-rate", type=float, default=0.03, help="合成字幕中音乐/音效块的比例")
+    parser.add_argument("--with-tm", action="store_true", help="启用翻译记忆 (使用临时库)")
+    parser.add_argument("--check-replay", action="store_true",
+                        help="另外做一次录制 -> 回放往返检查 (回放须全部命中且输出逐字节相同，否则返回非零退出码)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default=None, help="结果标签，例如版本号")
+    parser.add_argument("--json", default=None, help="将结果写入 JSON 文件")
+    parser.add_argument("--compare", default=None, help="与之前的 JSON 结果对比")
+    parser.add_argument("--keep-workdir", action="store_true", help="保留临时目录 (合成字幕与输出)")
+    parser.add_argument("--verbose", action="store_true", help="显示流水线输出")
+    args = parser.parse_args()
+    args.sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    profile = dict(PROFILES[args.profile])
+    for key in ("latency_ms", "jitter_ms", "per_item_ms", "fail_rate", "error_rate"):
+        if getattr(args, key) is not None:
+            profile[key] = getattr(args, key)
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    workdir = tempfile.mkdtemp(prefix="subtitle_bench_")
+    isolate_environment(workdir, args)
+    # translate_srt_llm 导入时会配置日志，导入后再降低日志级别
+    import translate_srt_llm  # noqa: F401
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server = MockLLMServer(profile, seed=args.seed).start()
+    print(f"模拟接口 {server.url}，配置 {args.profile}: {profile}")
+    try:
+        results = asyncio.run(run_all(args, server, workdir))
+    finally:
+        server.stop()
+        if not args.keep_workdir:
+            os.chdir(SUBTITLE_DIR)
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"临时目录已保留: {workdir}")
+
+    report = {
+        "label": args.label,
+        "git_rev": git_revision(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "profile": {"name": args.profile, **profile},
+        "settings": {
+            "batch_size": args.batch_size, "adaptive_batch": not args.fixed_batch,
+            "concurrency": args.concurrency, "format": args.format, "with_tm": args.with_tm,
+            "dup_rate": args.dup_rate, "cue_rate": args.cue_rate, "seed": args.seed,
+        },
+        "results": results,
+    }
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {json_path}")
+    if compare_path:
+        compare(compare_path, results)
+    if any(not r["replay"]["ok"] for r in results if "replay" in r):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
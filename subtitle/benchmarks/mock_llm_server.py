@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# 本地模拟 LLM 接口 (OpenAI chat/completions 格式)，供端到端基准测试使用。
+# 按提示词中 <Input> 后的 JSON 识别阶段：含 "text" 的是直译，含 "original" 的是润色，其余为术语提取。
+# 延迟 = 基础延迟 + 抖动 + 每个字幕块的生成耗时；可按比例返回缺块的 JSON (校验失败) 或 HTTP 500。
+import re
+import sys
+import json
+import random
+import socket
+import asyncio
+import argparse
+import threading
+from typing import Dict, Optional
+
+from aiohttp import web
+
+PROFILES: Dict[str, Dict[str, float]] = {
+    "instant":   {"latency_ms": 0,   "jitter_ms": 0,   "per_item_ms": 0,  "fail_rate": 0.0,  "error_rate": 0.0},
+    "fast":      {"latency_ms": 20,  "jitter_ms": 10,  "per_item_ms": 2,  "fail_rate": 0.0,  "error_rate": 0.0},
+    "realistic": {"latency_ms": 800, "jitter_ms": 400, "per_item_ms": 60, "fail_rate": 0.03, "error_rate": 0.01},
+    "flaky":     {"latency_ms": 300, "jitter_ms": 200, "per_item_ms": 20, "fail_rate": 0.15, "error_rate": 0.05},
+}
+
+_CJK_RE = re.compile(r'[一-鿿]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：汉字按 1 个，其余字符按 4 个 1 token"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _extract_items(content: str):
+    pos = content.rfind('<Input>')
+    if pos < 0:
+        return None
+    segment = content[pos + 7:]
+    start = segment.find('[')
+    if start < 0:
+        return None
+    try:
+        data, _ = json.JSONDecoder().raw_decode(segment[start:])
+    except ValueError:
+        return None
+    if isinstance(data, list) and data and isinstance(data[0], dict) and 'id' in data[0]:
+        return data
+    return None
+
+
+class MockLLMServer:
+    """在后台线程的独立事件循环中运行的模拟接口，统计请求数与估算的 token 用量"""
+    def __init__(self, profile: Dict[str, float], seed: int = 0, port: int = 0):
+        self.profile = profile
+        self.port = port
+        self.rng = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "malformed": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1/chat/completions"
+
+    def reset_stats(self):
+        for key in self.stats:
+            self.stats[key] = 0
+
+    def _build_reply(self, items) -> str:
+        if items is None:
+            # 术语提取：返回空术语表，避免基准数据写入真实语料库
+            return "{}"
+        if 'text' in items[0]:
+            out = [{"id": it['id'], "trans": f"直译{it['id']}：" + it['text'][:20]} for it in items]
+        else:
+            out = [{"id": it['id'], "polished": f"润色{it['id']}：" + it.get('literal', '')[:20]} for it in items]
+        if self.rng.random() < self.profile["fail_rate"] and out:
+            # 模拟模型漏掉一个块，触发阶梯降级
+            out.pop(self.rng.randrange(len(out)))
+            self.stats["malformed"] += 1
+        return json.dumps(out, ensure_ascii=False)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        self.stats["requests"] += 1
+        content = "\n".join(m.get("content", "") for m in body.get("messages", []))
+        items = _extract_items(content)
+        p = self.profile
+        delay = p["latency_ms"] + self.rng.uniform(-p["jitter_ms"], p["jitter_ms"]) + p["per_item_ms"] * len(items or [])
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+        if self.rng.random() < p["error_rate"]:
+            self.stats["errors"] += 1
+            return web.Response(status=500, text="mock server error")
+
+        reply = self._build_reply(items)
+        prompt_tokens, completion_tokens = estimate_tokens(content), estimate_tokens(reply)
+        self.stats["prompt_tokens"] += prompt_tokens
+        self.stats["completion_tokens"] += completion_tokens
+        return web.json_response({
+            "choices": [{"message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+        })
+
+    async def _start(self):
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post('/v1/chat/completions', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', self.port))
+        self.port = sock.getsockname()[1]
+        await web.SockSite(self._runner, sock).start()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._run, name="mock-llm", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if not self._loop:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 LLM 接口")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="fast")
+    parser.add_argument("--port", type=int, default=19999)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockLLMServer(dict(PROFILES[args.profile]), seed=args.seed, port=args.port).start()
+    print(f"模拟接口已启动: {server.url} (配置 {args.profile})，Ctrl-C 退出")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+流式 SRT 解析的等价性检查：随机生成带各种格式问题的 SRT (缺序号、缺空行、空块、非标准时间轴、
+只有空白的行、行尾空白、孤立序号行、BOM、CRLF)，在不同的读取块大小下比较
+iter_srt (快速路径 + 逐块回退) 与整篇逐行解析 parse_srt_lines 的结果，任何差异都返回非零退出码。
+"""
+import io
+import os
+import sys
+import random
+import argparse
+import tempfile
+
+# 允许导入 subtitle/core 下的模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core.subtitle_io as subtitle_io
+
+CONTENT_LINES = ["Hello", "two words ", "  lead", "42", "a --> b", "   ", "", "x\ty", "日本語", "7", "　台词"]
+SEPARATORS = ["\n\n", "\n\n", "\n\n", "\n", "\n\n\n", "\n \n", "\n\n\n\n"]
+STRAY_LINES = ["junk line\n\n", "99\n\n", "\n"]
+
+
+def _stamp(ms: int) -> str:
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+
+def make_timestamp(rng: random.Random, start: int) -> str:
+    end = start + rng.randint(100, 3000)
+    r = rng.random()
+    if r < 0.1:
+        # 非标准写法："." 作毫秒分隔符、小时只有一位
+        return f"{start // 3600000}:{start // 60000 % 60:02d}:{start // 1000 % 60:02d}.{start % 1000 // 100} --> {_stamp(end)}"
+    if r < 0.15:
+        return f"{_stamp(start)} --> {_stamp(end)}  "
+    if r < 0.18:
+        return f"{_stamp(start)} --> {_stamp(end)} X1:10"
+    return f"{_stamp(start)} --> {_stamp(end)}"
+
+
+def make_srt(rng: random.Random) -> str:
+    out = ["\ufeff"] if rng.random() < 0.1 else []
+    start, index = 0, rng.randint(0, 3)
+    for _ in range(rng.randint(0, 25)):
+        index += rng.choice([1, 1, 1, 2, 0])
+        start += rng.randint(0, 5000)
+        lines = []
+        if rng.random() > 0.1:
+            lines.append(rng.choice([str(index), str(index), f" {index} "]))
+        lines.append(make_timestamp(rng, start))
+        if rng.random() < 0.9:
+            lines.extend(rng.choice(CONTENT_LINES) for _ in range(rng.choice([0, 1, 1, 2, 3])))
+        out.append("\n".join(lines) + rng.choice(SEPARATORS))
+        if rng.random() < 0.05:
+            out.append(rng.choice(STRAY_LINES))
+    text = "".join(out)
+    return text.rstrip("\n") if rng.random() < 0.1 else text
+
+
+def as_tuples(blocks):
+    return [(b.id, b.start, b.end, b.content) for b in blocks]
+
+
+def check_case(text: str, keep_empty: bool, chunk_size: int, tmp_dir: str):
+    """返回第一处差异的描述，结果一致时返回 None"""
+    expected = as_tuples(subtitle_io.parse_srt_lines(subtitle_io._lines(io.StringIO(text, newline=None)),
+                                                     keep_empty=keep_empty))
+    subtitle_io.READ_CHUNK_SIZE = chunk_size
+    actual = as_tuples(subtitle_io.iter_srt(io.StringIO(text, newline=None), keep_empty=keep_empty))
+    if actual == expected:
+        # 文件路径：经过编码探测与换行符转换 (CRLF)
+        path = os.path.join(tmp_dir, "case.srt")
+        with open(path, 'w', encoding='utf-8', newline='\r\n') as f:
+            f.write(text)
+        actual = as_tuples(subtitle_io.iter_srt(path, keep_empty=keep_empty))
+    if actual == expected:
+        return None
+    for i, (want, got) in enumerate(zip(expected, actual)):
+        if want != got:
+            return f"第 {i + 1} 块: 期望 {want}，实际 {got}"
+    return f"块数不同: 期望 {len(expected)}，实际 {len(actual)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查流式 SRT 解析与逐行解析的结果是否一致")
+    parser.add_argument("--cases", type=int, default=5000, help="随机用例数")
+    parser.add_argument("--seed", type=int, default=0, help="起始随机种子")
+    parser.add_argument("--chunk-sizes", default="37,1048576",
+                        help="读取块大小 (逗号分隔)；每个用例另外再试一个 1-200 的随机值")
+    args = parser.parse_args()
+
+    # 空块丢弃的警告对检查没有意义
+    subtitle_io.logger.disabled = True
+    chunk_sizes = [int(s) for s in args.chunk_sizes.split(",") if s.strip()]
+    default_chunk_size = subtitle_io.READ_CHUNK_SIZE
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for seed in range(args.seed, args.seed + args.cases):
+            rng = random.Random(seed)
+            text = make_srt(rng)
+            keep_empty = rng.random() < 0.2
+            for chunk_size in chunk_sizes + [rng.randint(1, 200)]:
+                diff = check_case(text, keep_empty, chunk_size, tmp_dir)
+                if diff:
+                    failures += 1
+                    if failures <= 5:
+                        print(f"❌ seed {seed} 读取块 {chunk_size} keep_empty={keep_empty}: {diff}")
+                    break
+    subtitle_io.READ_CHUNK_SIZE = default_chunk_size
+    print(f"{args.cases} 个用例，{failures} 个结果不一致" + (" ✅" if not failures else ""))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+命令行启动耗时基准：在子进程中用 `python -X importtime` 导入 main，统计总导入耗时与最慢的模块，
+并检查命令行路径上不应出现的重量级依赖 (tkinter、aiohttp 等只应在 GUI / 真正发送请求时导入)。
+另外测量 `main.py --help` 与 `main.py --clean-cache --dry-run` 的整体耗时 (含解释器启动)。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import shutil
+import tempfile
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+SUBTITLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "startup_baseline.json")
+
+# 命令行启动时不应导入的模块：GUI、HTTP 客户端、JSON 修复、进度条、预处理/后处理脚本
+FORBIDDEN_MODULES = ("tkinter", "aiohttp", "json_repair", "tqdm", "extract_tool", "ass_tool")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """解析 -X importtime 输出，返回 [(模块名, 自身耗时 us, 累计耗时 us)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def run_importtime(workdir: str, env: Dict) -> List[Tuple[str, int, int]]:
+    code = f"import sys; sys.path.insert(0, {SUBTITLE_DIR!r}); import main"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=workdir, env=env,
+                          capture_output=True, text=True, check=True)
+    return parse_importtime(proc.stderr)
+
+
+def run_wall(args: List[str], workdir: str, env: Dict) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(SUBTITLE_DIR, "main.py"), *args], cwd=workdir, env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - started
+
+
+def load_baseline(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="命令行启动耗时基准 (-X importtime)：与保存的基线对比，并检查不应导入的重量级模块")
+    parser.add_argument("--repeat", type=int, default=7, help="每项测量的重复次数 (取最小值)")
+    parser.add_argument("--top", type=int, default=15, help="列出累计耗时最高的模块数")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为新的基线")
+    parser.add_argument("--threshold", type=float, default=25.0, help="允许的变慢百分比，超过则返回非零退出码")
+    parser.add_argument("--json", default=None, help="将本次结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    baseline_path = os.path.abspath(args.baseline)
+    workdir = tempfile.mkdtemp(prefix="subtitle_startup_bench_")
+    # 导入 translate_srt_llm 会在当前目录创建日志；缓存清理指向空的临时目录
+    env = dict(os.environ, CACHE_DIR=os.path.join(workdir, "cache"))
+
+    try:
+        # 第一次运行预热磁盘缓存与 __pycache__，不计入结果
+        run_importtime(workdir, env)
+        import_runs = [run_importtime(workdir, env) for _ in range(max(1, args.repeat))]
+        totals = [next(cum for name, _, cum in rows if name == "main") for rows in import_runs]
+        fastest = import_runs[totals.index(min(totals))]
+
+        results: Dict[str, Dict] = {
+            "import main": {"min_s": min(totals) / 1e6, "median_s": statistics.median(totals) / 1e6, "repeat": len(totals)},
+        }
+        for label, cli_args in (("main.py --help", ["--help"]),
+                                ("main.py --clean-cache --dry-run", ["--clean-cache", "--dry-run"])):
+            run_wall(cli_args, workdir, env)
+            times = [run_wall(cli_args, workdir, env) for _ in range(max(1, args.repeat))]
+            results[label] = {"min_s": min(times), "median_s": statistics.median(times), "repeat": len(times)}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = load_baseline(baseline_path).get("results", {})
+    regressions = []
+    for name, row in results.items():
+        base = baseline.get(name)
+        if base:
+            delta = (row["min_s"] / base["min_s"] - 1) * 100
+            status = "回退" if delta > args.threshold else "正常"
+            if delta > args.threshold:
+                regressions.append(name)
+            print(f"{name:<36} {row['min_s'] * 1000:10.1f} ms | 基线 {base['min_s'] * 1000:10.1f} ms | {delta:+7.1f}% {status}")
+        else:
+            print(f"{name:<36} {row['min_s'] * 1000:10.1f} ms | 无基线")
+
+    # 累计耗时最高的包 (只列顶层导入，避免同一依赖的子模块重复出现)
+    print(f"\n累计导入耗时最高的 {args.top} 个顶层模块 (import main 最快的一次):")
+    top_level = [(name, cum) for name, _, cum in fastest if name != "main" and "." not in name]
+    for name, cum in sorted(top_level, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"  {cum / 1000:8.1f} ms  {name}")
+
+    imported = {name for name, _, _ in fastest}
+    forbidden = sorted(m for m in FORBIDDEN_MODULES if m in imported or any(n.startswith(m + ".") for n in imported))
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+        "modules": len(imported),
+    }
+    if args.json:
+        with open(os.path.abspath(args.json), 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if forbidden:
+        print(f"\n❌ 命令行启动时导入了不应加载的模块: {', '.join(forbidden)}")
+        return 1
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存至 {baseline_path}")
+        return 0
+    if regressions:
+        print(f"\n❌ {len(regressions)} 项启动耗时变慢超过 {args.threshold:.0f}%: {', '.join(regressions)}")
+        return 1
+    print(f"\n✅ 共导入 {len(imported)} 个模块，未发现超过阈值的回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import random
+import argparse
+from typing import Dict, List
+
+COMMON_WORDS = (
+    "right let's go we the car is not a very good idea but I think you should try it again now "
+    "James Richard Jeremy engine road trip fast slow red blue green mountain river bridge tunnel "
+    "amazing terrible honestly actually brilliant rubbish look listen wait stop drive turn left"
+).split()
+
+# 真实台词中反复出现的短句
+STOCK_LINES = [
+    "What?", "Okay.", "Yeah.", "No!", "Come on!", "Hello?", "Thank you.", "I know.",
+    "Right.", "Let's go.", "Are you sure?", "Wait, wait, wait.", "Oh, no.", "Hang on.",
+]
+# 音乐提示、音效等无需翻译的块
+CUE_LINES = ["♪", "♪ ♪", "[music]", "[engine revving]", "(laughs)", "[door slams]", "...", "42"]
+
+
+def build_vocabulary(rng: random.Random, size: int = 5000):
+    """常用词 + 随机生成的长尾词，按 Zipf 分布取词，接近真实台词的词频"""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocab = COMMON_WORDS + ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+    cum_weights, total = [], 0.0
+    for rank in range(1, len(vocab) + 1):
+        total += 1.0 / rank
+        cum_weights.append(total)
+    return vocab, cum_weights
+
+
+VOCAB, CUM_WEIGHTS = build_vocabulary(random.Random(0))
+
+
+def make_line(rng: random.Random) -> str:
+    words = rng.choices(VOCAB, cum_weights=CUM_WEIGHTS, k=rng.randint(4, 12))
+    return " ".join(words).capitalize() + rng.choice([".", "!", "?", "..."])
+
+
+def make_dialogue_line(rng: random.Random) -> str:
+    """单行台词：词数服从对数正态分布 (中位数约 7 个词，偶有长句)"""
+    count = max(1, min(20, int(rng.lognormvariate(1.9, 0.5))))
+    words = rng.choices(VOCAB, cum_weights=CUM_WEIGHTS, k=count)
+    return " ".join(words).capitalize() + rng.choice([".", ".", ".", "!", "?", "..."])
+
+
+def generate_blocks(count: int, seed: int = 42, dup_rate: float = 0.08, cue_rate: float = 0.03,
+                    two_line_rate: float = 0.2) -> List[Dict]:
+    """
+    生成合成字幕块：
+    - dup_rate：常用短句或前文台词的重复比例；
+    - cue_rate：音乐/音效等无需翻译的块比例；
+    - two_line_rate：双行字幕（对话或长句折行）比例。
+    时间轴按每块 1~5 秒递增。
+    """
+    rng = random.Random(seed)
+    blocks, history = [], []
+    start_ms = 1000
+    for i in range(1, count + 1):
+        roll = rng.random()
+        if roll < cue_rate:
+            content = rng.choice(CUE_LINES)
+        elif roll < cue_rate + dup_rate:
+            content = rng.choice(STOCK_LINES) if rng.random() < 0.6 or not history else rng.choice(history)
+        else:
+            content = make_dialogue_line(rng)
+            if rng.random() < two_line_rate:
+                content = f"- {content}\n- {make_dialogue_line(rng)}"
+            history.append(content)
+            if len(history) > 500:
+                history.pop(0)
+        duration = rng.randint(1000, 5000)
+        blocks.append({"index": str(i), "start": start_ms, "end": start_ms + duration, "content": content})
+        start_ms += duration + rng.randint(0, 800)
+    return blocks
+
+
+def _srt_time(ms: int) -> str:
+    return f"{ms // 3600000:02}:{ms // 60000 % 60:02}:{ms // 1000 % 60:02},{ms % 1000:03}"
+
+
+def _ass_time(ms: int) -> str:
+    return f"{ms // 3600000}:{ms // 60000 % 60:02}:{ms // 1000 % 60:02}.{ms % 1000 // 10:02}"
+
+
+def write_srt(path: str, blocks: List[Dict]):
+    with open(path, 'w', encoding='utf-8') as f:
+        for b in blocks:
+            f.write(f"{b['index']}\n{_srt_time(b['start'])} --> {_srt_time(b['end'])}\n{b['content']}\n\n")
+
+
+def write_ass(path: str, blocks: List[Dict]):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[Script Info]\nScriptType: v4.00+\n\n[V4+ Styles]\n"
+                "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+                "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+                "Alignment, MarginL, MarginR, MarginV, Encoding\n"
+                "Style: Default,Arial,20,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,2,2,10,10,10,1\n\n"
+                "[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n")
+        for b in blocks:
+            text = b['content'].replace("\n", "\\N")
+            f.write(f"Dialogue: 0,{_ass_time(b['start'])},{_ass_time(b['end'])},Default,,0,0,0,,{text}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成 SRT/ASS 字幕，用于基准测试")
+    parser.add_argument("-n", "--blocks", type=int, default=1000, help="字幕块数量")
+    parser.add_argument("-f", "--format", choices=["srt", "ass"], default="srt")
+    parser.add_argument("-o", "--output", required=True, help="输出文件")
+    parser.add_argument("--dup-rate", type=float, default=0.08, help="重复台词比例")
+    parser.add_argument("--cue-rate", type=float, default=0.03, help="音乐/音效块比例")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    blocks = generate_blocks(args.blocks, seed=args.seed, dup_rate=args.dup_rate, cue_rate=args.cue_rate)
+    (write_ass if args.format == "ass" else write_srt)(args.output, blocks)
+    print(f"已生成 {len(blocks)} 块 -> {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
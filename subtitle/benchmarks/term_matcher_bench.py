@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+术语匹配基准：TermMatcher 与 FlashText 在相同词表 (默认 10 万条) 上的构建耗时、扫描耗时与召回。
+- en：英文词条 + 合成英文对白 (正向模式)；
+- zh：中文词条 + 不分词的中文文本 (反向模式)，文本中混入标点、数字与英文单词，
+  召回 = 埋入文本的词条中被找到的比例 (FlashText 会漏掉紧跟在匹配或字母数字之后的中文词条)。
+"""
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from typing import Callable, Dict, List, Tuple
+
+# 允许导入 subtitle/core 下的模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synth
+from cpu_bench import make_terms, CJK_CHARS
+from core.term_matcher import TermMatcher
+
+CJK_PUNCTUATION = "，。！？、"
+
+
+def make_english_case(count: int, blocks: int) -> Tuple[List[str], str, List[str]]:
+    keys = list(make_terms(count))
+    text = "\n".join(b['content'] for b in synth.generate_blocks(blocks, seed=blocks))
+    return keys, text, []
+
+
+def make_chinese_case(count: int, chars: int, seed: int = 11) -> Tuple[List[str], str, List[str]]:
+    """中文词条 (2~6 字) + 埋入这些词条的中文文本，返回 (词表, 文本, 埋入的词条)"""
+    rng = random.Random(seed)
+    keys = set()
+    while len(keys) < count:
+        keys.add("".join(rng.choice(CJK_CHARS) for _ in range(rng.randint(2, 6))))
+    keys = list(keys)
+    parts, planted, length = [], [], 0
+    while length < chars:
+        roll = rng.random()
+        if roll < 0.3:
+            term = rng.choice(keys)
+            planted.append(term)
+            part = term
+        elif roll < 0.35:
+            part = rng.choice(synth.VOCAB) if rng.random() < 0.5 else str(rng.randint(1, 999))
+        elif roll < 0.45:
+            part = rng.choice(CJK_PUNCTUATION)
+        else:
+            # 填充字取自词条不使用的汉字，避免与埋入的词条拼出更长的词条
+            part = "".join(rng.choice("甲乙丙丁戊己庚辛壬癸") for _ in range(rng.randint(1, 3)))
+        parts.append(part)
+        length += len(part)
+    return keys, "".join(parts), planted
+
+
+def timed(func: Callable):
+    """CPU 时间 (单线程计算，不受其他进程抢占的影响)"""
+    gc.collect()
+    started = time.process_time()
+    result = func()
+    return time.process_time() - started, result
+
+
+def recall(found: List[str], planted: List[str]) -> float:
+    if not planted:
+        return float("nan")
+    remaining: Dict[str, int] = {}
+    for term in found:
+        remaining[term] = remaining.get(term, 0) + 1
+    hits = 0
+    for term in planted:
+        if remaining.get(term):
+            remaining[term] -= 1
+            hits += 1
+    return hits / len(planted)
+
+
+def build_flashtext(keys: List[str]):
+    try:
+        from flashtext import KeywordProcessor
+    except ImportError:
+        return None
+    processor = KeywordProcessor(case_sensitive=False)
+    for key in keys:
+        processor.add_keyword(key, key)
+    return processor
+
+
+def run_case(name: str, keys: List[str], text: str, planted: List[str], repeat: int) -> Dict:
+    row = {"case": name, "terms": len(keys), "chars": len(text)}
+    impls = {}
+    build, matcher = timed(lambda: TermMatcher(keys))
+    impls["term_matcher"] = (build, matcher.find)
+    build, processor = timed(lambda: build_flashtext(keys))
+    if processor is not None:
+        impls["flashtext"] = (build, processor.extract_keywords)
+
+    # 两者交替扫描，取各自的最小值，减少机器负载波动的影响
+    scans = {impl: [] for impl in impls}
+    found = {}
+    for _ in range(max(1, repeat)):
+        for impl, (_, find) in impls.items():
+            elapsed, found[impl] = timed(lambda: find(text))
+            scans[impl].append(elapsed)
+
+    for impl, (build, _) in impls.items():
+        r = row[impl] = {"build_s": build, "scan_s": min(scans[impl]), "hits": len(found[impl]),
+                         "recall": recall(found[impl], planted)}
+        recall_text = "" if r["recall"] != r["recall"] else f" | 召回 {r['recall']:.1%}"
+        print(f"{name:<4} {impl:<13} 构建 {r['build_s'] * 1000:8.1f} ms | 扫描 {r['scan_s'] * 1000:8.1f} ms | "
+              f"命中 {r['hits']:>8}{recall_text}")
+    if "flashtext" in row:
+        print(f"{name:<4} 扫描耗时比 TermMatcher / FlashText = {row['term_matcher']['scan_s'] / row['flashtext']['scan_s']:.2f}")
+    else:
+        print(f"{name:<4} 未安装 flashtext，跳过对比")
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="术语匹配基准：TermMatcher vs FlashText (构建、扫描耗时与召回)")
+    parser.add_argument("--terms", type=int, default=100000, help="词表规模")
+    parser.add_argument("--blocks", type=int, default=50000, help="英文用例的字幕块数")
+    parser.add_argument("--zh-chars", type=int, default=1000000, help="中文用例的文本字数")
+    parser.add_argument("--repeat", type=int, default=5, help="扫描重复次数 (取最小值)")
+    parser.add_argument("--json", default=None, help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    results = [
+        run_case("en", *make_english_case(args.terms, args.blocks), repeat=args.repeat),
+        run_case("zh", *make_chinese_case(args.terms, args.zh_chars), repeat=args.repeat),
+    ]
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
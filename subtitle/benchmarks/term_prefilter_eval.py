@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+术语提取的候选预筛评估：对比现有的循环采样与本地候选预筛的 LLM 请求数与术语召回。
+- 合成用例：多部剧交替的若干集字幕 (synth 对白 + 埋入的专名、型号、小写行业词，多数术语只出现一两次)；
+  术语提取请求用“神谕”代替：返回送出文本中出现的埋入术语。
+  与真实使用一致，每集提取到的术语写入历史术语表，后续剧集中已收录的术语不再需要提取；
+  背景词频模型随处理的剧集逐步建立 (前 MIN_BACKGROUND_DOCS 集为冷启动)。
+- 真实文件：--files 传入 SRT 文件 (按顺序处理)，--terms 给出期望的术语列表 (每行一个) 时计算召回。
+覆盖率 = 本集出现的术语中，被提取到或已在历史术语表中的比例 (即最终术语表的覆盖率)。
+"""
+import os
+import re
+import sys
+import json
+import random
+import argparse
+from typing import Dict, List, Optional, Set, Tuple
+
+# 允许导入 subtitle/core 下的模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synth
+from core.subtitle_io import SubtitleBlock, iter_srt
+from core.term_candidates import TermBackground, MIN_BACKGROUND_DOCS
+from core.translation_pipeline import _cyclic_sample_parts, _chunk_lines, select_lines_with_unresolved_candidates
+
+SYLLABLES = ("ka", "ro", "mi", "zen", "tal", "vor", "quin", "bra", "del", "sho", "gar", "lux", "net", "pra", "ster")
+
+
+def make_series_terms(rng: random.Random, count: int) -> List[str]:
+    """一部剧的术语：专名 (一到两个大写词)、字母数字型号、小写行业词各占约三分之一"""
+    def word(parts: int) -> str:
+        return "".join(rng.choice(SYLLABLES) for _ in range(parts))
+
+    terms: Set[str] = set()
+    while len(terms) < count:
+        roll = rng.random()
+        if roll < 0.35:
+            name = word(rng.randint(2, 3)).capitalize()
+            if rng.random() < 0.5:
+                name += " " + word(rng.randint(2, 3)).capitalize()
+            terms.add(name)
+        elif roll < 0.65:
+            terms.add(rng.choice("ABCDEFGHKLMRSVXZ") + rng.choice(("", "T", "R", "X")) + str(rng.randint(2, 999)))
+        else:
+            terms.add(word(rng.randint(3, 4)))
+    return sorted(terms)
+
+
+def make_episode(seed: int, terms: List[str], blocks: int, per_episode: int) -> Tuple[List[SubtitleBlock], List[str]]:
+    """合成一集：把随机选出的术语埋入台词 (出现次数服从几何分布，约一半只出现一次)"""
+    rng = random.Random(seed)
+    rows = synth.generate_blocks(blocks, seed=seed)
+    dialogue = [i for i, r in enumerate(rows) if r["content"][-1:] in ".!?"]
+    planted = rng.sample(terms, min(per_episode, len(terms)))
+    for term in planted:
+        occurrences = 1
+        while rng.random() < 0.5 and occurrences < 8:
+            occurrences += 1
+        for _ in range(occurrences):
+            index = rng.choice(dialogue)
+            words = rows[index]["content"].split(" ")
+            position = rng.randrange(len(words))
+            if position == 0:
+                words[0] = words[0].lower()
+            words.insert(position, term)
+            content = " ".join(words)
+            rows[index]["content"] = content[0].upper() + content[1:]
+    return [SubtitleBlock(int(r["index"]), r["start"], r["end"], r["content"]) for r in rows], planted
+
+
+def oracle_extract(parts: List[str], terms: List[str]) -> Set[str]:
+    """代替 LLM：返回送出的文本中出现的术语 (整词、忽略大小写)"""
+    patterns = [(t, re.compile(rf"(?<!\w){re.escape(t)}(?!\w)", re.I)) for t in terms]
+    found = set()
+    for part in parts:
+        found.update(t for t, pattern in patterns if t not in found and pattern.search(part))
+    return found
+
+
+def evaluate(episodes: List[Tuple[str, List[SubtitleBlock], Optional[List[str]]]], sample_rate: float,
+             initial_known: Set[str]) -> List[Dict]:
+    """按顺序处理各集，两种方式各自维护历史术语表；候选预筛另外维护背景词频模型"""
+    background = TermBackground(path="")
+    known = {"cyclic": set(initial_known), "prefilter": set(initial_known)}
+    rows = []
+    for name, blocks, terms in episodes:
+        row = {"episode": name, "blocks": len(blocks), "background_docs": background.documents}
+        full_text = "\n".join(b.content for b in blocks)
+        present = sorted(oracle_extract([full_text], terms)) if terms else []
+        _, cyclic_parts = _cyclic_sample_parts(blocks)
+        historical = [t for t in present if t in known["prefilter"]]
+        selected, sampled, all_candidates = select_lines_with_unresolved_candidates(
+            blocks, historical, background, sample_rate)
+        prefilter_parts = _chunk_lines(selected)
+        # 与流水线一致：确认为术语的候选 (本集提取到的与历史术语表中的) 不计入背景词频
+        background.add_document(all_candidates, confirmed=oracle_extract(prefilter_parts, present) | set(historical))
+        row["lines_sent"] = len(selected)
+        row["lines_sampled"] = sampled
+        for method, parts in (("cyclic", cyclic_parts), ("prefilter", prefilter_parts)):
+            r = row[method] = {"calls": len(parts), "chars": sum(len(p) for p in parts)}
+            if terms:
+                found = oracle_extract(parts, present)
+                covered = found | (known[method] & set(present))
+                r["coverage"] = len(covered) / len(present) if present else 1.0
+                new = [t for t in present if t not in known[method]]
+                r["new_recall"] = (sum(1 for t in new if t in found) / len(new)) if new else 1.0
+                known[method] |= found
+        rows.append(row)
+    return rows
+
+
+def print_rows(rows: List[Dict], with_recall: bool):
+    for row in rows:
+        c, p = row["cyclic"], row["prefilter"]
+        line = (f"{row['episode']:<14} 块 {row['blocks']:>5} | 背景 {row['background_docs']:>3} 集 | "
+                f"请求 {c['calls']:>3} -> {p['calls']:>3} | 发送行 {row['lines_sent']:>5} (抽样 {row['lines_sampled']})")
+        if with_recall:
+            line += f" | 覆盖率 {c['coverage']:6.1%} -> {p['coverage']:6.1%} | 新术语召回 {c['new_recall']:6.1%} -> {p['new_recall']:6.1%}"
+        print(line)
+
+
+def summarize(rows: List[Dict], with_recall: bool, label: str) -> Dict:
+    if not rows:
+        return {}
+    summary = {"episodes": len(rows)}
+    for method in ("cyclic", "prefilter"):
+        summary[method] = {"calls": sum(r[method]["calls"] for r in rows),
+                           "chars": sum(r[method]["chars"] for r in rows)}
+        if with_recall:
+            summary[method]["coverage"] = sum(r[method]["coverage"] for r in rows) / len(rows)
+            summary[method]["new_recall"] = sum(r[method]["new_recall"] for r in rows) / len(rows)
+    c, p = summary["cyclic"], summary["prefilter"]
+    text = (f"{label:<10} {len(rows):>3} 集 | 请求 {c['calls']} -> {p['calls']} ({p['calls'] / max(1, c['calls']) - 1:+.1%}) | "
+            f"发送字数 {c['chars']} -> {p['chars']}")
+    if with_recall:
+        text += (f" | 平均覆盖率 {c['coverage']:.1%} -> {p['coverage']:.1%}"
+                 f" | 平均新术语召回 {c['new_recall']:.1%} -> {p['new_recall']:.1%}")
+    print(text)
+    return summary
+
+
+def load_terms(path: str) -> List[str]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="术语提取候选预筛评估：循环采样 vs 候选预筛 (请求数与召回)")
+    parser.add_argument("--files", nargs="*", default=None, help="按顺序评估的 SRT 文件 (不传则使用合成剧集)")
+    parser.add_argument("--terms", default=None, help="真实文件的期望术语列表 (每行一个)，用于计算召回")
+    parser.add_argument("--shows", type=int, default=4, help="合成用例的剧数")
+    parser.add_argument("--episodes", type=int, default=16, help="合成用例的总集数 (各剧交替)")
+    parser.add_argument("--blocks", type=int, default=800, help="每集字幕块数")
+    parser.add_argument("--terms-per-show", type=int, default=120, help="每部剧的术语数")
+    parser.add_argument("--terms-per-episode", type=int, default=40, help="每集埋入的术语数")
+    parser.add_argument("--known", type=float, default=0.2, help="初始已在历史术语表中的术语比例")
+    parser.add_argument("--sample-rate", type=float, default=0.05, help="不含未收录候选的行的随机抽样比例")
+    parser.add_argument("--json", default=None, help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    initial_known: Set[str] = set()
+    if args.files:
+        terms = load_terms(args.terms) if args.terms else None
+        episodes = [(os.path.basename(path)[:14], list(iter_srt(path)), terms) for path in args.files]
+    else:
+        shows = [make_series_terms(rng, args.terms_per_show) for _ in range(args.shows)]
+        for show in shows:
+            initial_known.update(rng.sample(show, int(len(show) * args.known)))
+        episodes = []
+        for i in range(args.episodes):
+            blocks, planted = make_episode(1000 + i, shows[i % args.shows], args.blocks, args.terms_per_episode)
+            episodes.append((f"S{i % args.shows + 1}E{i // args.shows + 1:02d}", blocks, planted))
+
+    with_recall = any(terms for _, _, terms in episodes)
+    rows = evaluate(episodes, args.sample_rate, initial_known)
+    print_rows(rows, with_recall)
+    print()
+    report = {
+        "rows": rows,
+        "all": summarize(rows, with_recall, "全部"),
+        "warm": summarize([r for r in rows if r["background_docs"] >= MIN_BACKGROUND_DOCS], with_recall, "背景就绪后"),
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+# 允许导入 subtitle/core 下的模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.translation_memory import TranslationMemory
+from synth import COMMON_WORDS, make_line
+
+
+def perturb(line: str, rng: random.Random) -> str:
+    """制造近似句：改标点或替换一个词"""
+    if rng.random() < 0.5:
+        return line.replace(" ", ", ", 1).rstrip(".!?") + rng.choice(["!", "?", "."])
+    words = line.split()
+    words[rng.randrange(len(words))] = rng.choice(COMMON_WORDS)
+    return " ".join(words)
+
+
+def run(sizes, queries: int, threshold: float, seed: int):
+    rng = random.Random(seed)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tm = TranslationMemory(os.path.join(tmp, "bench_tm.db"))
+        stored = []
+        total_insert_time = 0.0
+        for size in sorted(sizes):
+            # 1. 增量构建索引到目标规模
+            batch_insert_time = 0.0
+            new_lines = size - len(stored)
+            while len(stored) < size:
+                chunk = [make_line(rng) for _ in range(min(10000, size - len(stored)))]
+                started = time.perf_counter()
+                tm.add_pairs([(line, "译文") for line in chunk], "zh", "bench")
+                batch_insert_time += time.perf_counter() - started
+                stored.extend(chunk)
+            total_insert_time += batch_insert_time
+
+            # 2. 查询：一半是库中句子的近似变体，一半是全新句子
+            latencies, found = [], 0
+            probes = [(perturb(rng.choice(stored), rng), True) for _ in range(queries // 2)]
+            probes += [(make_line(rng), False) for _ in range(queries - len(probes))]
+            for text, expect in probes:
+                started = time.perf_counter()
+                matches = tm.fuzzy_lookup(text, "zh", "bench", min_similarity=threshold)
+                latencies.append(time.perf_counter() - started)
+                if expect and matches:
+                    found += 1
+
+            row = {
+                "stored_lines": size,
+                "insert_us_per_line": (batch_insert_time / new_lines * 1e6) if new_lines else 0.0,
+                "query_ms_p50": statistics.median(latencies) * 1000,
+                "query_ms_p95": sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000,
+                "near_duplicate_recall": found / max(1, queries // 2),
+            }
+            results.append(row)
+            print(f"{size:>10} 行 | 写入 {row['insert_us_per_line']:8.1f} µs/行 | "
+                  f"查询 p50 {row['query_ms_p50']:6.2f} ms, p95 {row['query_ms_p95']:6.2f} ms | "
+                  f"近似句召回 {row['near_duplicate_recall']:.1%}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="翻译记忆模糊查询基准：验证索引构建与查询耗时不随库规模线性增长")
+    parser.add_argument("--sizes", default="10000,100000", help="逗号分隔的库规模，例如 10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=200, help="每个规模下的查询次数")
+    parser.add_argument("--threshold", type=float, default=0.6, help="模糊匹配最低相似度")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", default=None, help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = run(sizes, args.queries, args.threshold, args.seed)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# 连续成功多少次后尝试扩大批次
+GROW_AFTER = 4
+# 扩大批次所需的最低成功率
+GROW_MIN_SUCCESS_RATE = 0.9
+# 成功率低于此值时缩小批次
+SHRINK_BELOW_SUCCESS_RATE = 0.7
+# 计算成功率所需的最少样本数
+MIN_SAMPLES = 3
+# 候选批次的单行耗时比当前批次差多少倍以上时，不再扩大
+LATENCY_TOLERANCE = 1.25
+# 成功率与单行耗时的指数滑动平均系数（近期表现权重更高，避免历史失败永久锁死批次）
+EWMA_ALPHA = 0.3
+
+# 按模型名缓存的控制器实例 (关闭自适应时另按固定的批次大小区分)
+_controllers: Dict[str, "AdaptiveBatchController"] = {}
+
+
+def build_ladder(size: int) -> List[int]:
+    """由当前批次大小生成降级梯次，例如 8 -> [8, 6, 4, 2, 1]"""
+    size = max(1, size)
+    steps = {size, size * 3 // 4}
+    divisor = 2
+    while size // divisor >= 1:
+        steps.add(size // divisor)
+        divisor *= 2
+    steps.add(1)
+    return sorted((s for s in steps if s >= 1), reverse=True)
+
+
+class AdaptiveBatchController:
+    """
+    自适应批次控制器：按阶段统计各批次大小的校验成功率与单行耗时，
+    在运行中动态扩大或缩小批次，并按模型持久化学到的批次大小。
+    """
+    def __init__(self, model_name: str, initial_size: int, min_size: int = 1, max_size: int = 32,
+                 profile_path: str = None, enabled: bool = True):
+        self.model_name = model_name
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.profile_path = profile_path
+        self.enabled = enabled
+        self.sizes: Dict[str, int] = {}
+        # stats[stage][size] = {"attempts": n, "success_rate": 滑动成功率, "line_latency": 秒/行,
+        #                       "transport_failures": 传输层失败次数 (不计入成功率)}
+        self.stats: Dict[str, Dict[str, Dict]] = {}
+        self._success_streak: Dict[str, int] = {}
+        self._fail_streak: Dict[str, int] = {}
+        self._default_size = self._clamp(initial_size) if enabled else max(1, int(initial_size))
+        if self.enabled:
+            self._load_profile()
+
+    def _clamp(self, size: int) -> int:
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    def current_size(self, stage: str) -> int:
+        return self.sizes.get(stage, self._default_size)
+
+    def ladder(self, stage: str, remaining: int) -> List[int]:
+        """返回当前阶段可用的梯次（首档不超过剩余块数）"""
+        return build_ladder(min(self.current_size(stage), max(1, remaining)))
+
+    def record(self, stage: str, size: int, success: bool, latency: float):
+        """记录一次请求结果，并据此调整该阶段的批次大小"""
+        stage_stats = self.stats.setdefault(stage, {})
+        entry = stage_stats.setdefault(str(size), {"attempts": 0, "success_rate": None, "line_latency": None})
+        entry["attempts"] += 1
+        outcome = 1.0 if success else 0.0
+        if entry.get("success_rate") is None:
+            entry["success_rate"] = outcome
+        else:
+            entry["success_rate"] = EWMA_ALPHA * outcome + (1 - EWMA_ALPHA) * entry["success_rate"]
+        if success:
+            per_line = latency / max(1, size)
+            if entry["line_latency"] is None:
+                entry["line_latency"] = per_line
+            else:
+                entry["line_latency"] = EWMA_ALPHA * per_line + (1 - EWMA_ALPHA) * entry["line_latency"]
+
+        # 只有满批次的请求才参与调整，尾部不足一批的请求只做统计
+        if not self.enabled or size != self.current_size(stage):
+            return
+
+        if success:
+            self._fail_streak[stage] = 0
+            self._success_streak[stage] = self._success_streak.get(stage, 0) + 1
+            if self._success_streak[stage] >= GROW_AFTER:
+                self._try_grow(stage, size)
+        else:
+            self._success_streak[stage] = 0
+            self._fail_streak[stage] = self._fail_streak.get(stage, 0) + 1
+            rate = self.success_rate(stage, size)
+            if self._fail_streak[stage] >= 2 or (rate is not None and rate < SHRINK_BELOW_SUCCESS_RATE):
+                self._shrink(stage, size)
+
+    def record_transport_failure(self, stage: str, size: int):
+        """
+        记录一次传输层失败 (请求超时、连接错误或重试耗尽后仍无响应)：
+        与批次大小无关，只做统计，不计入校验成功率，也不触发批次调整
+        """
+        entry = self.stats.setdefault(stage, {}).setdefault(
+            str(size), {"attempts": 0, "success_rate": None, "line_latency": None})
+        entry["transport_failures"] = entry.get("transport_failures", 0) + 1
+
+    def success_rate(self, stage: str, size: int):
+        entry = self.stats.get(stage, {}).get(str(size))
+        if not entry or entry["attempts"] < MIN_SAMPLES:
+            return None
+        return entry.get("success_rate")
+
+    def _try_grow(self, stage: str, size: int):
+        self._success_streak[stage] = 0
+        rate = self.success_rate(stage, size)
+        if size >= self.max_size or (rate is not None and rate < GROW_MIN_SUCCESS_RATE):
+            return
+        candidate = self._clamp(size + max(1, size // 4))
+        current_entry = self.stats.get(stage, {}).get(str(size), {})
+        cand_entry = self.stats.get(stage, {}).get(str(candidate))
+        if cand_entry:
+            cand_rate = self.success_rate(stage, candidate)
+            cur_lat, cand_lat = current_entry.get("line_latency"), cand_entry.get("line_latency")
+            rate_blocked = cand_rate is not None and cand_rate < SHRINK_BELOW_SUCCESS_RATE
+            latency_blocked = bool(cur_lat and cand_lat and cand_lat > cur_lat * LATENCY_TOLERANCE)
+            if rate_blocked or latency_blocked:
+                # 候选批次的历史记录较差：暂不扩大，但让旧记录逐步淡化，稍后重新试探
+                if cand_entry.get("success_rate") is not None:
+                    cand_entry["success_rate"] = EWMA_ALPHA + (1 - EWMA_ALPHA) * cand_entry["success_rate"]
+                if cur_lat and cand_lat:
+                    cand_entry["line_latency"] = EWMA_ALPHA * cur_lat + (1 - EWMA_ALPHA) * cand_lat
+                return
+        self.sizes[stage] = candidate
+        logger.info(f"[{stage.upper()}] 批次表现稳定，批次大小 {size} -> {candidate}")
+
+    def _shrink(self, stage: str, size: int):
+        self._fail_streak[stage] = 0
+        candidate = self._clamp(size * 3 // 4 if size > 1 else 1)
+        if candidate >= size:
+            return
+        self.sizes[stage] = candidate
+        logger.info(f"[{stage.upper()}] 校验失败率过高，批次大小 {size} -> {candidate}")
+
+    def _load_profile(self):
+        if not self.profile_path or not os.path.exists(self.profile_path):
+            return
+        try:
+            with open(self.profile_path, 'r', encoding='utf-8') as f:
+                profile = json.load(f).get(self.model_name, {})
+        except (json.JSONDecodeError, IOError):
+            return
+        for stage, data in profile.items():
+            if isinstance(data, dict) and data.get("size"):
+                self.sizes[stage] = self._clamp(data["size"])
+                self.stats[stage] = data.get("stats", {})
+        if self.sizes:
+            logger.info(f"已加载模型 {self.model_name} 的批次画像: {self.sizes}")
+
+    def save(self):
+        """将学到的批次大小写回画像文件（与其他模型的记录合并）"""
+        if not self.enabled or not self.profile_path or not self.stats:
+            return
+        data = {}
+        if os.path.exists(self.profile_path):
+            try:
+                with open(self.profile_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                data = {}
+        data[self.model_name] = {
+            stage: {"size": self.current_size(stage), "stats": self.stats.get(stage, {})}
+            for stage in set(self.sizes) | set(self.stats)
+        }
+        tmp_path = self.profile_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.profile_path)
+
+
+def get_batch_controller(config) -> AdaptiveBatchController:
+    # 同一进程中先后有自适应与固定批次的任务 (如磁带录制/回放) 时，各自使用独立的控制器
+    key = config.model_name if config.adaptive_batch else f"{config.model_name}::fixed{config.batch_size}"
+    controller = _controllers.get(key)
+    if controller is None:
+        controller = AdaptiveBatchController(
+            model_name=config.model_name,
+            initial_size=config.batch_size,
+            min_size=config.min_batch_size,
+            max_size=config.max_batch_size,
+            profile_path=config.batch_profile_path,
+            enabled=config.adaptive_batch,
+        )
+        _controllers[key] = controller
+    return controller
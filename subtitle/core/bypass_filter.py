@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import re
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+from .config import BYPASS_RULES_PATH
+from .subtitle_io import SubtitleBlock
+
+logger = logging.getLogger(__name__)
+
+# 字幕中常见的格式标签：SRT 的 <i>...</i> 与 ASS 的 {\an8} 等
+_TAG_RE = re.compile(r'<[^>]+>|\{\\[^}]*\}')
+# 没有任何字母、数字以外的可读内容：纯标点 / 纯符号 / 纯数字 (含时间、比分等)
+_NO_WORDS_RE = re.compile(r'^[\W\d_]*$', re.UNICODE)
+# 只含音乐符号的行
+_MUSIC_RE = re.compile(r'^[♪♫♬#\s\-–—.…~]+$')
+# 整行都是括号内的音效说明，例如 [door slams] / (laughs)
+_SOUND_EFFECT_RE = re.compile(r'^[\[(（【]([^\])）】]+)[\])）】]$')
+_TRAILING_PUNCT_RE = re.compile(r'^(.*?)([\s.,!?;:…。，！？；：\-—]*)$', re.DOTALL)
+
+
+class TrivialLineFilter:
+    """
+    无需 LLM 的字幕行预分类器：音乐提示、纯标点/数字、音效说明、
+    与术语表完全一致的专名，以及规则表中配置的固定译法，都在本地直接给出结果。
+    规则表 (bypass_rules.json) 格式：
+    {
+        "copy_sound_effects": true,
+        "copy_patterns": ["^\\\\[.*\\\\]$"],
+        "table": {"zh": {"[laughs]": "[笑]"}, "en": {"[笑]": "[laughs]"}}
+    }
+    """
+    def __init__(self, rules_path: str = BYPASS_RULES_PATH):
+        self.rules_path = rules_path
+        self.copy_sound_effects = True
+        self.copy_patterns: List[re.Pattern] = []
+        self.table: Dict[str, Dict[str, str]] = {}
+        self._load_rules()
+
+    def _load_rules(self):
+        if not self.rules_path or not os.path.exists(self.rules_path):
+            return
+        try:
+            with open(self.rules_path, 'r', encoding='utf-8') as f:
+                rules = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"跳过规则表读取失败，使用内置规则: {e}")
+            return
+        self.copy_sound_effects = bool(rules.get("copy_sound_effects", True))
+        for pattern in rules.get("copy_patterns", []):
+            try:
+                self.copy_patterns.append(re.compile(pattern))
+            except re.error as e:
+                logger.warning(f"忽略无效的跳过规则 {pattern!r}: {e}")
+        for lang, mapping in rules.get("table", {}).items():
+            self.table[lang] = {k.strip().lower(): v for k, v in mapping.items()}
+
+    def classify_line(self, line: str, target_lang: str, glossary_lower: Dict[str, str]) -> Optional[str]:
+        """返回单行的本地译文；需要交给 LLM 时返回 None"""
+        plain = _TAG_RE.sub('', line).strip()
+        if _NO_WORDS_RE.match(plain) or _MUSIC_RE.match(plain):
+            return line
+
+        key = plain.lower()
+        table = self.table.get(target_lang, {})
+        if key in table:
+            return table[key]
+        if any(p.search(plain) for p in self.copy_patterns):
+            return line
+
+        # 句末标点不影响专名匹配，替换后原样保留
+        body, punct = _TRAILING_PUNCT_RE.match(plain).groups()
+        if body.lower() in glossary_lower:
+            return glossary_lower[body.lower()] + punct
+
+        effect = _SOUND_EFFECT_RE.match(plain)
+        if effect:
+            inner = effect.group(1).strip().lower()
+            if inner in glossary_lower:
+                return plain.replace(effect.group(1), glossary_lower[inner])
+            if self.copy_sound_effects:
+                return line
+        return None
+
+    def classify(self, blocks: List[SubtitleBlock], target_lang: str, glossary: Dict[str, str]) -> Dict[int, str]:
+        """对字幕块逐行分类，所有行都能本地解决的块返回 {块 ID: 译文}"""
+        glossary_lower = {k.strip().lower(): v for k, v in glossary.items() if k.strip()}
+        resolved: Dict[int, str] = {}
+        for b in blocks:
+            lines = b.content.split('\n')
+            results = []
+            for line in lines:
+                text = self.classify_line(line, target_lang, glossary_lower)
+                if text is None:
+                    break
+                results.append(text)
+            else:
+                resolved[b.id] = "\n".join(results)
+        return resolved
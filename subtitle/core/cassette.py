@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import asyncio
+import difflib
+import hashlib
+import logging
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 当前生效的磁带（录制或回放），由 CLI 在启动时安装
+_active: Optional["Cassette"] = None
+# 漂移报告中最多展示的未命中请求数
+MAX_DRIFT_SAMPLES = 5
+
+
+def request_key(payload: Dict) -> str:
+    """请求指纹：只取消息内容与温度，与模型名/API 地址无关，换模型配置也能回放"""
+    raw = json.dumps({"messages": payload.get("messages"), "temperature": payload.get("temperature")},
+                     ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _prompt_text(messages: List[Dict]) -> str:
+    return "\n".join(m.get("content", "") for m in messages or [])
+
+
+class Cassette:
+    """
+    LLM 请求磁带：
+    - record 模式：把每次 call_llm 的请求、响应与耗时追加写入 JSONL；
+    - replay 模式：按请求指纹返回录制的响应（同一指纹按录制顺序先进先出），
+      realtime=True 时按录制的耗时等待，否则立即返回；
+      未命中的请求视为失败 (返回 None)，结束时报告提示词漂移。
+    """
+    def __init__(self, path: str, mode: str, realtime: bool = False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"未知的磁带模式: {mode}")
+        self.path = path
+        self.mode = mode
+        self.realtime = realtime
+        self.recorded = 0
+        self.hits = 0
+        self.misses: List[Dict] = []
+        self._entries: Dict[str, deque] = defaultdict(deque)
+        self._file = None
+        if mode == "record":
+            dirname = os.path.dirname(os.path.abspath(path))
+            os.makedirs(dirname, exist_ok=True)
+            self._file = open(path, 'w', encoding='utf-8')
+        else:
+            self._load()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    @property
+    def skip_rate_limit(self) -> bool:
+        """即时回放不需要 RPM 限流；按录制耗时回放时保留限流，调度行为与真实运行一致"""
+        return self.replaying and not self.realtime
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"磁带第 {line_no} 行损坏，已跳过")
+                    continue
+                self._entries[entry["key"]].append(entry)
+                self.recorded += 1
+        logger.info(f"📼 已加载磁带 {self.path}: {self.recorded} 条录制请求")
+
+    def record(self, payload: Dict, response: Optional[str], latency: float):
+        entry = {
+            "key": request_key(payload),
+            "model": payload.get("model"),
+            "temperature": payload.get("temperature"),
+            "messages": payload.get("messages"),
+            "response": response,
+            "latency": round(latency, 4),
+            "ts": time.time(),
+        }
+        # 写入是同步的，事件循环内不会交错
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.recorded += 1
+
+    async def replay(self, payload: Dict) -> Optional[str]:
+        queue = self._entries.get(request_key(payload))
+        if not queue:
+            self.misses.append(payload)
+            if len(self.misses) <= MAX_DRIFT_SAMPLES:
+                logger.warning("📼 回放未命中：提示词与录制时不同，按请求失败处理")
+            return None
+        entry = queue.popleft()
+        self.hits += 1
+        if self.realtime and entry.get("latency"):
+            await asyncio.sleep(entry["latency"])
+        return entry.get("response")
+
+    def _nearest_unused(self, messages: List[Dict]) -> Optional[Dict]:
+        """在未被消费的录制中找与未命中请求最接近的一条（同模板开头的优先）"""
+        text = _prompt_text(messages)
+        head = text[:80]
+        candidates = [e for q in self._entries.values() for e in q]
+        same_head = [e for e in candidates if _prompt_text(e["messages"])[:80] == head]
+        best, best_ratio = None, 0.0
+        for entry in (same_head or candidates)[:50]:
+            ratio = difflib.SequenceMatcher(None, text, _prompt_text(entry["messages"])).quick_ratio()
+            if ratio > best_ratio:
+                best, best_ratio = entry, ratio
+        return best
+
+    def drift_report(self) -> str:
+        unused = sum(len(q) for q in self._entries.values())
+        lines = [f"📼 回放完成：命中 {self.hits} 次，未命中 {len(self.misses)} 次，剩余未使用的录制 {unused} 条"]
+        for payload in self.misses[:MAX_DRIFT_SAMPLES]:
+            nearest = self._nearest_unused(payload.get("messages"))
+            if nearest is None:
+                lines.append("  - 未命中请求没有可比较的录制")
+                continue
+            diff = difflib.unified_diff(
+                _prompt_text(nearest["messages"]).splitlines(),
+                _prompt_text(payload.get("messages")).splitlines(),
+                fromfile="recorded", tofile="current", lineterm="", n=0
+            )
+            changed = [l for l in diff if l[:1] in "+-" and not l.startswith(("+++", "---"))]
+            removed = [l[1:] for l in changed if l.startswith("-")]
+            added = [l[1:] for l in changed if l.startswith("+")]
+            lines.append(f"  - 提示词漂移 ({len(changed)} 行不同):")
+            for old, new in list(zip(removed, added))[:3]:
+                # 长行只展示第一个不同字符附近的片段
+                pos = next((k for k, (a, b) in enumerate(zip(old, new)) if a != b), min(len(old), len(new)))
+                start = max(0, pos - 40)
+                lines.append(f"      - …{old[start:start + 120]}")
+                lines.append(f"      + …{new[start:start + 120]}")
+        if len(self.misses) > MAX_DRIFT_SAMPLES:
+            lines.append(f"  ... 另有 {len(self.misses) - MAX_DRIFT_SAMPLES} 个未命中请求")
+        return "\n".join(lines)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+            logger.info(f"📼 已录制 {self.recorded} 条请求到 {self.path}")
+        elif self.replaying:
+            logger.info("\n" + self.drift_report())
+
+
+def get_cassette() -> Optional[Cassette]:
+    return _active
+
+
+def install_cassette(record_path: Optional[str] = None, replay_path: Optional[str] = None,
+                     realtime: bool = False) -> Optional[Cassette]:
+    """根据 CLI 参数安装录制/回放磁带；两者都未指定时不做任何事"""
+    global _active
+    if record_path and replay_path:
+        raise ValueError("--record 与 --replay 不能同时使用")
+    if record_path:
+        _active = Cassette(record_path, "record")
+    elif replay_path:
+        _active = Cassette(replay_path, "replay", realtime=realtime)
+    return _active
+
+
+def close_cassette():
+    global _active
+    if _active is not None:
+        _active.close()
+        _active = None
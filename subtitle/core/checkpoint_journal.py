@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from .srt_utils import parse_srt
+from .config import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".jsonl"
+# 组装输出时先写入该临时文件，写完后原子替换为正式输出
+PART_SUFFIX = ".part"
+
+
+def journal_path_for(progress_file: str) -> str:
+    """进度文件路径 -> 断点日志路径 (兼容旧版传入 .json 的进度文件路径)"""
+    root, ext = os.path.splitext(progress_file)
+    return progress_file if ext == JOURNAL_SUFFIX else root + JOURNAL_SUFFIX
+
+
+def _fsync_dir(path: str):
+    """替换文件后同步所在目录，保证重命名本身落盘 (Windows 不支持打开目录，直接跳过)"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_replace(src: str, dst: str):
+    """把已写完的临时文件原子替换为目标文件：先 fsync 内容，再 rename，最后 fsync 目录"""
+    with open(src, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(src, dst)
+    _fsync_dir(dst)
+
+
+class CheckpointJournal:
+    """
+    追加式断点日志 (JSONL)，按字幕块 ID 保存译文。每提交一个批次追加一行：
+        {"ids": [...], "tr": [...]}
+    JSON 不支持整数键，ID 与译文分成两个等长数组保存。
+    - 批次可以按任意顺序提交，输出文件在全部完成后按原文顺序一次性组装；
+    - 追加为 O(批次)；每 fsync_every 条记录 fsync 一次；
+    - 恢复时顺序重放日志 (O(已完成))，末尾写了一半的行会被截掉；
+    - compact() 把全部记录合并为一行快照 ({"snapshot": true, ...})，经临时文件原子替换；
+      finalized 标记输出文件已按当前日志组装完毕。
+    """
+    def __init__(self, path: str, fsync_every: int = 8):
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.translations: Dict[int, str] = {}
+        self.finalized = False
+        self.records = 0
+        self._unsynced = 0
+        self._file = None
+
+    # ------------------------------------------------------------------ 读取
+
+    def load(self, repair: bool = True) -> "CheckpointJournal":
+        """
+        重放日志。repair=False 时只读 (供任务运行中导出预览)，
+        不截断末尾不完整的记录，避免与正在写入的进程冲突。
+        """
+        if not os.path.exists(self.path):
+            return self
+        good_offset = 0
+        with open(self.path, 'rb') as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    break
+                self._apply(record)
+                good_offset += len(raw)
+        if repair and good_offset != os.path.getsize(self.path):
+            # 崩溃时写了一半的行：丢弃它及之后的内容
+            logger.warning(f"⚠️ 断点日志 {self.path} 末尾记录不完整，已截断")
+            with open(self.path, 'r+b') as f:
+                f.truncate(good_offset)
+        return self
+
+    def _apply(self, record: Dict):
+        if record.get("snapshot"):
+            self.translations = {}
+            self.records = 0
+        self.translations.update(zip(record["ids"], record["tr"]))
+        self.finalized = bool(record.get("finalized"))
+        self.records += 1
+
+    # ------------------------------------------------------------------ 写入
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def append(self, ids: List[int], translations: List[str]):
+        f = self._open()
+        f.write(json.dumps({"ids": ids, "tr": translations}, ensure_ascii=False) + "\n")
+        f.flush()
+        self.translations.update(zip(ids, translations))
+        self.finalized = False
+        self.records += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def reset(self, translations: Optional[Dict[int, str]] = None):
+        """以给定译文重写日志 (全新任务或迁移旧版进度文件时使用)"""
+        self.translations = dict(translations or {})
+        self.finalized = False
+        self.compact()
+
+    def compact(self, finalized: Optional[bool] = None):
+        """将所有记录合并为一行快照：先写临时文件，再原子替换，崩溃时旧日志保持完整"""
+        self.close()
+        if finalized is not None:
+            self.finalized = finalized
+        ids = sorted(self.translations)
+        snapshot = {"snapshot": True, "ids": ids, "tr": [self.translations[i] for i in ids]}
+        if self.finalized:
+            snapshot["finalized"] = True
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+        atomic_replace(tmp_path, self.path)
+        self.records = 1
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+def legacy_progress_paths(input_file: str, target_lang: str, progress_file: Optional[str] = None) -> List[str]:
+    """
+    旧版 JSON 进度文件可能的位置：显式指定了进度文件时为同名的 .json；
+    否则为旧版按文件名 MD5 命名的 progress_<md5>_<lang>.json
+    (旧版缓存目录是当前工作目录下的 .cache，新版默认的 CACHE_DIR 也一并查找)。
+    """
+    if progress_file:
+        return [os.path.splitext(progress_file)[0] + ".json"]
+    file_hash = hashlib.md5(os.path.basename(input_file).encode('utf-8')).hexdigest()
+    name = f"progress_{file_hash}_{target_lang}.json"
+    paths = []
+    for cache_dir in (".cache", CACHE_DIR):
+        path = os.path.join(cache_dir, name)
+        if os.path.abspath(path) not in map(os.path.abspath, paths):
+            paths.append(path)
+    return paths
+
+
+def load_legacy_progress(legacy_files: Iterable[str], output_file: str, blocks: Iterable, bilingual_output: bool) -> Optional[Dict]:
+    """
+    读取旧版 JSON 进度文件 (只记录已处理 ID，译文只存在于输出文件中)，
+    按 ID 顺序从旧输出文件中找回译文；块数对不上时返回 None，交由调用方重新开始。
+    legacy_files: 候选路径 (见 legacy_progress_paths)，使用第一个存在的文件
+    """
+    legacy_file = next((path for path in legacy_files if os.path.exists(path)), None)
+    if legacy_file is None:
+        return None
+    try:
+        with open(legacy_file, 'r', encoding='utf-8') as f:
+            progress = json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return None
+
+    processed = sorted({int(i) for i in progress.get("processed_indices", [])})
+    if not processed:
+        return None
+    output_blocks = parse_srt(output_file) if os.path.exists(output_file) else []
+    translated = output_blocks[1::2] if bilingual_output else output_blocks
+    known_ids = {b.id for b in blocks}
+    if len(translated) != len(processed) or not known_ids.issuperset(processed):
+        logger.warning(f"⚠️ 旧版进度文件 {legacy_file} 与输出文件不一致，无法迁移，将重新开始")
+        return None
+    return {
+        "path": legacy_file,
+        "translations": {i: b.content for i, b in zip(processed, translated)},
+    }
@@ -11,9 +11,35 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # --- 语料库路径 (供 glossary_manager 直接使用) ---
 GLOSSARY_DIR = os.path.join(BASE_DIR, 'glossaries')
-GLOSSARY_DB_PATH = os.path.join(BASE_DIR, 'glossary_cache.db')
-LLM_DISCOVERY_DB_PATH = os.path.join(BASE_DIR, 'llm_discovery.db')
-LLM_DISCOVERY_CN_DB_PATH = os.path.join(BASE_DIR, 'llm_discovery_cn.db')
+GLOSSARY_DB_PATH = os.getenv("GLOSSARY_DB_PATH", os.path.join(BASE_DIR, 'glossary_cache.db'))
+LLM_DISCOVERY_DB_PATH = os.getenv("LLM_DISCOVERY_DB_PATH", os.path.join(BASE_DIR, 'llm_discovery.db'))
+LLM_DISCOVERY_CN_DB_PATH = os.getenv("LLM_DISCOVERY_CN_DB_PATH", os.path.join(BASE_DIR, 'llm_discovery_cn.db'))
+
+# --- 任务缓存 (按内容寻址的任务目录：术语缓存、断点日志、中间 SRT) ---
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(BASE_DIR, '.cache'))
+# 清理缓存时的默认上限：超过天数未使用的任务被淘汰，总大小超限时从最久未使用的开始淘汰
+CACHE_MAX_AGE_DAYS = float(os.getenv("CACHE_MAX_AGE_DAYS", "30"))
+CACHE_MAX_SIZE_MB = float(os.getenv("CACHE_MAX_SIZE_MB", "1024"))
+
+# --- SQLite 连接参数 (语料库、发现库、翻译记忆库共用，见 core/db.py) ---
+# 内存映射读取的上限与每个连接的页缓存大小 (MB)
+SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+SQLITE_CACHE_SIZE_MB = int(os.getenv("SQLITE_CACHE_SIZE_MB", "32"))
+
+# --- 翻译记忆库 (跨文件复用润色结果) ---
+TM_DB_PATH = os.getenv("TM_DB_PATH", os.path.join(BASE_DIR, 'translation_memory.db'))
+
+# --- 自适应批次画像 (按模型持久化学到的批次大小) ---
+BATCH_PROFILE_PATH = os.getenv("BATCH_PROFILE_PATH", os.path.join(BASE_DIR, 'batch_profile.json'))
+
+# --- 术语候选预筛的背景词频 (候选在已处理文件中的文档频率，用于识别常用词) ---
+TERM_BACKGROUND_PATH = os.getenv("TERM_BACKGROUND_PATH", os.path.join(BASE_DIR, 'term_background.json'))
+
+# --- 无需翻译的字幕行的本地规则表 (固定译法 / 直接照抄的正则) ---
+BYPASS_RULES_PATH = os.path.join(BASE_DIR, 'bypass_rules.json')
+
+# --- 剧集画像 (同一部剧共享的术语表与已检查的候选短语) ---
+SERIES_DIR = os.path.join(BASE_DIR, 'series')
 
 @dataclass
 class TranslationConfig:
@@ -26,7 +52,23 @@ class TranslationConfig:
     max_concurrent_requests: int = int(os.getenv("MAX_CONCURRENT_REQUESTS", "4"))
     rpm_limit: int = int(os.getenv("RPM_LIMIT", "60"))
     batch_size: int = int(os.getenv("BATCH_SIZE", "8"))
+    # 预处理 (MKV 提取 / ASS 转 SRT) 与后处理 (生成 ASS) 的线程池大小
+    io_workers: int = int(os.getenv("IO_WORKERS", "4"))
+
+    # --- 自适应批次 ---
+    adaptive_batch: bool = os.getenv("ADAPTIVE_BATCH", "True").lower() == "true"
+    min_batch_size: int = int(os.getenv("MIN_BATCH_SIZE", "1"))
+    max_batch_size: int = int(os.getenv("MAX_BATCH_SIZE", "32"))
+    batch_profile_path: str = BATCH_PROFILE_PATH
+    # 直译阶段最多领先润色阶段的批次数（实际深度按两阶段耗时动态调整）
+    max_prefetch_window: int = int(os.getenv("MAX_PREFETCH_WINDOW", "8"))
     
+    # --- 断点日志 ---
+    # 每追加多少条批次记录 fsync 一次 (越小越安全，越大写入越快)
+    checkpoint_fsync_every: int = int(os.getenv("CHECKPOINT_FSYNC_EVERY", "8"))
+    # 恢复时日志记录数超过该值则压缩为一行快照
+    checkpoint_compact_records: int = int(os.getenv("CHECKPOINT_COMPACT_RECORDS", "200"))
+
     # --- 容错配置 ---
     max_retries: int = int(os.getenv("MAX_RETRIES", "3"))
     retry_delay: float = float(os.getenv("RETRY_DELAY", "2.0"))
@@ -36,6 +78,23 @@ class TranslationConfig:
     glossary_db_path: str = GLOSSARY_DB_PATH
     llm_discovery_db_path: str = LLM_DISCOVERY_DB_PATH
     enable_llm_discovery: bool = os.getenv("ENABLE_LLM_DISCOVERY", "True").lower() == "true"
+    # 是否把本次提取到的术语写入发现库 (录制/回放磁带时关闭，两次运行看到相同的历史术语)
+    save_discovered_terms: bool = True
+
+    # --- 翻译记忆配置 ---
+    enable_translation_memory: bool = os.getenv("ENABLE_TRANSLATION_MEMORY", "True").lower() == "true"
+    enable_tm_fuzzy: bool = os.getenv("ENABLE_TM_FUZZY", "True").lower() == "true"
+    # 模糊相似度 >= 复用阈值：直接复用；介于两阈值之间：作为润色参考译文
+    tm_fuzzy_reuse_threshold: float = float(os.getenv("TM_FUZZY_REUSE_THRESHOLD", "0.9"))
+    tm_fuzzy_reference_threshold: float = float(os.getenv("TM_FUZZY_REFERENCE_THRESHOLD", "0.6"))
+
+    # --- 术语提取的本地候选预筛 (无剧集画像时只发送含未收录候选的行，另按比例随机抽样保证召回) ---
+    enable_term_prefilter: bool = os.getenv("ENABLE_TERM_PREFILTER", "True").lower() == "true"
+    term_prefilter_sample_rate: float = float(os.getenv("TERM_PREFILTER_SAMPLE_RATE", "0.05"))
+
+    # --- 琐碎行跳过 (音乐提示、纯标点/数字、音效、术语表专名等不发送给 LLM) ---
+    enable_bypass_filter: bool = os.getenv("ENABLE_BYPASS_FILTER", "True").lower() == "true"
+    bypass_rules_path: str = BYPASS_RULES_PATH
     
     # [新增] 目标语言，默认中文 'zh'，可选英文 'en'
     target_lang: str = "zh" 
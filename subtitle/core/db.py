@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import os
+import atexit
+import asyncio
+import sqlite3
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional
+
+from .config import SQLITE_MMAP_SIZE_MB, SQLITE_CACHE_SIZE_MB
+
+logger = logging.getLogger(__name__)
+
+# 其他进程 (如同时运行的 GUI 与命令行) 持有写锁时的等待时间 (秒)
+BUSY_TIMEOUT = 30
+
+
+class _PooledConnection:
+    """一个数据库文件对应的长连接；连接可跨线程使用，由 lock 串行化访问"""
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+        # 负数表示以 KiB 为单位
+        self.conn.execute(f"PRAGMA cache_size={-SQLITE_CACHE_SIZE_MB * 1024}")
+        self.file_id = self._file_id()
+
+    def _file_id(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def is_stale(self) -> bool:
+        """数据库文件被删除或替换 (如手动删库重建) 后，旧连接仍指向原来的文件，需要重新打开"""
+        return self._file_id() != self.file_id
+
+    def close(self):
+        with self.lock:
+            try:
+                self.conn.close()
+            except sqlite3.Error:
+                pass
+
+
+_pool: Dict[str, _PooledConnection] = {}
+_pool_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get(path: str) -> _PooledConnection:
+    key = os.path.abspath(path)
+    with _pool_lock:
+        pooled = _pool.get(key)
+        if pooled is not None and pooled.is_stale():
+            pooled.close()
+            pooled = None
+        if pooled is None:
+            pooled = _PooledConnection(key)
+            _pool[key] = pooled
+        return pooled
+
+
+@contextmanager
+def connect(path: str) -> Iterator[sqlite3.Connection]:
+    """
+    取出数据库的共享长连接 (不存在则创建并设置 WAL 等参数)，使用期间独占该连接。
+    正常退出时提交事务，出现异常时回滚；连接本身保持打开供后续复用。
+        with db.connect(path) as conn:
+            conn.execute(...)
+    """
+    pooled = _get(path)
+    with pooled.lock:
+        try:
+            yield pooled.conn
+        except BaseException:
+            if pooled.conn.in_transaction:
+                pooled.conn.rollback()
+            raise
+        else:
+            if pooled.conn.in_transaction:
+                pooled.conn.commit()
+
+
+def close(path: str):
+    """关闭某个数据库的共享连接 (删除数据库文件前调用)"""
+    with _pool_lock:
+        pooled = _pool.pop(os.path.abspath(path), None)
+    if pooled is not None:
+        pooled.close()
+
+
+def close_all():
+    with _pool_lock:
+        pooled_list = list(_pool.values())
+        _pool.clear()
+    for pooled in pooled_list:
+        pooled.close()
+
+
+atexit.register(close_all)
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    在专用的数据库线程中执行阻塞的数据库操作，不阻塞事件循环上正在进行的 LLM 请求。
+    单线程执行器使各任务的数据库操作按提交顺序依次执行。
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="subtitle-db")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# 字符 n-gram + MinHash LSH 工具函数，供翻译记忆的模糊查询使用。
+# 签名采用单次置换 MinHash (One Permutation Hashing + 旋转补齐)：每个 n-gram 只哈希一次，
+# 按高位分到 NUM_PERM 个桶中取最小值，计算量与句长成正比而不是与句长 × 置换数成正比。
+# 签名按 BANDS 个分段（每段 ROWS 个值）生成分桶键；
+# 两句话只要有任一分段完全相同就会成为候选，再用精确的 Jaccard 相似度复核。
+# 查询只访问命中的分桶，耗时与库的总行数无关。
+import re
+import struct
+import zlib
+import unicodedata
+from typing import List, Set
+
+NGRAM = 3
+NUM_PERM_BITS = 5
+NUM_PERM = 1 << NUM_PERM_BITS
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+
+_VALUE_BITS = 32 - NUM_PERM_BITS
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+# 旋转补齐时的偏移量，保证借用来的值不会与原桶内的值冲突
+_ROTATION_OFFSET = 1 << _VALUE_BITS
+
+_NON_WORD_RE = re.compile(r'[^\w\s]|_', re.UNICODE)
+_WHITESPACE_RE = re.compile(r'\s+')
+_DIGITS_RE = re.compile(r'\d+')
+# 句末的标点、引号与空白
+_TRAILING_NON_WORD_RE = re.compile(r'[\W_]*$')
+
+
+def fuzzy_normalize(text: str) -> str:
+    """模糊匹配用的归一化：NFKC、小写、去除标点、合并空白"""
+    text = unicodedata.normalize('NFKC', text or "").lower()
+    text = _NON_WORD_RE.sub('', text)
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def char_ngrams(norm_text: str, n: int = NGRAM) -> Set[str]:
+    if not norm_text:
+        return set()
+    if len(norm_text) <= n:
+        return {norm_text}
+    return {norm_text[i:i + n] for i in range(len(norm_text) - n + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def minhash_signature(grams: Set[str]) -> List[int]:
+    if not grams:
+        return []
+    bins = [None] * NUM_PERM
+    for g in grams:
+        # crc32 是线性校验，再乘以黄金分割常数打散高位（结果与进程无关，可持久化）
+        h = (zlib.crc32(g.encode('utf-8')) * 0x9E3779B1) & 0xFFFFFFFF
+        idx, val = h >> _VALUE_BITS, h & _VALUE_MASK
+        if bins[idx] is None or val < bins[idx]:
+            bins[idx] = val
+
+    # 旋转补齐：空桶借用其后第一个非空桶的值，并按距离加偏移
+    signature = []
+    for i in range(NUM_PERM):
+        step = 0
+        while bins[(i + step) % NUM_PERM] is None:
+            step += 1
+        signature.append(bins[(i + step) % NUM_PERM] + step * _ROTATION_OFFSET)
+    return signature
+
+
+def band_keys(signature: List[int]) -> List[int]:
+    """将签名切分为 BANDS 段，每段压缩为一个 64 位整数键（高位为段号）"""
+    if not signature:
+        return []
+    keys = []
+    for band in range(BANDS):
+        chunk = signature[band * ROWS:(band + 1) * ROWS]
+        digest = zlib.crc32(struct.pack(f'<{ROWS}Q', *chunk))
+        keys.append((band << 32) | digest)
+    return keys
+
+
+def same_numbers(a: str, b: str) -> bool:
+    """两句中的数字是否一致（数字不同的句子不能直接复用译文）"""
+    return _DIGITS_RE.findall(a) == _DIGITS_RE.findall(b)
+
+
+def sentence_type(text: str) -> str:
+    """按句末标点区分句型：'?' 疑问，其余 (含 '!' 感叹) 视为陈述 (归一化时去掉了标点，需单独比较)"""
+    tail = _TRAILING_NON_WORD_RE.search(unicodedata.normalize('NFKC', text or "")).group()
+    return '?' if '?' in tail else ''
+
+
+def same_sentence_type(a: str, b: str) -> bool:
+    """两句是否同为疑问句或同为陈述句（"You did it." 与 "You did it?" 的相似度接近 1，但译文不能直接复用）"""
+    return sentence_type(a) == sentence_type(b)
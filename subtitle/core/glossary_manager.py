@@ -1,208 +1,487 @@
 # -*- coding: utf-8 -*-
+import os
+import gc
+import sys
 import json
+import marshal
 import sqlite3
 import hashlib
 import logging
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict
-from flashtext import KeywordProcessor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 # 导入配置
-from .config import GLOSSARY_DIR, GLOSSARY_DB_PATH, LLM_DISCOVERY_DB_PATH, LLM_DISCOVERY_CN_DB_PATH, TranslationConfig
+from . import db
+from .term_matcher import TermMatcher
+from .config import GLOSSARY_DIR, GLOSSARY_DB_PATH, LLM_DISCOVERY_DB_PATH, LLM_DISCOVERY_CN_DB_PATH, CACHE_DIR, TranslationConfig
 
 logger = logging.getLogger(__name__)
 
+# 计算语料文件哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+# 预构建关键词自动机缓存的格式版本，序列化结构变化时递增使旧缓存失效
+AUTOMATON_FORMAT = 2
+# IN (...) 查询每批的参数个数，低于旧版 SQLite 的 999 个变量上限
+SQL_IN_CHUNK = 500
+
+@contextmanager
+def _gc_paused():
+    """构建/加载 trie 时会一次性创建数十万个 dict，暂停分代 GC 避免其反复扫描这些新对象"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+# 反向模式下的黑名单：习语和俚语不适合直接作为词条匹配，防止中译英时产生奇怪映射
+REVERSE_BLACKLIST = {"Idioms/Colloquialisms", "Slang"}
+
+def _index_entries(rows: Iterable[Tuple[str, str, str]], reverse: bool) -> Iterator[Tuple[str, str]]:
+    """
+    词条行 (source, target, category) -> 该方向的 (匹配词, 译法)。
+    反向时跳过黑名单类别，并把以中英文逗号分隔的多个中文译法展开为各自的匹配词。
+    """
+    for source, target, category in rows:
+        source = source.strip() if source else ""
+        target = target.strip() if target else ""
+        category = category.strip() if category else ""
+        if not source or not target:
+            continue
+        if not reverse:
+            yield source, target
+            continue
+        if category in REVERSE_BLACKLIST:
+            continue
+        for key in target.replace('，', ',').split(','):
+            key = key.strip()
+            if key:
+                yield key, source
+
+class GlossaryIndex:
+    """
+    单个翻译方向的术语索引：词条匹配器 (TermMatcher) + {匹配词: 译法}。
+    GlossaryManager 为正向/反向各保留一份，切换方向时直接取用，不重新加载。
+    """
+    def __init__(self, reverse: bool, key: Optional[List] = None):
+        self.reverse = reverse
+        # 构建该索引时的数据库版本 (见 GlossaryManager._automaton_key)，不一致时需要重新加载
+        self.key = key
+        self.matcher = TermMatcher()
+        self.term_mapping: Dict[str, str] = {}
+        # term_mapping 键的小写集合，save_terms 据此做内存去重；首次保存时才构建
+        self._keys_lower: Optional[set] = None
+
+    def __len__(self):
+        return len(self.term_mapping)
+
+    def add_entries(self, entries: Iterable[Tuple[str, str]]):
+        add = self.matcher.add
+        mapping = self.term_mapping
+        for key, value in entries:
+            add(key)
+            mapping[key] = value
+
+    def add_new_terms(self, terms: Dict[str, Tuple[str, str]]):
+        """加入新发现的词条 ({小写键: (词条, 译法)})，已有的键 (忽略大小写) 保持不变"""
+        if self._keys_lower is None:
+            self._keys_lower = {k.lower() for k in self.term_mapping}
+        for s_l, (s_c, t_c) in terms.items():
+            if s_l not in self._keys_lower:
+                self.matcher.add(s_c)
+                self.term_mapping[s_c] = t_c
+                self._keys_lower.add(s_l)
+
+    def extract_terms(self, text: str) -> Dict[str, str]:
+        found_sources = self.matcher.find(text)
+        result = {}
+        for source in set(found_sources):
+            if source in self.term_mapping:
+                result[source] = self.term_mapping[source]
+        return result
+
 class GlossaryManager:
     def __init__(self):
         self.glossary_dir = Path(GLOSSARY_DIR)
         self.db_path = GLOSSARY_DB_PATH
-        self.discovery_db_path = LLM_DISCOVERY_DB_PATH
+        # 发现库按翻译方向物理隔离：{reverse: 路径}
+        self.discovery_db_paths = {False: LLM_DISCOVERY_DB_PATH, True: LLM_DISCOVERY_CN_DB_PATH}
         config = TranslationConfig()
         self.enable_discovery = config.enable_llm_discovery
-        self.keyword_processor = KeywordProcessor(case_sensitive=False)
-        self.term_mapping: Dict[str, str] = {}
+        self.io_workers = max(1, config.io_workers)
+        self.automaton_cache_dir = CACHE_DIR
+        # 已加载的各方向索引 {reverse: GlossaryIndex}；两个方向各加载一次，之后按任务方向直接取用
+        self._indexes: Dict[bool, GlossaryIndex] = {}
         self._initialized = False
 
     def initialize(self, reverse=False):
-        """初始化：建表、增量更新、加载内存"""
-        # [核心修改] 根据方向选择数据库路径
-        if reverse:
-            self.discovery_db_path = LLM_DISCOVERY_CN_DB_PATH
-        else:
-            self.discovery_db_path = LLM_DISCOVERY_DB_PATH
-
+        """初始化：建表、增量更新、加载该方向的索引 (已加载且词条未变化时直接复用)"""
         # 1. 初始化精校库
         self._init_db(self.db_path)
         
         # 2. 如果启用，初始化发现库
         if self.enable_discovery:
-            self._init_db(self.discovery_db_path)
+            self._init_db(self.discovery_db_paths[reverse], discovery=True)
         
         self.incremental_update()
-        self._load_to_memory(reverse=reverse)
+        index = self._load_to_memory(reverse=reverse)
         self._initialized = True
         mode = "中->英 (反向)" if reverse else "英->中 (正向)"
-        print(f"✅ 语料库初始化完毕 [{mode}]: 内存中包含 {len(self.term_mapping)} 个术语")
-
-    def _init_db(self, db_path):
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS terms (
-                source_term TEXT PRIMARY KEY,
-                target_term TEXT,
-                category TEXT,
-                source_file TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS file_hashes (
-                filename TEXT PRIMARY KEY,
-                file_hash TEXT,
-                processed_at TIMESTAMP
-            )
-        ''')
-        conn.commit()
-        conn.close()
-
-    def _calculate_file_hash(self, file_path: Path) -> str:
+        print(f"✅ 语料库初始化完毕 [{mode}]: 内存中包含 {len(index)} 个术语")
+
+    def _init_db(self, db_path, discovery=False):
+        with db.connect(db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS terms (
+                    source_term TEXT PRIMARY KEY,
+                    target_term TEXT,
+                    category TEXT,
+                    source_file TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    filename TEXT PRIMARY KEY,
+                    file_hash TEXT,
+                    processed_at TIMESTAMP,
+                    file_size INTEGER,
+                    mtime_ns INTEGER
+                )
+            ''')
+            # 旧版数据库的 file_hashes 没有大小与修改时间列，首次运行时补上 (之后会按哈希校验一次并回填)
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(file_hashes)")}
+            for column in ("file_size", "mtime_ns"):
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE file_hashes ADD COLUMN {column} INTEGER")
+            # 词条版本号：terms 表的任何增删改都由触发器递增，用于判断预构建的关键词自动机是否过期。
+            # instance 在建库时随机生成，删除重建数据库后版本号即使归零也不会误用旧缓存
+            cursor.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('instance', lower(hex(randomblob(8))))")
+            cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('terms_version', 0)")
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS terms_version_{event.lower()} AFTER {event} ON terms
+                    BEGIN
+                        UPDATE meta SET value = value + 1 WHERE key = 'terms_version';
+                    END
+                ''')
+            # 忽略大小写的术语索引：save_terms 去重只按本批词条查索引，不再整表读入内存。
+            # 精校库的语料文件之间可能存在仅大小写不同的词条，只建普通索引；
+            # 发现库建唯一索引，供 INSERT ... ON CONFLICT 按忽略大小写的键直接更新
+            if not discovery:
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_terms_source_nocase ON terms (source_term COLLATE NOCASE)")
+            elif not cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_terms_source_nocase'").fetchone():
+                # 旧版发现库可能有仅大小写不同的重复词条，建唯一索引前只保留最后写入的一条
+                cursor.execute('''
+                    DELETE FROM terms WHERE rowid NOT IN (
+                        SELECT max(rowid) FROM terms GROUP BY source_term COLLATE NOCASE
+                    )
+                ''')
+                cursor.execute("CREATE UNIQUE INDEX uq_terms_source_nocase ON terms (source_term COLLATE NOCASE)")
+
+    def _db_version(self, db_path) -> Optional[List[str]]:
+        """数据库的 (instance, terms_version)；库不存在时返回 None"""
+        if not Path(db_path).exists():
+            return None
+        try:
+            with db.connect(db_path) as conn:
+                meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        except sqlite3.OperationalError:
+            return None
+        return [meta.get("instance"), str(meta.get("terms_version"))]
+
+    def _calculate_file_hash(self, file_path: str) -> str:
         hash_md5 = hashlib.md5()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
                 hash_md5.update(chunk)
         return hash_md5.hexdigest()
 
-    def incremental_update(self) -> int:
-        if not self.glossary_dir.exists():
-            self.glossary_dir.mkdir(parents=True, exist_ok=True)
-            return 0
-            
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT filename, file_hash FROM file_hashes")
-        processed_files = dict(cursor.fetchall())
-        
-        updated_count = 0
-        for file_path in self.glossary_dir.rglob("*.json"):
-            filename = str(file_path.relative_to(self.glossary_dir))
-            current_hash = self._calculate_file_hash(file_path)
-            if filename not in processed_files or processed_files[filename] != current_hash:
-                try:
-                    self._process_single_file(file_path, cursor)
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO file_hashes (filename, file_hash, processed_at)
-                        VALUES (?, ?, CURRENT_TIMESTAMP)
-                    ''', (filename, current_hash))
-                    updated_count += 1
-                except Exception as e:
-                    logger.error(f"处理语料文件 {filename} 失败: {e}")
-        
-        conn.commit()
-        conn.close()
-        return updated_count
-
-    def _process_single_file(self, file_path: Path, cursor: sqlite3.Cursor):
+    def _read_file_terms(self, file_path: str, filename: str) -> List[Tuple[str, str, str, str]]:
+        """读取单个语料文件，返回待写入 terms 表的行 (source, target, category, 来源文件)"""
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
         if not isinstance(data, list):
-            return
+            return []
+        rows = []
         for item in data:
             source = item.get('source_term', '').strip()
             target = item.get('target_term', '').strip()
             category = item.get('category', 'General')
             if source and target:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO terms (source_term, target_term, category, source_file, updated_at)
-                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-                ''', (source, target, category, file_path.name))
+                rows.append((source, target, category, filename))
+        return rows
 
-    def _load_to_memory(self, reverse=False):
-        self.keyword_processor = KeywordProcessor(case_sensitive=False)
-        self.term_mapping = {}
-        if self.enable_discovery:
-            self._load_from_db(self.discovery_db_path, reverse=reverse)
-        self._load_from_db(self.db_path, reverse=reverse)
+    def _scan_changed_file(self, file_path: str, filename: str, old_hash: Optional[str]):
+        """在线程池中执行：计算哈希，内容确有变化时顺带解析文件。返回 (哈希, 行列表或 None)"""
+        current_hash = self._calculate_file_hash(file_path)
+        if current_hash == old_hash:
+            return current_hash, None
+        return current_hash, self._read_file_terms(file_path, filename)
 
-    def _load_from_db(self, db_path, reverse=False):
-        if not Path(db_path).exists():
-            return
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT source_term, target_term, category FROM terms")
-        rows = cursor.fetchall()
-        
-        # 反向模式下的黑名单：习语和俚语不适合直接作为词条匹配，防止中译英时产生奇怪映射
-        REVERSE_BLACKLIST = {"Idioms/Colloquialisms", "Slang"}
-
-        for source, target, category in rows:
-            source = source.strip() if source else ""
-            target = target.strip() if target else ""
-            category = category.strip() if category else ""
-            
-            if not source or not target:
+    def _scan_glossary_dir(self):
+        """
+        递归列出语料目录下的 JSON 文件，产出 (相对路径, 路径, stat)；用 scandir 避免 pathlib 的逐文件开销。
+        以 "." 开头的文件与目录 (如 glossary_tool 的增量清单 .glossary_manifest.json) 不是语料，跳过。
+        """
+        pending = [""]
+        while pending:
+            rel_dir = pending.pop()
+            with os.scandir(os.path.join(self.glossary_dir, rel_dir)) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    rel = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                    if entry.is_dir():
+                        pending.append(rel)
+                    elif entry.name.endswith(".json") and entry.is_file():
+                        yield rel, entry.path, entry.stat()
+
+    def incremental_update(self) -> int:
+        """
+        把 glossaries/ 下的 JSON 语料同步到精校库：
+        - 大小与修改时间都未变的文件直接跳过，不读取内容；
+        - 其余文件在线程池中计算哈希，哈希相同只更新记录的大小与时间，哈希不同才解析并写入；
+        - 已从磁盘删除或内容变化的文件，其旧词条先删除 (仍被其他文件定义的词条会从那些文件中补回)；
+        - 所有写入在一个事务内用 executemany 完成。
+        返回内容有变化 (新增/修改/删除) 的文件数。
+        """
+        if not self.glossary_dir.exists():
+            self.glossary_dir.mkdir(parents=True, exist_ok=True)
+            return 0
+
+        with db.connect(self.db_path) as conn:
+            processed_files = {row[0]: row[1:] for row in conn.execute(
+                "SELECT filename, file_hash, file_size, mtime_ns FROM file_hashes")}
+
+        live_files: Dict[str, str] = {}
+        stats: Dict[str, os.stat_result] = {}
+        candidates = []
+        for filename, file_path, stat in self._scan_glossary_dir():
+            live_files[filename] = file_path
+            stats[filename] = stat
+            known = processed_files.get(filename)
+            if known and known[1] == stat.st_size and known[2] == stat.st_mtime_ns:
                 continue
+            candidates.append((file_path, filename, known[0] if known else None))
+        deleted = [name for name in processed_files if name not in live_files]
 
-            if reverse:
-                # 如果是习语类，反向时跳过
-                if category in REVERSE_BLACKLIST:
-                    continue
-                
-                # 处理中文逗号分隔的情况
-                clean_target = target.replace('，', ',')
-                possible_keys = [t.strip() for t in clean_target.split(',')]
-                
-                for key in possible_keys:
-                    if key:
-                        self.keyword_processor.add_keyword(key, key)
-                        self.term_mapping[key] = source
-            else:
-                self.keyword_processor.add_keyword(source, source)
-                self.term_mapping[source] = target
-        conn.close()
+        if not candidates and not deleted:
+            return 0
 
-    def extract_terms(self, text: str) -> Dict[str, str]:
-        found_sources = self.keyword_processor.extract_keywords(text)
-        result = {}
-        for source in set(found_sources):
-            if source in self.term_mapping:
-                result[source] = self.term_mapping[source]
-        return result
+        scanned = {}
+        if candidates:
+            with ThreadPoolExecutor(max_workers=min(self.io_workers, len(candidates))) as pool:
+                futures = {filename: pool.submit(self._scan_changed_file, path, filename, old_hash)
+                           for path, filename, old_hash in candidates}
+                for filename, future in futures.items():
+                    try:
+                        scanned[filename] = future.result()
+                    except Exception as e:
+                        logger.error(f"处理语料文件 {filename} 失败: {e}")
 
-    def save_terms(self, terms_dict: Dict[str, str], category: str = "LLM_Discovered"):
-        if not terms_dict:
-            return
-        if self.enable_discovery:
-            main_conn = sqlite3.connect(self.db_path)
-            main_cursor = main_conn.cursor()
-            main_cursor.execute("SELECT source_term FROM terms")
-            main_keys = {row[0].lower() for row in main_cursor.fetchall()}
-            main_conn.close()
+        changed = [name for name, (_, rows) in scanned.items() if rows is not None]
+        changed_set = set(changed)
+        # 旧版本按文件名 (不含目录) 记录来源，只在该文件名唯一时才按它匹配旧词条
+        basename_counts = Counter(Path(name).name for name in live_files)
+        stale_sources = []
+        for name in changed + deleted:
+            stale_sources.append(name)
+            base = Path(name).name
+            if base != name and basename_counts[base] <= (0 if name in deleted else 1):
+                stale_sources.append(base)
 
-            conn = sqlite3.connect(self.discovery_db_path)
+        # 哈希与解析在连接外完成，只有写入阶段占用共享连接
+        with db.connect(self.db_path) as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT source_term, target_term FROM terms")
-            existing_discovery = {row[0].lower(): row[1] for row in cursor.fetchall()}
-
-            for source, target in terms_dict.items():
-                s_c, t_c = source.strip(), target.strip()
-                s_l = s_c.lower()
-                if not s_c or not t_c or s_l in main_keys:
-                    continue
-                if s_l in existing_discovery and existing_discovery[s_l] == t_c:
-                    continue
-                cursor.execute('''
-                    INSERT OR REPLACE INTO terms (source_term, target_term, category, source_file, updated_at)
-                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-                ''', (s_c, t_c, category, "dynamic_cache"))
-            conn.commit()
-            conn.close()
-        
+            removed = set()
+            if stale_sources:
+                placeholders = ",".join("?" * len(stale_sources))
+                removed = {row[0] for row in cursor.execute(
+                    f"SELECT source_term FROM terms WHERE source_file IN ({placeholders})", stale_sources)}
+                cursor.execute(f"DELETE FROM terms WHERE source_file IN ({placeholders})", stale_sources)
+
+            new_rows = [row for name in changed for row in scanned[name][1]]
+            orphans = removed - {row[0] for row in new_rows}
+            if orphans:
+                # 被删掉的词条如果还由其他 (未变化的) 文件定义，从这些文件中补回
+                for name, path in live_files.items():
+                    if name in changed_set:
+                        continue
+                    try:
+                        new_rows.extend(row for row in self._read_file_terms(path, name) if row[0] in orphans)
+                    except Exception as e:
+                        logger.error(f"处理语料文件 {name} 失败: {e}")
+            cursor.executemany('''
+                INSERT OR REPLACE INTO terms (source_term, target_term, category, source_file, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', new_rows)
+
+            cursor.executemany('''
+                INSERT OR REPLACE INTO file_hashes (filename, file_hash, processed_at, file_size, mtime_ns)
+                VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?)
+            ''', [(name, file_hash, stats[name].st_size, stats[name].st_mtime_ns)
+                  for name, (file_hash, _) in scanned.items()])
+            cursor.executemany("DELETE FROM file_hashes WHERE filename = ?", [(name,) for name in deleted])
+
+        if changed or deleted:
+            logger.info(f"📚 语料库增量更新: {len(changed)} 个文件有变化，{len(deleted)} 个文件已删除")
+        return len(changed) + len(deleted)
+
+    def _automaton_cache_path(self, reverse: bool) -> str:
+        """每个方向、每组数据库路径各一个缓存文件，基准测试等使用临时库时不会覆盖正式缓存"""
+        paths = f"{os.path.abspath(self.db_path)}|{os.path.abspath(self.discovery_db_paths[reverse])}"
+        digest = hashlib.sha1(paths.encode('utf-8')).hexdigest()[:12]
+        direction = "rev" if reverse else "fwd"
+        return os.path.join(self.automaton_cache_dir, f"glossary_automaton_{direction}_{digest}.marshal")
+
+    def _automaton_key(self, reverse: bool) -> List:
+        return [AUTOMATON_FORMAT, list(sys.version_info[:2]), reverse, self.enable_discovery,
+                self._db_version(self.db_path),
+                self._db_version(self.discovery_db_paths[reverse]) if self.enable_discovery else None]
+
+    def _load_automaton(self, path: str, key: List, reverse: bool) -> Optional[GlossaryIndex]:
+        """加载预构建的词条匹配器 (trie) 与 term_mapping；缓存缺失、损坏或过期时返回 None"""
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            # marshal.load 直接读文件对象会逐段调用 read，先整体读入再 loads 快得多
+            with _gc_paused():
+                data = marshal.loads(raw)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(data, dict) or data.get("key") != key:
+            return None
+        index = GlossaryIndex(reverse, key)
+        index.matcher = TermMatcher.from_data(data["matcher"])
+        index.term_mapping = data["mapping"]
+        return index
+
+    def _save_automaton(self, path: str, index: GlossaryIndex):
+        data = {"key": index.key, "matcher": index.matcher.to_data(), "mapping": index.term_mapping}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(marshal.dumps(data))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"⚠️ 保存术语自动机缓存失败: {e}")
+
+    def _load_to_memory(self, reverse=False) -> GlossaryIndex:
+        key = self._automaton_key(reverse)
+        index = self._indexes.get(reverse)
+        if index is not None and index.key == key:
+            # 本进程已加载过该方向且词条未变化：切换方向时无需重新加载
+            return index
+
+        # 词条未变化时直接加载上次构建好的自动机，跳过逐条插入词条
+        cache_path = self._automaton_cache_path(reverse)
+        index = self._load_automaton(cache_path, key, reverse)
+        if index is None:
+            index = GlossaryIndex(reverse, key)
+            with _gc_paused():
+                # 发现库先加载，精校库后加载覆盖同名词条
+                if self.enable_discovery:
+                    index.add_entries(_index_entries(self._read_rows(self.discovery_db_paths[reverse]), reverse))
+                index.add_entries(_index_entries(self._read_rows(self.db_path), reverse))
+            self._save_automaton(cache_path, index)
+        self._indexes[reverse] = index
+        return index
+
+    def _read_rows(self, db_path) -> List[Tuple[str, str, str]]:
+        if not Path(db_path).exists():
+            return []
+        with db.connect(db_path) as conn:
+            return conn.execute("SELECT source_term, target_term, category FROM terms").fetchall()
+
+    def extract_terms(self, text: str, reverse: bool = False) -> Dict[str, str]:
+        index = self._indexes.get(reverse)
+        return index.extract_terms(text) if index is not None else {}
+
+    def _existing_main_keys(self, keys_lower: List[str]) -> set:
+        """精校库中已存在的词条 (小写)，只查询本批词条，走忽略大小写的索引"""
+        if not Path(self.db_path).exists():
+            return set()
+        found = set()
+        with db.connect(self.db_path) as conn:
+            for i in range(0, len(keys_lower), SQL_IN_CHUNK):
+                chunk = keys_lower[i:i + SQL_IN_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = conn.execute(
+                    f"SELECT source_term FROM terms WHERE source_term COLLATE NOCASE IN ({placeholders})", chunk)
+                found.update(row[0].lower() for row in cursor)
+        return found
+
+    @staticmethod
+    def _existing_targets(conn: sqlite3.Connection, keys_lower: List[str]) -> Dict[str, str]:
+        """本批词条在该库中已有的译法 {小写词条: 译法}，走忽略大小写的索引"""
+        found = {}
+        for i in range(0, len(keys_lower), SQL_IN_CHUNK):
+            chunk = keys_lower[i:i + SQL_IN_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = conn.execute(
+                f"SELECT source_term, target_term FROM terms WHERE source_term COLLATE NOCASE IN ({placeholders})", chunk)
+            found.update((source.lower(), target) for source, target in cursor)
+        return found
+
+    def save_terms(self, terms_dict: Dict[str, str], category: str = "LLM_Discovered", reverse: bool = False):
+        if not terms_dict:
+            return
+        terms = {}
         for source, target in terms_dict.items():
             s_c, t_c = source.strip(), target.strip()
-            if s_c and t_c and s_c not in self.term_mapping:
-                self.keyword_processor.add_keyword(s_c, s_c)
-                self.term_mapping[s_c] = t_c
+            if s_c and t_c:
+                terms[s_c.lower()] = (s_c, t_c)
+        if not terms:
+            return
+
+        index = self._indexes.get(reverse)
+        # 写入前索引与数据库一致时，写入后它仍然包含全部词条 (新词条同时加入内存)，
+        # 更新其版本号即可，下一个同方向的任务无需重新加载
+        up_to_date = index is not None and index.key == self._automaton_key(reverse)
+        if self.enable_discovery:
+            main_keys = self._existing_main_keys(list(terms))
+            rows = [(s_c, t_c, category, "dynamic_cache")
+                    for s_l, (s_c, t_c) in terms.items() if s_l not in main_keys]
+            if rows:
+                # 忽略大小写的唯一索引冲突时更新原词条；译文未变的不写入，也就不会使术语自动机缓存失效
+                with db.connect(self.discovery_db_paths[reverse]) as conn:
+                    existing = self._existing_targets(conn, [row[0].lower() for row in rows])
+                    changed = sum(1 for s_c, t_c, _, _ in rows
+                                  if s_c.lower() in existing and existing[s_c.lower()] != t_c)
+                    if changed:
+                        # 内存索引只追加新词条，不改已有词条的译法：不再标记为最新，下一个任务从数据库重新加载
+                        up_to_date = False
+                        logger.info(f"🔄 发现库中 {changed} 个已有词条的译法已更新，下次使用时重新加载术语索引")
+                    conn.executemany('''
+                        INSERT INTO terms (source_term, target_term, category, source_file, updated_at)
+                        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                        ON CONFLICT (source_term COLLATE NOCASE) DO UPDATE SET
+                            source_term = excluded.source_term,
+                            target_term = excluded.target_term,
+                            category = excluded.category,
+                            source_file = excluded.source_file,
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE terms.target_term IS NOT excluded.target_term
+                    ''', rows)
+
+        if index is not None:
+            index.add_new_terms(terms)
+            if up_to_date:
+                index.key = self._automaton_key(reverse)
+
+# 全局单例：首次使用时才创建 (创建时读取配置)
+_glossary_manager: Optional[GlossaryManager] = None
 
-# 全局单例
-glossary_manager = GlossaryManager()
\ No newline at end of file
+def get_glossary_manager() -> GlossaryManager:
+    global _glossary_manager
+    if _glossary_manager is None:
+        _glossary_manager = GlossaryManager()
+    return _glossary_manager
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from .config import CACHE_DIR
+from .prompts import prompt_version
+from .srt_utils import parse_srt
+from .subtitle_io import SubtitleBlock
+
+logger = logging.getLogger(__name__)
+
+# 输入路径 -> 任务 ID 的旁路索引，按文件大小与修改时间判断是否需要重新计算指纹
+INDEX_FILE = "index.json"
+# 任务目录名：内容寻址的任务 ID
+JOB_ID_RE = re.compile(r'^[0-9a-f]{20}$')
+# 旧版按文件名 MD5 命名的扁平缓存文件，清理时按单个文件淘汰
+LEGACY_CACHE_RE = re.compile(r'^(glossary|progress|translated)_[0-9a-f]{32}')
+
+
+def content_digest(blocks: Iterable[SubtitleBlock]) -> str:
+    """解析后字幕内容的指纹 (时间轴 + 文本)，与文件名、编码、换行符和序号无关"""
+    digest = hashlib.sha256()
+    for b in blocks:
+        digest.update(f"{b.timestamp}\n{b.content}\n\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def compute_job_id(blocks: Iterable[SubtitleBlock], target_lang: str, model_name: str) -> str:
+    """任务 ID = 字幕内容 + 目标语言 + 模型 + prompt 版本；任一变化都视为新任务"""
+    key = "\0".join([content_digest(blocks), target_lang, model_name or "", prompt_version(target_lang)])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:20]
+
+
+class JobIndex:
+    """
+    缓存目录下的旁路索引 (index.json)：{输入绝对路径: {job, size, mtime_ns, target_lang, model, prompt, used}}。
+    同一文件未改动时直接复用上次算出的任务 ID，不必重新解析与计算指纹；
+    同时方便人工查看某个输入文件对应哪个任务目录。
+    """
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, INDEX_FILE)
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save(self, entries: Dict[str, Dict]):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def job_id_for_file(self, path: str, target_lang: str, model_name: str,
+                        blocks: Optional[List[SubtitleBlock]] = None) -> str:
+        key = os.path.abspath(path)
+        stat = os.stat(key)
+        version = prompt_version(target_lang)
+        with self._lock:
+            entry = self._load().get(key)
+        if (entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns
+                and entry.get("target_lang") == target_lang and entry.get("model") == model_name
+                and entry.get("prompt") == version):
+            job_id = entry["job"]
+        else:
+            job_id = compute_job_id(blocks if blocks is not None else parse_srt(key), target_lang, model_name)
+        with self._lock:
+            entries = self._load()
+            entries[key] = {"job": job_id, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                            "target_lang": target_lang, "model": model_name, "prompt": version,
+                            "used": time.time()}
+            self._save(entries)
+        return job_id
+
+    def forget_jobs(self, job_ids: Iterable[str]):
+        job_ids = set(job_ids)
+        if not job_ids:
+            return
+        with self._lock:
+            entries = self._load()
+            kept = {k: v for k, v in entries.items() if v.get("job") not in job_ids}
+            if len(kept) != len(entries):
+                self._save(kept)
+
+
+_index: Optional[JobIndex] = None
+
+
+def get_job_index() -> JobIndex:
+    global _index
+    if _index is None:
+        _index = JobIndex()
+    return _index
+
+
+def job_dir(job_id: str, cache_dir: str = CACHE_DIR) -> str:
+    """任务目录 (不存在则创建)，并刷新其修改时间作为最近使用时间"""
+    path = os.path.join(cache_dir, job_id)
+    os.makedirs(path, exist_ok=True)
+    os.utime(path)
+    return path
+
+
+def job_dir_for_file(path: str, target_lang: str, model_name: str,
+                     blocks: Optional[List[SubtitleBlock]] = None) -> str:
+    return job_dir(get_job_index().job_id_for_file(path, target_lang, model_name, blocks))
+
+
+def _entry_stats(path: str):
+    """缓存条目 (任务目录或旧版单个文件) 的 (总字节数, 最近使用时间)"""
+    if not os.path.isdir(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime
+    size, last_used = 0, os.stat(path).st_mtime
+    for root, _, files in os.walk(path):
+        for name in files:
+            stat = os.stat(os.path.join(root, name))
+            size += stat.st_size
+            last_used = max(last_used, stat.st_mtime)
+    return size, last_used
+
+
+def clean_cache(max_age_days: float, max_size_mb: float, cache_dir: str = CACHE_DIR, dry_run: bool = False) -> Dict:
+    """
+    淘汰缓存：先删除超过 max_age_days 未使用的任务，总大小仍超过 max_size_mb 时从最久未使用的开始删除。
+    max_age_days / max_size_mb 小于等于 0 表示不限制。正在运行的任务会刷新目录时间，不会因过期被删除。
+    返回 {"removed": 删除条目数, "freed": 释放字节数, "kept": 保留条目数, "kept_size": 保留字节数}
+    """
+    entries = []
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            is_job = os.path.isdir(path) and JOB_ID_RE.match(name)
+            if is_job or (os.path.isfile(path) and LEGACY_CACHE_RE.match(name)):
+                size, last_used = _entry_stats(path)
+                entries.append({"name": name, "path": path, "size": size, "used": last_used})
+
+    entries.sort(key=lambda e: e["used"])
+    now = time.time()
+    evict = []
+    if max_age_days > 0:
+        evict = [e for e in entries if now - e["used"] > max_age_days * 86400]
+    kept = [e for e in entries if e not in evict]
+    total = sum(e["size"] for e in kept)
+    while kept and max_size_mb > 0 and total > max_size_mb * 1024 * 1024:
+        oldest = kept.pop(0)
+        evict.append(oldest)
+        total -= oldest["size"]
+
+    if not dry_run:
+        for e in evict:
+            if os.path.isdir(e["path"]):
+                shutil.rmtree(e["path"], ignore_errors=True)
+            else:
+                os.remove(e["path"])
+        JobIndex(cache_dir).forget_jobs(e["name"] for e in evict)
+    return {"removed": len(evict), "freed": sum(e["size"] for e in evict), "kept": len(kept), "kept_size": total}
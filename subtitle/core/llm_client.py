@@ -4,10 +4,10 @@ import json
 import re
 import time
 import asyncio
-import aiohttp
 import logging
 from typing import List, Dict, Optional, Union
-from json_repair import repair_json
+
+from .cassette import get_cassette
 
 # 设置模块日志
 logger = logging.getLogger(__name__)
@@ -15,6 +15,9 @@ logger = logging.getLogger(__name__)
 # 全局信号量与限流器
 _semaphore = None
 _rate_limiter = None
+# 正在执行 / 排队等待并发槽位的请求数，供流水线估算空闲并发
+_in_flight = 0
+_waiting = 0
 
 class TokenBucket:
     """简易令牌桶，用于控制 RPM (Requests Per Minute)"""
@@ -51,6 +54,10 @@ def get_rate_limiter(config):
         _rate_limiter = TokenBucket(config.rpm_limit)
     return _rate_limiter
 
+def free_slots(config) -> int:
+    """当前空闲的并发槽位数（已扣除排队中的请求，可能为负）"""
+    return config.max_concurrent_requests - _in_flight - _waiting
+
 def clean_and_extract_json(text: Optional[str]) -> Union[Dict, List]:
     """
     更鲁棒的 JSON 提取器：优先寻找 Markdown 代码块，然后结合 json_repair 进行容错处理。
@@ -70,7 +77,8 @@ def clean_and_extract_json(text: Optional[str]) -> Union[Dict, List]:
         try:
             return json.loads(json_str)
         except:
-            # 如果代码块里的也不合法，尝试用 repair_json 修复
+            # 如果代码块里的也不合法，尝试用 repair_json 修复 (json_repair 只在需要修复时才导入)
+            from json_repair import repair_json
             try:
                 repaired = repair_json(json_str)
                 data = json.loads(repaired)
@@ -85,6 +93,8 @@ def clean_and_extract_json(text: Optional[str]) -> Union[Dict, List]:
     except:
         pass
 
+    from json_repair import repair_json
+
     # 3. 寻找第一个 [ 或 { 开始的位置，截取到最后并尝试修复
     # 这一步能有效去除开头的废话（如 "Here is the result:"）
     start_idx = -1
@@ -111,8 +121,11 @@ def clean_and_extract_json(text: Optional[str]) -> Union[Dict, List]:
     except:
         return []
 
-async def call_llm(config, messages: List[Dict], temperature: float = 0.5) -> Optional[str]:
-    """异步调用 LLM API"""
+async def call_llm(config, messages: List[Dict], temperature: float = 0.5, timing: Optional[Dict] = None) -> Optional[str]:
+    """
+    异步调用 LLM API
+    timing: 可选字典，调用结束后写入 'latency'（不含排队等待的请求耗时，秒）
+    """
     sem = get_semaphore(config)
     limiter = get_rate_limiter(config)
     
@@ -127,49 +140,76 @@ async def call_llm(config, messages: List[Dict], temperature: float = 0.5) -> Op
     if config.api_key:
         headers["Authorization"] = f"Bearer {config.api_key}"
 
-    async with sem:
-        await limiter.acquire()
-        
-        for attempt in range(config.max_retries):
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(config.api_url, headers=headers, json=payload, timeout=120) as response:
-                        if response.status == 429:
-                            await asyncio.sleep(5)
-                            continue
+    global _in_flight, _waiting
+    _waiting += 1
+    try:
+        await sem.acquire()
+    finally:
+        _waiting -= 1
+    _in_flight += 1
+    cassette = get_cassette()
+    try:
+        if cassette is None or not cassette.skip_rate_limit:
+            await limiter.acquire()
+        started = time.monotonic()
+        try:
+            if cassette is not None and cassette.replaying:
+                return await cassette.replay(payload)
+            result = await _post_with_retries(config, headers, payload)
+            if cassette is not None:
+                cassette.record(payload, result, time.monotonic() - started)
+            return result
+        finally:
+            if timing is not None:
+                timing['latency'] = time.monotonic() - started
+    finally:
+        _in_flight -= 1
+        sem.release()
+
+async def _post_with_retries(config, headers: Dict, payload: Dict) -> Optional[str]:
+    """带重试的单次请求发送，返回模型输出文本"""
+    # aiohttp 导入较慢 (~200 ms)，只在真正发送请求时导入；磁带回放与 --clean-cache 等不需要它
+    import aiohttp
+    for attempt in range(config.max_retries):
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(config.api_url, headers=headers, json=payload, timeout=120) as response:
+                    if response.status == 429:
+                        await asyncio.sleep(5)
+                        continue
+                    
+                    raw_resp = await response.text()
+                    if response.status != 200:
+                        logger.error(f"API 返回状态码 {response.status}: {raw_resp}")
+                        response.raise_for_status()
+                    
+                    try:
+                        data = json.loads(raw_resp)
+                    except Exception:
+                        raise Exception(f"Invalid JSON response: {raw_resp[:100]}")
+
+                    if 'choices' not in data or not data['choices']:
+                        raise Exception("Invalid API Response: missing choices")
                         
-                        raw_resp = await response.text()
-                        if response.status != 200:
-                            logger.error(f"API 返回状态码 {response.status}: {raw_resp}")
-                            response.raise_for_status()
+                    message = data['choices'][0].get('message', {})
+                    content = message.get('content')
+                    refusal = message.get('refusal')
+
+                    if refusal:
+                        logger.warning(f"模型拒绝回答 (Refusal): {refusal}")
+                        return ""
+
+                    if content is None or content.strip() == "":
+                        # 只有在 content_filter 导致空时才记录警告
+                        finish_reason = data['choices'][0].get('finish_reason')
+                        if finish_reason == "content_filter":
+                            logger.warning("API 因内容安全过滤 (content_filter) 返回空内容")
+                        return ""
                         
-                        try:
-                            data = json.loads(raw_resp)
-                        except Exception:
-                            raise Exception(f"Invalid JSON response: {raw_resp[:100]}")
-
-                        if 'choices' not in data or not data['choices']:
-                            raise Exception("Invalid API Response: missing choices")
-                            
-                        message = data['choices'][0].get('message', {})
-                        content = message.get('content')
-                        refusal = message.get('refusal')
-
-                        if refusal:
-                            logger.warning(f"模型拒绝回答 (Refusal): {refusal}")
-                            return ""
-
-                        if content is None or content.strip() == "":
-                            # 只有在 content_filter 导致空时才记录警告
-                            finish_reason = data['choices'][0].get('finish_reason')
-                            if finish_reason == "content_filter":
-                                logger.warning("API 因内容安全过滤 (content_filter) 返回空内容")
-                            return ""
-                            
-                        return content.strip()
-            except Exception as e:
-                if attempt < config.max_retries - 1:
-                    await asyncio.sleep(config.retry_delay)
-                else:
-                    logger.error(f"API 请求最终失败: {e}")
+                    return content.strip()
+        except Exception as e:
+            if attempt < config.max_retries - 1:
+                await asyncio.sleep(config.retry_delay)
+            else:
+                logger.error(f"API 请求最终失败: {e}")
     return None
\ No newline at end of file
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from typing import Dict, List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近秩法百分位数，空列表返回 0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class PipelineMetrics:
+    """
+    流水线请求统计：按阶段记录批次请求次数、块数、校验结果与请求耗时，
+    供运行结束时的日志与 benchmarks/ 下的基准测试读取。
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.blocks: Dict[str, int] = {}
+        self.latencies: Dict[str, List[float]] = {}
+
+    def record_call(self, stage: str, blocks: int, latency: float, success: bool = True):
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        self.blocks[stage] = self.blocks.get(stage, 0) + blocks
+        if not success:
+            self.failures[stage] = self.failures.get(stage, 0) + 1
+        self.latencies.setdefault(stage, []).append(latency)
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def summary(self) -> Dict[str, Dict]:
+        return {
+            stage: {
+                "calls": self.calls[stage],
+                "failures": self.failures.get(stage, 0),
+                "blocks": self.blocks.get(stage, 0),
+                "latency_p50": percentile(self.latencies.get(stage, []), 50),
+                "latency_p95": percentile(self.latencies.get(stage, []), 95),
+            }
+            for stage in sorted(self.calls)
+        }
+
+
+# 全局单例（批量模式下汇总所有文件）
+pipeline_metrics = PipelineMetrics()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 尚无耗时数据时的初始预取深度（与原先固定的 PREFETCH_WINDOW 一致）
+INITIAL_WINDOW = 3
+# 耗时的指数滑动平均系数
+EWMA_ALPHA = 0.3
+
+
+class PrefetchWindow:
+    """
+    直译预取深度控制：润色阶段串行执行，直译批次需提前 ceil(直译耗时 / 润色耗时) 个批次启动，
+    润色轮到时结果才恰好就绪。
+    - 后端有空闲并发槽位时多预取一批，把空闲的并发用起来；
+    - 有请求在排队时少预取一批，避免直译结果堆积并挤占润色请求；
+    - 深度始终不超过 max_window，限制驻留在内存中的直译结果数量。
+    """
+    def __init__(self, max_window: int = 8, min_window: int = 1):
+        self.min_window = max(1, min_window)
+        self.max_window = max(self.min_window, max_window)
+        self.literal_latency = None
+        self.polish_latency = None
+        self._last_size = None
+
+    def _ewma(self, old, value):
+        return value if old is None else EWMA_ALPHA * value + (1 - EWMA_ALPHA) * old
+
+    def record_literal(self, latency: float):
+        self.literal_latency = self._ewma(self.literal_latency, latency)
+
+    def record_polish(self, latency: float):
+        self.polish_latency = self._ewma(self.polish_latency, latency)
+
+    def size(self, free_slots: int) -> int:
+        """根据两阶段的滑动耗时与当前空闲并发槽位数给出预取深度"""
+        if self.literal_latency is None or not self.polish_latency:
+            window = INITIAL_WINDOW
+        else:
+            window = math.ceil(self.literal_latency / self.polish_latency)
+            if free_slots > 0:
+                window += 1
+            elif free_slots < 0:
+                # 已有请求在排队：少预取一批，把并发让给润色请求
+                window -= 1
+        window = max(self.min_window, min(self.max_window, window))
+        if window != self._last_size:
+            logger.debug(f"直译预取深度调整为 {window} (直译 {self.literal_latency or 0:.2f}s, "
+                         f"润色 {self.polish_latency or 0:.2f}s, 空闲槽位 {free_slots})")
+            self._last_size = window
+        return window
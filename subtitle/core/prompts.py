@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import os
+import hashlib
 from typing import Dict
 
 PROMPT_DIR = os.path.join(os.path.dirname(__file__), '..', 'prompts')
@@ -20,3 +21,11 @@ def get_prompt_templates(target_lang: str = "zh") -> Dict[str, str]:
         "LITERAL_TRANS": load_prompt(f"literal_trans{suffix}"),
         "REVIEW_AND_POLISH": load_prompt(f"review_and_polish{suffix}"),
     }
+
+def prompt_version(target_lang: str = "zh") -> str:
+    """当前 prompt 模板内容的指纹：修改任一模板后任务缓存自动失效"""
+    templates = get_prompt_templates(target_lang)
+    digest = hashlib.sha1()
+    for name in sorted(templates):
+        digest.update(name.encode('utf-8') + b"\0" + templates[name].encode('utf-8') + b"\0")
+    return digest.hexdigest()[:12]
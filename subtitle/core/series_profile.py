@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import json
+import asyncio
+import logging
+import weakref
+from typing import Dict, Set
+
+from .config import SERIES_DIR
+
+logger = logging.getLogger(__name__)
+
+# 按 (剧集名, 目标语言) 缓存的画像实例，批量模式下多个文件共享同一个对象
+_profiles: Dict[str, "SeriesProfile"] = {}
+
+
+class SeriesProfile:
+    """
+    剧集画像：同一部剧（一季或多季）共享的术语表，以及已经送给 LLM 检查过的候选短语。
+    后续剧集只需把含有“新候选”的字幕行交给 LLM 做术语提取。
+    """
+    def __init__(self, name: str, target_lang: str, series_dir: str = SERIES_DIR):
+        self.name = name
+        self.target_lang = target_lang
+        safe_name = re.sub(r'[\\/:*?"<>|]+', '_', name).strip() or "default"
+        self.path = os.path.join(series_dir, f"{safe_name}_{target_lang}.json")
+        self.glossary: Dict[str, str] = {}
+        self.examined: Set[str] = set()
+        self.episodes = 0
+        # 同一剧集的提取串行执行，让后一集能复用前一集的结果。
+        # asyncio.Lock 只能在一个事件循环中使用，而画像实例跨任务缓存 (GUI 每个任务各自 asyncio.run)，按事件循环分别创建
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+        self._load()
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """当前事件循环中的提取锁"""
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        return lock
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            logger.warning(f"剧集画像文件损坏，将重新建立: {self.path}")
+            return
+        self.glossary = data.get("glossary", {})
+        self.examined = set(data.get("examined", []))
+        self.episodes = data.get("episodes", 0)
+        logger.info(f"📺 已加载剧集画像 [{self.name}]: {len(self.glossary)} 条术语，{len(self.examined)} 个已检查候选")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {
+            "name": self.name,
+            "target_lang": self.target_lang,
+            "episodes": self.episodes,
+            "glossary": self.glossary,
+            "examined": sorted(self.examined),
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def is_known(self, candidate: str) -> bool:
+        return candidate in self.examined
+
+
+def get_series_profile(name: str, target_lang: str) -> SeriesProfile:
+    key = f"{name}::{target_lang}"
+    profile = _profiles.get(key)
+    if profile is None:
+        profile = SeriesProfile(name, target_lang)
+        _profiles[key] = profile
+    return profile
@@ -1,57 +1,18 @@
-# -*- coding: utf-8 -*- 
+# -*- coding: utf-8 -*-
 import logging
 
-logger = logging.getLogger(__name__)
+from .subtitle_io import iter_srt, format_srt_block  # noqa: F401  (format_srt_block 保留在此处导出)
 
-def format_srt_block(index: int, timestamp: str, content: str) -> str:
-    """
-    统一格式化单个 SRT 字幕块
-    """
-    return f"{index}\n{timestamp}\n{content}\n\n"
+logger = logging.getLogger(__name__)
 
 def parse_srt(file_path):
     """
-    解析 SRT 文件，修复 BOM 导致第一行丢失的问题
+    解析 SRT 文件，返回 SubtitleBlock 列表。
+    实际解析由 subtitle_io.iter_srt 完成 (编码/BOM 探测、缺失序号与空行的容错、丢弃空字幕块)；
+    只需逐块处理时请直接迭代 iter_srt，避免把整个文件的块放进内存。
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            # 关键修复：移除文件头的 BOM 字符
-            content = content.lstrip('﻿')
+        return list(iter_srt(file_path))
     except FileNotFoundError:
         print(f"错误：找不到文件 {file_path}")
         return []
-
-    content = content.replace('\r\n', '\n').replace('\r', '\n')
-    blocks = content.split('\n\n')
-    parsed_blocks = []
-
-    for block in blocks:
-        block = block.strip()
-        if not block:
-            continue
-        lines = block.split('\n')
-        # SRT 格式至少需要 2 行：ID, 时间轴, 字幕内容(时间轴和内容可能为空)
-        if len(lines) < 2:
-            continue
-
-        index = lines[0].strip()
-        timestamp = lines[1].strip()
-        text_content = "\n".join(lines[2:]).strip()
-
-        # 简单的格式检查
-        if not (index.isdigit() or '-->' in timestamp):
-            continue
-            
-        # 丢弃内容为空的字幕块，防止 LLM 产生幻觉
-        if not text_content:
-            logger.warning(f"丢弃空字幕块 ID {index}")
-            continue
-
-        parsed_blocks.append({
-            'index': index,
-            'timestamp': timestamp,
-            'content': text_content
-        })
-
-    return parsed_blocks
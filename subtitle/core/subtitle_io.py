@@ -0,0 +1,604 @@
+# -*- coding: utf-8 -*-
+"""
+统一的字幕读写层：SRT / ASS / WebVTT 的流式读取与写出。
+
+读取函数都是生成器，逐块解析、逐块产出，内存占用与文件大小无关；
+SRT/VTT 产出 SubtitleBlock (整数 ID + 毫秒时间轴)，ASS 产出按 [Events] 中 Format 行解析出的事件字典。
+"""
+import os
+import re
+import codecs
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 编码探测只读取文件头部的样本
+ENCODING_SAMPLE_SIZE = 64 * 1024
+# 流式读取时每次读入的字符数
+READ_CHUNK_SIZE = 1024 * 1024
+# 无 BOM 时依次尝试的编码；cp1252 作为兜底
+FALLBACK_ENCODINGS = ("utf-8", "gb18030", "big5", "cp1252")
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+SRT_TIME_RE = re.compile(r'(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})')
+# SRT 时间轴行；容忍 "." 作为毫秒分隔符以及多余的空格
+SRT_TIMESTAMP_RE = re.compile(r'^\s*(\d+:\d{1,2}:\d{1,2}[,.]\d{1,3})\s*-->\s*(\d+:\d{1,2}:\d{1,2}[,.]\d{1,3})')
+# 标准格式的 SRT 时间轴行 (HH:MM:SS,mmm --> HH:MM:SS,mmm)，可按固定位置切片换算
+CANONICAL_SRT_TIMESTAMP_RE = re.compile(r'\d{2}:\d{2}:\d{2},\d{3} --> \d{2}:\d{2}:\d{2},\d{3}')
+# 批量检查标准时间轴用：数字统一换成 0 后应与模板一致
+_DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+_CANONICAL_STAMP = b"00:00:00,000 --> 00:00:00,000\n"
+# VTT 时间戳的小时部分可省略，时间轴后面可能跟 cue 设置
+VTT_TIMESTAMP_RE = re.compile(r'^\s*((?:\d+:)?\d{1,2}:\d{1,2}\.\d{1,3})\s*-->\s*((?:\d+:)?\d{1,2}:\d{1,2}\.\d{1,3})')
+# VTT 特有的 voice/class/ruby 标签与 cue 内时间戳；<i>/<b>/<u> 与 SRT 通用，保留
+VTT_TAG_RE = re.compile(r'</?(?:v|c|lang|ruby|rt)(?:[.\s][^>]*)?>|<\d[\d:.]*>')
+ASS_TAG_RE = re.compile(r'\{[^}]*\}')
+# ASS 默认的事件字段 (没有 Format 行时使用)
+DEFAULT_ASS_FORMAT = ["Layer", "Start", "End", "Style", "Name", "MarginL", "MarginR", "MarginV", "Effect", "Text"]
+
+
+# ---------------------------------------------------------------------------
+# 编码探测
+# ---------------------------------------------------------------------------
+
+def detect_encoding(file_path: str) -> str:
+    """根据 BOM 与文件头样本推断编码"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(ENCODING_SAMPLE_SIZE)
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    for encoding in FALLBACK_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            # final=False：样本末尾被截断的多字节字符不算解码失败
+            decoder.decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return FALLBACK_ENCODINGS[-1]
+
+
+def open_subtitle(file_path: str, encoding: Optional[str] = None) -> TextIO:
+    """
+    以文本模式打开字幕文件：自动探测编码，统一换行符。
+    样本之后仍出现的非法字节按替换字符处理，不中断整个文件的读取。
+    """
+    encoding = encoding or detect_encoding(file_path)
+    return open(file_path, 'r', encoding=encoding, errors='replace', newline=None)
+
+
+def _lines(source) -> Iterator[str]:
+    """source 可以是文件路径、已打开的文本流或字符串行的可迭代对象；去掉首行残留的 BOM"""
+    if isinstance(source, (str, os.PathLike)):
+        with open_subtitle(source) as f:
+            yield from _lines(f)
+        return
+    iterator = iter(source)
+    first = next(iterator, None)
+    if first is None:
+        return
+    yield first.lstrip('\ufeff')
+    yield from iterator
+
+
+# ---------------------------------------------------------------------------
+# 时间格式
+# ---------------------------------------------------------------------------
+
+def _to_ms(hours, minutes, seconds, fraction: str) -> int:
+    # 小数部分按位数换算："9" -> 900ms，"96" -> 960ms，"960" -> 960ms
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(fraction.ljust(3, '0')[:3])
+
+
+def parse_srt_time(value: str) -> int:
+    """'00:00:09,960' -> 9960 (毫秒)；无法解析时返回 0"""
+    match = SRT_TIME_RE.search(value)
+    return _to_ms(*match.groups()) if match else 0
+
+
+def parse_ass_time(value: str) -> int:
+    """'0:00:09.96' -> 9960 (毫秒)"""
+    return parse_srt_time(value)
+
+
+def parse_vtt_time(value: str) -> int:
+    """'00:09.960' 或 '00:00:09.960' -> 9960 (毫秒)"""
+    value = value.strip()
+    if value.count(':') == 1:
+        value = "0:" + value
+    return parse_srt_time(value)
+
+
+def format_srt_time(ms: int) -> str:
+    ms = max(0, int(ms))
+    return f"{ms // 3600000:02}:{ms // 60000 % 60:02}:{ms // 1000 % 60:02},{ms % 1000:03}"
+
+
+def format_vtt_time(ms: int) -> str:
+    return format_srt_time(ms).replace(',', '.')
+
+
+def format_ass_time(ms: int) -> str:
+    """ASS 时间精确到厘秒，多余的毫秒直接截断"""
+    ms = max(0, int(ms))
+    return f"{ms // 3600000}:{ms // 60000 % 60:02}:{ms // 1000 % 60:02}.{ms % 1000 // 10:02}"
+
+
+def split_timestamp(timestamp: str):
+    """'00:00:01,000 --> 00:00:02,500' -> (1000, 2500)；无法解析时返回 None"""
+    match = SRT_TIMESTAMP_RE.match(timestamp)
+    if not match:
+        return None
+    return parse_srt_time(match.group(1)), parse_srt_time(match.group(2))
+
+
+def make_timestamp(start_ms: int, end_ms: int) -> str:
+    return f"{format_srt_time(start_ms)} --> {format_srt_time(end_ms)}"
+
+
+def _canonical_ms(value: str) -> int:
+    """标准 SRT 时间 (HH:MM:SS,mmm) 按固定位置切片换算，比正则快得多"""
+    return int(value[0:2]) * 3600000 + int(value[3:5]) * 60000 + int(value[6:8]) * 1000 + int(value[9:12])
+
+
+def _canonical_to_ass(value: str) -> str:
+    """标准 SRT 时间 (HH:MM:SS,mmm) 直接切片为 ASS 时间 (H:MM:SS.cc)，结果与 format_ass_time 相同"""
+    return (value[1:8] if value[0] == '0' else value[0:8]) + '.' + value[9:11]
+
+
+# ---------------------------------------------------------------------------
+# 字幕块
+# ---------------------------------------------------------------------------
+
+class SubtitleBlock:
+    """
+    流水线中传递的字幕块：整数 ID、毫秒起止时间、原文，以及润色完成后的译文。
+    使用 __slots__，大文件 (数万块) 时比字典节省内存，也省去反复的 int()/str() 转换。
+
+    从标准 SRT 读入的块保留原始时间轴字符串，start/end 在第一次访问时才换算为毫秒：
+    只做 "读入 -> 翻译 -> 写回" 的流程不必为每个块做时间换算与格式化。
+    """
+    __slots__ = ('id', 'content', 'translation', '_start', '_end', '_timestamp')
+
+    def __init__(self, id: int, start: Optional[int], end: Optional[int], content: str,
+                 translation: Optional[str] = None, timestamp: Optional[str] = None):
+        self.id = id
+        self.content = content
+        self.translation = translation
+        self._start = start
+        self._end = end
+        # 标准格式的 SRT 时间轴行 (HH:MM:SS,mmm --> HH:MM:SS,mmm)，按需生成
+        self._timestamp = timestamp
+
+    @classmethod
+    def from_srt(cls, id: int, timestamp: str, content: str) -> "SubtitleBlock":
+        """timestamp 必须是标准格式的时间轴行"""
+        return cls(id, None, None, content, timestamp=timestamp)
+
+    def _parse_span(self):
+        self._start = _canonical_ms(self._timestamp)
+        self._end = _canonical_ms(self._timestamp[17:])
+
+    @property
+    def start(self) -> int:
+        if self._start is None:
+            self._parse_span()
+        return self._start
+
+    @property
+    def end(self) -> int:
+        if self._end is None:
+            self._parse_span()
+        return self._end
+
+    def shift(self, start: int, end: int):
+        """修改时间轴 (毫秒)"""
+        self._start, self._end, self._timestamp = start, end, None
+
+    @property
+    def timestamp(self) -> str:
+        """SRT 格式的时间轴行"""
+        if self._timestamp is None:
+            self._timestamp = make_timestamp(self._start, self._end)
+        return self._timestamp
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+    def ass_times(self) -> Tuple[str, str]:
+        """
+        ASS 格式的起止时间。时间轴行是标准格式 (定长 29 个字符) 时直接切片转换，
+        免去毫秒换算与格式化；其余情况 (小时数超过两位等) 按毫秒格式化。
+        """
+        timestamp = self._timestamp
+        if timestamp is not None and len(timestamp) == 29:
+            return _canonical_to_ass(timestamp), _canonical_to_ass(timestamp[17:])
+        return format_ass_time(self.start), format_ass_time(self.end)
+
+    def __eq__(self, other):
+        if not isinstance(other, SubtitleBlock):
+            return NotImplemented
+        return (self.id, self.start, self.end, self.content, self.translation) == \
+            (other.id, other.start, other.end, other.content, other.translation)
+
+    def __repr__(self):
+        return f"SubtitleBlock(id={self.id}, {self.timestamp}, {self.content[:30]!r})"
+
+
+# ---------------------------------------------------------------------------
+# SRT
+# ---------------------------------------------------------------------------
+
+def _flush_block(index: int, span: Tuple[int, int], lines: List[str], keep_empty: bool) -> Optional[SubtitleBlock]:
+    content = "\n".join(lines).strip()
+    if not content and not keep_empty:
+        logger.warning(f"丢弃空字幕块 ID {index}")
+        return None
+    return SubtitleBlock(index, span[0], span[1], content)
+
+
+def parse_srt_lines(lines: Iterable[str], keep_empty: bool = False, last_index: int = 0,
+                    state: Optional[Dict] = None) -> Iterator[SubtitleBlock]:
+    """
+    逐行解析 SRT，逐块产出。容错规则：
+    - 以时间轴行识别块的开始，序号行缺失时按上一个序号递增补齐；
+    - 块之间缺少空行时，把当前块最后一个纯数字行视为下一块的序号；
+    - 块外无法识别的行直接跳过；
+    - 默认丢弃内容为空的块，防止 LLM 产生幻觉。
+    state: 可选字典，分段解析时在段与段之间传递 'last_index' (最后一个时间轴的序号，含被丢弃的空块)
+    与 'pending_index' (块外尚未使用的序号行)，开始时读取，全部产出后写回
+    """
+    index = 0
+    span: Optional[Tuple[int, int]] = None
+    content: List[str] = []
+    pending_index: Optional[int] = None
+    if state is not None:
+        last_index = state.get('last_index', last_index)
+        pending_index = state.get('pending_index')
+
+    for line in lines:
+        stripped = line.strip()
+        # 先用子串判断过滤掉绝大多数文本行，再做正则匹配
+        match = SRT_TIMESTAMP_RE.match(stripped) if '-->' in stripped else None
+        if match:
+            if span is not None:
+                # 缺少空行分隔的相邻块
+                if content and content[-1].strip().isdecimal():
+                    pending_index = int(content.pop())
+                block = _flush_block(index, span, content, keep_empty)
+                if block:
+                    yield block
+            # "0:00:05.5 --> ..." 之类的非标准写法也换算为毫秒
+            index = pending_index if pending_index is not None else last_index + 1
+            last_index, pending_index = index, None
+            span, content = (parse_srt_time(match.group(1)), parse_srt_time(match.group(2))), []
+        elif not stripped:
+            if span is not None:
+                block = _flush_block(index, span, content, keep_empty)
+                if block:
+                    yield block
+                span, content = None, []
+        elif span is not None:
+            content.append(line.rstrip())
+        elif stripped.isdecimal():
+            pending_index = int(stripped)
+        else:
+            logger.debug(f"跳过无法识别的 SRT 行: {stripped[:40]}")
+
+    if state is not None:
+        state['last_index'], state['pending_index'] = last_index, pending_index
+    if span is not None:
+        block = _flush_block(index, span, content, keep_empty)
+        if block:
+            yield block
+
+
+def _read_chunks(stream: TextIO, separator: str = "\n\n") -> Iterator[List[str]]:
+    """
+    按固定大小读取文本流，以空行切分，每次产出一批完整的段落；内存占用只与读取块大小有关。
+    按批产出而不是逐段产出：数万块的文件省去每块一次的生成器切换。
+    """
+    buffer = ""
+    at_start = True
+    while True:
+        data = stream.read(READ_CHUNK_SIZE)
+        if not data:
+            break
+        if at_start:
+            # 与 _lines 一致，去掉开头残留的 BOM
+            data = data.lstrip('\ufeff')
+            if not data:
+                continue
+            at_start = False
+        parts = (buffer + data).split(separator)
+        buffer = parts.pop()
+        yield parts
+    if buffer:
+        yield [buffer]
+
+
+def _all_canonical(timestamps: List[str]) -> bool:
+    """
+    一次检查一批时间轴行是否都是标准格式：数字统一换成 0 后与模板逐字节比较。
+    每行定长且不含换行，整体相等当且仅当逐行都匹配；比逐行正则匹配快得多。
+    含非 ASCII 字符时返回 False。
+    """
+    try:
+        data = ("\n".join(timestamps) + "\n").encode('ascii')
+    except UnicodeEncodeError:
+        return False
+    return data.translate(_DIGITS_TO_ZERO) == _CANONICAL_STAMP * len(timestamps)
+
+
+def _no_trailing_space(texts: List[str]) -> bool:
+    """
+    一批多行正文中是否没有行尾空白：逐行解析会去掉每行行尾的空白，并把只有空白的行当作块分隔，
+    含这类行的段落需交给逐行解析。整批拼接后用 C 实现的 split/rstrip/join 比较，比逐行判断或正则扫描快。
+    """
+    text = "\n".join(texts)
+    return "\n".join(map(str.rstrip, text.split("\n"))) == text
+
+
+def _canonical_run(chunks: List[str], start: int) -> Tuple[Optional[List[SubtitleBlock]], int]:
+    """
+    从 start 开始连续解析 "序号 / 时间轴 / 正文" 形状的段落 (跳过空段落)，遇到第一个不是这种形状的段落停止。
+    返回 (解析出的块, 停止位置)；时间轴行与行尾空白在最后整批校验，不合格时返回 (None, start)。
+    只保留块本身与时间轴字符串，不为每个段落留下中间列表，大文件时垃圾回收的负担与逐块解析相同。
+    """
+    blocks: List[SubtitleBlock] = []
+    timestamps: List[str] = []
+    # 多行正文 (单行正文在段落去掉首尾空白后不会有行尾空白)
+    multiline: List[str] = []
+    new_block, add_block, add_timestamp, add_multiline = SubtitleBlock, blocks.append, timestamps.append, multiline.append
+    position = start
+    for position in range(start, len(chunks)):
+        parts = chunks[position].strip().split('\n', 2)
+        if not parts[0]:
+            continue
+        if len(parts) == 3 and parts[0].isdecimal() and '-->' not in parts[2]:
+            content = parts[2].strip()
+            if content:
+                add_block(new_block(int(parts[0]), None, None, content, None, parts[1]))
+                add_timestamp(parts[1])
+                if '\n' in parts[2]:
+                    add_multiline(parts[2])
+                continue
+        break
+    else:
+        position = len(chunks)
+    if not _all_canonical(timestamps) or not _no_trailing_space(multiline):
+        return None, start
+    return blocks, position
+
+
+def _parse_srt_stream(source, keep_empty: bool) -> Iterator[SubtitleBlock]:
+    """
+    快速路径：绝大多数块是 "序号 / 标准时间轴 / 正文" 的规范格式，直接切分即可；
+    其余 (缺序号、缺空行、非标准时间轴、空内容) 交给逐行容错解析。
+    source 为文件路径或文本流。
+    """
+    stream = open_subtitle(source) if isinstance(source, (str, os.PathLike)) else source
+    try:
+        # 逐行解析的状态跨段落传递，缺序号、空块被丢弃时的编号与整篇逐行解析一致
+        state = {'last_index': 0, 'pending_index': None}
+        # 某一段整批校验失败 (例如全文用 "." 作毫秒分隔符) 后，其余部分直接逐块判断
+        batch_check = True
+        is_canonical = CANONICAL_SRT_TIMESTAMP_RE.fullmatch
+        for chunks in _read_chunks(stream):
+            position = 0
+            while position < len(chunks):
+                if batch_check:
+                    blocks, position = _canonical_run(chunks, position)
+                    if blocks is None:
+                        batch_check = False
+                    elif blocks:
+                        state['last_index'], state['pending_index'] = blocks[-1].id, None
+                        yield from blocks
+                    if position >= len(chunks):
+                        break
+                text = chunks[position].strip()
+                position += 1
+                if not text:
+                    continue
+                parts = text.split('\n', 2)
+                if (len(parts) == 3 and parts[0].isdecimal() and is_canonical(parts[1])
+                        and '-->' not in parts[2] and _no_trailing_space([parts[2]])):
+                    content = parts[2].strip()
+                    if content:
+                        state['last_index'], state['pending_index'] = int(parts[0]), None
+                        yield SubtitleBlock(state['last_index'], None, None, content, None, parts[1])
+                        continue
+                yield from parse_srt_lines(text.split('\n'), keep_empty=keep_empty, state=state)
+    finally:
+        if stream is not source:
+            stream.close()
+
+
+def iter_srt(source, keep_empty: bool = False) -> Iterator[SubtitleBlock]:
+    """流式读取 SRT：source 为文件路径、文本流或行的可迭代对象"""
+    if isinstance(source, (str, os.PathLike)) or hasattr(source, 'read'):
+        return _parse_srt_stream(source, keep_empty)
+    return parse_srt_lines(_lines(source), keep_empty=keep_empty)
+
+
+def format_srt_block(index: int, timestamp: str, content: str) -> str:
+    """统一格式化单个 SRT 字幕块"""
+    return f"{index}\n{timestamp}\n{content}\n\n"
+
+
+def write_srt(target, blocks: Iterable[SubtitleBlock], renumber: bool = False) -> int:
+    """
+    流式写出 SRT，target 为路径或文本流；renumber=True 时从 1 开始重新编号。
+    返回写出的块数。
+    """
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, 'w', encoding='utf-8') as f:
+            return write_srt(f, blocks, renumber)
+    count = 0
+    for block in blocks:
+        count += 1
+        target.write(format_srt_block(count if renumber else block.id, block.timestamp, block.content))
+    return count
+
+
+# ---------------------------------------------------------------------------
+# WebVTT
+# ---------------------------------------------------------------------------
+
+def parse_vtt_lines(lines: Iterable[str], keep_empty: bool = False) -> Iterator[SubtitleBlock]:
+    """
+    逐行解析 WebVTT，产出 SubtitleBlock (cue 设置丢弃)。
+    NOTE / STYLE / REGION 块与文件头被跳过；cue 标识符不是数字时按顺序编号。
+    """
+    skipping = True   # 文件头或 NOTE/STYLE/REGION 块，直到遇到空行
+    span: Optional[Tuple[int, int]] = None
+    content: List[str] = []
+    counter = 0
+
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            if span is not None:
+                block = _flush_block(counter, span, content, keep_empty)
+                if block:
+                    yield block
+            skipping, span, content = False, None, []
+            continue
+        if skipping:
+            continue
+        if span is None:
+            match = VTT_TIMESTAMP_RE.match(stripped)
+            if match:
+                counter += 1
+                span = (parse_vtt_time(match.group(1)), parse_vtt_time(match.group(2)))
+            elif stripped.startswith(("NOTE", "STYLE", "REGION", "WEBVTT")):
+                skipping = True
+            # 其余情况是 cue 标识符，忽略
+        else:
+            content.append(VTT_TAG_RE.sub('', line).rstrip())
+
+    if span is not None:
+        block = _flush_block(counter, span, content, keep_empty)
+        if block:
+            yield block
+
+
+def iter_vtt(source, keep_empty: bool = False) -> Iterator[SubtitleBlock]:
+    """流式读取 WebVTT 文件"""
+    yield from parse_vtt_lines(_lines(source), keep_empty=keep_empty)
+
+
+def write_vtt(target, blocks: Iterable[SubtitleBlock]) -> int:
+    """流式写出 WebVTT"""
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, 'w', encoding='utf-8') as f:
+            return write_vtt(f, blocks)
+    target.write("WEBVTT\n\n")
+    count = 0
+    for block in blocks:
+        count += 1
+        target.write(f"{format_vtt_time(block.start)} --> {format_vtt_time(block.end)}\n{block.content}\n\n")
+    return count
+
+
+# ---------------------------------------------------------------------------
+# ASS
+# ---------------------------------------------------------------------------
+
+def clean_ass_text(text: str, newline: str = "\n") -> str:
+    """移除 {\\...} 样式标签，把 \\N / \\n 转为换行 (或指定的分隔符)，\\h 转为空格"""
+    text = ASS_TAG_RE.sub('', text)
+    text = text.replace('\\N', newline).replace('\\n', newline).replace('\\h', ' ')
+    return text.strip()
+
+
+def parse_ass_lines(lines: Iterable[str], include_comments: bool = False) -> Iterator[Dict[str, str]]:
+    """
+    逐行解析 ASS 的 [Events] 段，按 Format 行确定字段位置，产出事件字典：
+    键为 Format 中的字段名，另有 'Kind' ('Dialogue' / 'Comment')。
+    Text 是最后一个字段，其中的逗号原样保留；字段数不足的行被跳过。
+    """
+    in_events = False
+    fields = DEFAULT_ASS_FORMAT
+
+    for raw in lines:
+        line = raw.strip()
+        if line.startswith('['):
+            in_events = line.lower() == '[events]'
+            continue
+        if not in_events or not line:
+            continue
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
+        key = key.strip()
+        if key == 'Format':
+            fields = [name.strip() for name in value.split(',')]
+            continue
+        if key != 'Dialogue' and not (include_comments and key == 'Comment'):
+            continue
+        parts = value.lstrip().split(',', len(fields) - 1)
+        if len(parts) < len(fields):
+            logger.debug(f"跳过字段不足的 ASS 事件: {line[:60]}")
+            continue
+        event = {name: part.strip() if name != 'Text' else part for name, part in zip(fields, parts)}
+        event['Kind'] = key
+        yield event
+
+
+def iter_ass(source, include_comments: bool = False) -> Iterator[Dict[str, str]]:
+    """流式读取 ASS 事件"""
+    yield from parse_ass_lines(_lines(source), include_comments=include_comments)
+
+
+def ass_events_to_blocks(events: Iterable[Dict[str, str]], keep_empty: bool = False) -> Iterator[SubtitleBlock]:
+    """把 ASS 事件转换为 SubtitleBlock (移除样式标签，按顺序编号)"""
+    counter = 0
+    for event in events:
+        text = clean_ass_text(event.get('Text', ''))
+        if not text and not keep_empty:
+            continue
+        counter += 1
+        yield SubtitleBlock(counter, parse_ass_time(event.get('Start', '')), parse_ass_time(event.get('End', '')), text)
+
+
+def write_ass(target, header: str, dialogue_lines: Iterable[str]) -> int:
+    """写出 ASS：header 为 [Script Info]/[V4+ Styles]/[Events] 头部模板，dialogue_lines 为已格式化的事件行"""
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, 'w', encoding='utf-8') as f:
+            return write_ass(f, header, dialogue_lines)
+    target.write(header)
+    if not header.endswith('\n'):
+        target.write('\n')
+    count = 0
+    for line in dialogue_lines:
+        target.write(line)
+        count += 1
+    return count
+
+
+# ---------------------------------------------------------------------------
+# 按扩展名分派
+# ---------------------------------------------------------------------------
+
+SUBTITLE_EXTS = (".srt", ".ass", ".ssa", ".vtt")
+
+
+def iter_blocks(file_path: str, keep_empty: bool = False) -> Iterator[SubtitleBlock]:
+    """按扩展名读取任意支持的字幕文件，统一产出 SubtitleBlock"""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in (".ass", ".ssa"):
+        return ass_events_to_blocks(iter_ass(file_path), keep_empty=keep_empty)
+    if ext == ".vtt":
+        return iter_vtt(file_path, keep_empty=keep_empty)
+    return iter_srt(file_path, keep_empty=keep_empty)
+
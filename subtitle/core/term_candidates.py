@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import json
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .config import TERM_BACKGROUND_PATH
+
+logger = logging.getLogger(__name__)
+
+# 常见功能词：不会是术语，也不作为“新候选”触发术语提取
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "if", "then", "so", "because", "as", "of", "at", "by", "for",
+    "with", "about", "into", "through", "over", "after", "before", "from", "up", "down", "in", "out",
+    "on", "off", "to", "again", "there", "here", "when", "where", "why", "how", "all", "any", "both",
+    "each", "more", "most", "other", "some", "such", "no", "nor", "not", "only", "own", "same", "than",
+    "too", "very", "can", "will", "just", "should", "would", "could", "now", "this", "that", "these",
+    "those", "what", "which", "who", "whom", "i", "me", "my", "we", "our", "you", "your", "he", "him",
+    "his", "she", "her", "it", "its", "they", "them", "their", "is", "are", "was", "were", "be", "been",
+    "being", "have", "has", "had", "do", "does", "did", "doing", "yes", "yeah", "oh", "okay", "ok",
+    "well", "right", "really", "know", "think", "going", "gonna", "get", "got", "like", "look", "come",
+    "said", "says", "want", "good", "great", "thing", "things", "something", "nothing", "everything",
+    "let's", "i'm", "it's", "that's", "don't", "can't", "you're", "we're", "they're", "there's", "what's",
+    "i've", "i'll", "he's", "she's", "didn't", "isn't", "wasn't", "won't",
+}
+
+_CAP_PHRASE_RE = re.compile(r"\b[A-Z][\w'\-]*(?:\s+(?:of|the|de|von|van)?\s*[A-Z][\w'\-]*)*")
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'\-]+")
+_ALNUM_RE = re.compile(r"\b(?=[A-Za-z]*\d)(?=\d*[A-Za-z])[A-Za-z0-9\-]{2,}\b")
+_CJK_RUN_RE = re.compile(r'[一-鿿]{2,}')
+# 小写单词达到此长度才作为候选 (短词几乎都是常用词)
+MIN_WORD_LEN = 4
+
+
+def extract_candidates(text: str) -> Set[str]:
+    """
+    从一行字幕中提取术语候选（统一小写）：
+    - 英文：大写开头的短语 (专名)、字母数字混合词 (V8, F1)、较长的普通单词 (行业术语)
+    - 中文：连续的汉字片段按二字组切分
+    """
+    candidates: Set[str] = set()
+    for match in _CAP_PHRASE_RE.finditer(text):
+        phrase = match.group(0).strip()
+        if phrase.lower() not in STOPWORDS:
+            candidates.add(phrase.lower())
+    for match in _ALNUM_RE.finditer(text):
+        candidates.add(match.group(0).lower())
+    for match in _WORD_RE.finditer(text):
+        word = match.group(0).lower()
+        if len(word) >= MIN_WORD_LEN and word not in STOPWORDS:
+            candidates.add(word)
+    for match in _CJK_RUN_RE.finditer(text):
+        run = match.group(0)
+        candidates.update(run[i:i + 2] for i in range(len(run) - 1))
+    return candidates
+
+
+# --- 本地候选预筛 (无剧集画像时，只把含未收录候选的字幕行送给 LLM 做术语提取) ---
+
+# 句首位置：行首或句末标点之后，前面只有空白、引号、括号、破折号或音乐符号
+_SENTENCE_START_RE = re.compile(r"(?:^|[.!?…])[\s\"'“‘(\[\-–—♪#*]*$")
+# 只出现一次的小写单词达到此长度也算候选 (较长的生僻词多为行业术语)
+LONG_WORD_LEN = 9
+# 背景模型：已处理文件数达到该值后才启用；候选出现在超过该比例的文件中即视为常用词
+MIN_BACKGROUND_DOCS = 3
+COMMON_DOC_RATE = 0.2
+# 背景模型最多保留的候选数，超出时淘汰文档频率最低的
+MAX_BACKGROUND_TERMS = 200000
+
+
+class TermBackground:
+    """
+    背景词频模型：记录每个候选出现在多少个已处理的文件中 (文档频率)。
+    几乎每个文件都会出现的候选是常用词而不是术语，预筛时不再因它们把字幕行送给 LLM。
+    """
+    def __init__(self, path: str = TERM_BACKGROUND_PATH):
+        self.path = path
+        self.documents = 0
+        self.counts: Dict[str, int] = {}
+        # 已计入的文件 (候选集合的摘要)，同一文件重复处理时不重复计数
+        self.digests: Set[str] = set()
+        if path:
+            self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            logger.warning(f"背景词频文件损坏，将重新建立: {self.path}")
+            return
+        self.documents = data.get("documents", 0)
+        self.counts = data.get("counts", {})
+        self.digests = set(data.get("digests", []))
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        data = {"documents": self.documents, "digests": sorted(self.digests), "counts": self.counts}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def add_document(self, candidates: Set[str], confirmed: Iterable[str] = ()) -> bool:
+        """计入一个文件的全部候选 (确认为术语的及其中的单词除外)，返回是否为新文件"""
+        terms = {t.lower() for t in confirmed}
+        if terms:
+            term_words = {w for t in terms for w in t.split()}
+            candidates = {c for c in candidates if c not in terms and not all(w in term_words for w in c.split())}
+        digest = hashlib.md5("\n".join(sorted(candidates)).encode('utf-8')).hexdigest()[:16]
+        if not candidates or digest in self.digests:
+            return False
+        self.digests.add(digest)
+        self.documents += 1
+        counts = self.counts
+        for candidate in candidates:
+            counts[candidate] = counts.get(candidate, 0) + 1
+        if len(counts) > MAX_BACKGROUND_TERMS:
+            keep = sorted(counts.items(), key=lambda kv: kv[1], reverse=True)[:MAX_BACKGROUND_TERMS * 3 // 4]
+            self.counts = dict(keep)
+        return True
+
+    def is_common(self, candidate: str) -> bool:
+        if self.documents < MIN_BACKGROUND_DOCS:
+            return False
+        return self.counts.get(candidate, 0) >= COMMON_DOC_RATE * self.documents
+
+
+def mine_term_candidates(lines: List[str], background: Optional[TermBackground] = None) -> Tuple[List[Set[str]], Set[str]]:
+    """
+    统计式术语候选挖掘：返回 (每行中像术语的候选, 全文出现的全部候选)。
+    候选须有“术语证据”且不是背景模型中的常用词：
+    - 字母数字混合词 (V12, GT3)；
+    - 大写短语：出现在句中，或由多个大写词组成；只出现在句首的单个大写词，要求全文没有它的小写写法；
+    - 小写单词与汉字二字组：在本文件中重复出现，或单词长度达到 LONG_WORD_LEN。
+    """
+    per_line: List[Dict[str, int]] = []
+    proper: Set[str] = set()
+    initial: Set[str] = set()
+    codes: Set[str] = set()
+    lowercase: Set[str] = set()
+    freq: Dict[str, int] = {}
+    for line in lines:
+        found: Dict[str, int] = {}
+        for match in _CAP_PHRASE_RE.finditer(line):
+            phrase = match.group(0).strip()
+            low = phrase.lower()
+            if low in STOPWORDS:
+                continue
+            found[low] = 1
+            if " " in phrase or not _SENTENCE_START_RE.search(line, 0, match.start()):
+                proper.add(low)
+            else:
+                initial.add(low)
+        for match in _ALNUM_RE.finditer(line):
+            code = match.group(0).lower()
+            codes.add(code)
+            found[code] = 1
+        for match in _WORD_RE.finditer(line):
+            word = match.group(0)
+            if not word[0].islower():
+                continue
+            lowercase.add(word)
+            if len(word) >= MIN_WORD_LEN and word not in STOPWORDS:
+                found[word] = found.get(word, 0) + 1
+        for match in _CJK_RUN_RE.finditer(line):
+            run = match.group(0)
+            for i in range(len(run) - 1):
+                found[run[i:i + 2]] = found.get(run[i:i + 2], 0) + 1
+        for candidate, count in found.items():
+            freq[candidate] = freq.get(candidate, 0) + count
+        per_line.append(found)
+
+    def is_term_like(candidate: str) -> bool:
+        if candidate in codes or candidate in proper:
+            return True
+        if candidate in initial and candidate not in lowercase:
+            return True
+        return freq[candidate] >= 2 or len(candidate) >= LONG_WORD_LEN
+
+    all_candidates = set(freq)
+    terms = {c for c in all_candidates
+             if is_term_like(c) and (background is None or not background.is_common(c))}
+    return [{c for c in found if c in terms} for found in per_line], all_candidates
+
+
+_background: Optional[TermBackground] = None
+
+
+def get_term_background() -> TermBackground:
+    global _background
+    if _background is None:
+        _background = TermBackground()
+    return _background
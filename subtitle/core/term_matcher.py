@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+术语多模式匹配：在文本中找出词表中出现的全部词条，重叠时取最左、最长者，忽略大小写。
+- 中日韩文字没有空格分词，词条可以从任意一个字开始、在任意一个字结束；
+- 拉丁等以空格分词的文字保持整词匹配：词条首/尾为字母数字时，两侧相邻字符不能也是字母数字。
+FlashText 把每个汉字都当作单词边界，紧跟在匹配之后、或紧跟在字母数字之后的中文词条会被漏掉。
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+
+# 需要整词匹配的字符：\w 中除去中日韩文字 (部首、假名、CJK 统一/兼容表意文字、韩文音节、半角片假名、扩展 B~G)
+_CJK_RANGES = "⺀-鿿가-힯豈-﫿ｦ-ﾟ\U00020000-\U0003134f"
+_WORD = f"[^\\W{_CJK_RANGES}]"
+# 扫描片段：ASCII 单词 (只有词首可以作为起点)；其他 \w 串 (汉字、非 ASCII 拉丁字母及混排) 与标点串，
+# 其中除拉丁单词内部以外的每个字符都可以作为起点。文本已转为小写
+_SPAN = re.compile(r"([a-z0-9_]+)|\w+|[^\w\s]+")
+_WORD_CHAR = re.compile(_WORD)
+
+# 追加在文本末尾的哨兵字符 (含该字符的词条不会加入)
+_SENTINEL = "\0"
+# 词条结尾标记，存放词条的原始写法 (空串不会是文本中的字符)
+_END = ""
+
+
+class TermMatcher:
+    """
+    词条匹配器：add() 加入词条，find() 返回文本中出现的词条 (按出现顺序，保留加入时的原始写法)。
+    词条以小写存入嵌套 dict 构成的 trie；扫描时由正则在 C 层分段并跳过空白与 ASCII 单词内部，
+    只在可能的起点沿 trie 向后取通过边界检查的最长匹配，匹配成功后从其结尾继续。
+    """
+    __slots__ = ("trie", "size")
+
+    def __init__(self, terms: Iterable[str] = ()):
+        self.trie: Dict = {}
+        self.size = 0
+        for term in terms:
+            self.add(term)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, term: str):
+        """加入词条；同一词条 (忽略大小写) 多次加入时以最后一次的写法为准"""
+        if not term or _SENTINEL in term:
+            return
+        node = self.trie
+        for ch in term.lower():
+            child = node.get(ch)
+            if child is None:
+                child = node[ch] = {}
+            node = child
+        if _END not in node:
+            self.size += 1
+        node[_END] = term
+
+    def find(self, text: str) -> List[str]:
+        if not text or not self.size:
+            return []
+        # 末尾的哨兵字符不在任何词条中，向后匹配走到它时必然停下，无需逐字符判断是否越界
+        text = text.lower() + _SENTINEL
+        # 本段文本中需要整词匹配的字符，扫描时用集合判断代替逐字符的正则/函数调用
+        word_chars = frozenset(_WORD_CHAR.findall("".join(set(text))))
+        root = self.trie
+        found = []
+        pos = 0
+        for m in _SPAN.finditer(text):
+            start, stop = m.span()
+            if m.lastindex:
+                # ASCII 单词只能从词首开始匹配，且词条不会在单词内部结束：先不做检查地走完整个单词
+                if start < pos:
+                    continue
+                node = root
+                for ch in m.group(1):
+                    node = node.get(ch)
+                    if node is None:
+                        break
+                if node is None:
+                    continue
+                i, stop = stop, start + 1
+            else:
+                if start < pos:
+                    start = pos
+                node = None
+            while start < stop:
+                if node is None:
+                    ch = text[start]
+                    # 拉丁单词内部不能作为起点 (start 为 0 时 text[-1] 是哨兵字符)
+                    if ch in word_chars and text[start - 1] in word_chars:
+                        start += 1
+                        continue
+                    node = root.get(ch)
+                    if node is None:
+                        start += 1
+                        continue
+                    i = start + 1
+                term: Optional[str] = None
+                while True:
+                    ch = text[i]
+                    # 词条尾为拉丁字母数字时，下一个字符不能继续该单词
+                    if _END in node and (ch not in word_chars or text[i - 1] not in word_chars):
+                        term, end = node[_END], i
+                    node = node.get(ch)
+                    if node is None:
+                        break
+                    i += 1
+                if term is None:
+                    start += 1
+                else:
+                    found.append(term)
+                    start = end
+            if start > pos:
+                pos = start
+        return found
+
+    def to_data(self) -> Dict:
+        """可被 marshal 序列化的结构"""
+        return {"trie": self.trie, "size": self.size}
+
+    @classmethod
+    def from_data(cls, data: Dict) -> "TermMatcher":
+        matcher = cls.__new__(cls)
+        matcher.trie = data["trie"]
+        matcher.size = data["size"]
+        return matcher
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import os
+import importlib.util
+from functools import lru_cache
+
+from .config import BASE_DIR
+
+# 预处理 / 后处理脚本 (文件名以数字开头，不能直接 import)
+EXTRACT_TOOL_PATH = os.path.join(BASE_DIR, "pre-process", "01-extract_srt.py")
+ASS_TOOL_PATH = os.path.join(BASE_DIR, "post-process", "02-post_process_ass.py")
+ASS_HEAD_PATH = os.path.join(BASE_DIR, "post-process", "asshead.txt")
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@lru_cache(maxsize=None)
+def get_extract_tool():
+    """字幕提取/转换脚本，首次使用时才加载 (只翻译 SRT 时无需执行)"""
+    return load_module("extract_tool", EXTRACT_TOOL_PATH)
+
+
+@lru_cache(maxsize=None)
+def get_ass_tool():
+    """ASS 渲染脚本，首次使用时才加载 (只输出 SRT 时无需执行)"""
+    return load_module("ass_tool", ASS_TOOL_PATH)
+
+
+def ass_head_path() -> str:
+    return ASS_HEAD_PATH if os.path.exists(ASS_HEAD_PATH) else "asshead.txt"
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+import re
+import sqlite3
+import logging
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import db
+from .config import TM_DB_PATH
+from .subtitle_io import SubtitleBlock
+from .fuzzy_index import (
+    fuzzy_normalize, char_ngrams, jaccard, minhash_signature, band_keys, same_numbers, same_sentence_type
+)
+
+logger = logging.getLogger(__name__)
+
+# 从已有双语字幕导入的人工译文使用的模型标记，任何模型查询时都可复用
+HUMAN_MODEL = "human"
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# 单次模糊查询最多复核的候选数，防止极常见的短句分桶过大
+MAX_FUZZY_CANDIDATES = 256
+
+
+def normalize_source(text: str) -> str:
+    """归一化原文作为精确匹配键：Unicode NFKC + 合并空白"""
+    text = unicodedata.normalize('NFKC', text or "")
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+class TranslationMemory:
+    """
+    跨文件翻译记忆：以 (归一化原文, 目标语言, 模型) 为键保存润色后的译文，
+    翻译前先查询，精确命中的字幕块直接复用，无需调用 LLM。
+    另有 MinHash LSH 分桶索引 (tm_lsh) 支持近似句的模糊查询。
+    """
+    def __init__(self, db_path: str = TM_DB_PATH):
+        self.db_path = db_path
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.references = 0
+        self.lookups = 0
+        self._initialized = False
+
+    def _init_db(self):
+        if self._initialized:
+            return
+        with db.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tm (
+                    source_norm TEXT NOT NULL,
+                    target_lang TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    source_text TEXT,
+                    target_text TEXT,
+                    hit_count INTEGER DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (source_norm, target_lang, model)
+                )
+            ''')
+            # LSH 分桶索引：每条记录按签名分段写入 BANDS 个分桶键
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tm_lsh (
+                    band_key INTEGER NOT NULL,
+                    tm_rowid INTEGER NOT NULL,
+                    PRIMARY KEY (band_key, tm_rowid)
+                ) WITHOUT ROWID
+            ''')
+            # 旧版记忆库没有分桶索引：一次性为已有记录补建
+            cursor.execute("SELECT 1 FROM tm_lsh LIMIT 1")
+            if cursor.fetchone() is None:
+                cursor.execute("SELECT source_norm, target_lang, model, source_text, target_text FROM tm")
+                existing = cursor.fetchall()
+                if existing:
+                    logger.info(f"正在为翻译记忆中的 {len(existing)} 条记录建立模糊索引...")
+                    self._index_rows(cursor, existing)
+        self._initialized = True
+
+    def lookup_many(self, sources: Iterable[str], target_lang: str, model: str) -> Dict[str, str]:
+        """
+        批量查询，返回 {归一化原文: 译文}。
+        同一模型的记录优先，其次是人工导入的记录。
+        """
+        self._init_db()
+        keys = sorted({normalize_source(s) for s in sources if normalize_source(s)})
+        found: Dict[str, str] = {}
+        if not keys:
+            return found
+
+        with db.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            # 分段查询，避免超过 SQLite 的参数数量上限
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(f'''
+                    SELECT source_norm, model, target_text FROM tm
+                    WHERE target_lang = ? AND model IN (?, ?) AND source_norm IN ({placeholders})
+                ''', (target_lang, model, HUMAN_MODEL, *chunk))
+                for source_norm, row_model, target_text in cursor.fetchall():
+                    if not target_text:
+                        continue
+                    if row_model == model or source_norm not in found:
+                        found[source_norm] = target_text
+
+            if found:
+                cursor.executemany('''
+                    UPDATE tm SET hit_count = hit_count + 1
+                    WHERE source_norm = ? AND target_lang = ? AND model IN (?, ?)
+                ''', [(k, target_lang, model, HUMAN_MODEL) for k in found])
+        return found
+
+    def fuzzy_lookup(self, source: str, target_lang: str, model: str, min_similarity: float, limit: int = 3) -> List[Dict]:
+        """
+        模糊查询：通过 LSH 分桶取候选，再按字符 n-gram 的 Jaccard 相似度复核。
+        返回按相似度降序排列的 [{"similarity", "source", "target"}]。
+        """
+        self._init_db()
+        query_grams = char_ngrams(fuzzy_normalize(source))
+        keys = band_keys(minhash_signature(query_grams))
+        if not keys:
+            return []
+
+        with db.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            placeholders = ",".join("?" * len(keys))
+            # 先按语言/模型过滤，再按命中的分段数 (近似相似度) 排序后截断，
+            # 避免分桶过大时截掉的恰好是最相似或本语言的候选
+            cursor.execute(f'''
+                SELECT tm.source_text, tm.target_text, tm.model
+                FROM tm_lsh JOIN tm ON tm.rowid = tm_lsh.tm_rowid
+                WHERE tm_lsh.band_key IN ({placeholders}) AND tm.target_lang = ? AND tm.model IN (?, ?)
+                GROUP BY tm_lsh.tm_rowid
+                ORDER BY COUNT(*) DESC
+                LIMIT ?
+            ''', (*keys, target_lang, model, HUMAN_MODEL, MAX_FUZZY_CANDIDATES))
+            rows = cursor.fetchall()
+
+        best: Dict[str, Dict] = {}
+        for cand_source, cand_target, cand_model in rows:
+            if not cand_target:
+                continue
+            sim = jaccard(query_grams, char_ngrams(fuzzy_normalize(cand_source)))
+            if sim < min_similarity:
+                continue
+            prev = best.get(cand_source)
+            # 相似度相同时优先当前模型的译文
+            if prev is None or sim > prev["similarity"] or (sim == prev["similarity"] and cand_model == model):
+                best[cand_source] = {"similarity": sim, "source": cand_source, "target": cand_target}
+        return sorted(best.values(), key=lambda m: m["similarity"], reverse=True)[:limit]
+
+    def resolve_blocks(self, blocks: List[SubtitleBlock], target_lang: str, model: str,
+                       reuse_threshold: Optional[float] = None,
+                       reference_threshold: Optional[float] = None) -> Tuple[Dict[int, str], Dict[int, List[Dict]]]:
+        """
+        为字幕块查询记忆，返回 ({块 ID: 可直接复用的译文}, {块 ID: 参考译文列表})。
+        精确命中直接复用；未命中且给出阈值时做模糊查询：
+        相似度 >= reuse_threshold 且数字与句型 (疑问/陈述) 一致的候选中取最相似的一条直接复用，
+        落在 [reference_threshold, reuse_threshold) 之间的作为润色阶段的参考译文。
+        """
+        found = self.lookup_many((b.content for b in blocks), target_lang, model)
+        resolved: Dict[int, str] = {}
+        references: Dict[int, List[Dict]] = {}
+        fuzzy_hits = 0
+        for b in blocks:
+            text = found.get(normalize_source(b.content))
+            if text:
+                resolved[b.id] = text
+                continue
+            if reference_threshold is None:
+                continue
+            matches = self.fuzzy_lookup(b.content, target_lang, model, min_similarity=reference_threshold)
+            if not matches:
+                continue
+            # 候选已按相似度降序排列：最相似的一条数字或句型不符时，继续看阈值以上的其余候选
+            reusable = next((m for m in matches
+                             if reuse_threshold is not None and m["similarity"] >= reuse_threshold
+                             and same_numbers(b.content, m["source"])
+                             and same_sentence_type(b.content, m["source"])), None)
+            if reusable is not None:
+                resolved[b.id] = reusable["target"]
+                fuzzy_hits += 1
+            else:
+                references[b.id] = matches
+        self.lookups += len(blocks)
+        self.hits += len(resolved)
+        self.fuzzy_hits += fuzzy_hits
+        self.references += len(references)
+        return resolved, references
+
+    def add_pairs(self, pairs: Iterable[Tuple[str, str]], target_lang: str, model: str) -> int:
+        """写入 (原文, 译文) 对，已存在的键更新为最新译文"""
+        self._init_db()
+        rows = []
+        for source, target in pairs:
+            key = normalize_source(source)
+            # 模型偶尔把译文写成数字、列表等非字符串，这类结果不入库
+            target = target.strip() if isinstance(target, str) else ""
+            if key and target:
+                rows.append((key, target_lang, model, source.strip(), target))
+        if not rows:
+            return 0
+        with db.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT INTO tm (source_norm, target_lang, model, source_text, target_text, updated_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(source_norm, target_lang, model) DO UPDATE SET
+                    source_text = excluded.source_text,
+                    target_text = excluded.target_text,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', rows)
+            self._index_rows(cursor, rows)
+        return len(rows)
+
+    def _index_rows(self, cursor: sqlite3.Cursor, rows: List[Tuple]):
+        """为写入的记录生成 LSH 分桶键（已索引的键会被忽略）"""
+        lsh_rows = []
+        for key, target_lang, model, _, _ in rows:
+            cursor.execute(
+                "SELECT rowid FROM tm WHERE source_norm = ? AND target_lang = ? AND model = ?",
+                (key, target_lang, model)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                continue
+            for band_key in band_keys(minhash_signature(char_ngrams(fuzzy_normalize(key)))):
+                lsh_rows.append((band_key, row[0]))
+        cursor.executemany("INSERT OR IGNORE INTO tm_lsh (band_key, tm_rowid) VALUES (?, ?)", lsh_rows)
+
+    def add_results(self, final_blocks: List[SubtitleBlock], target_lang: str, model: str,
+                    fallback_ids: Iterable[int] = ()) -> int:
+        """保存流水线的润色结果；降级的块 (fallback_ids，译文是直译或原文兜底) 与保留原文的块不入库"""
+        skipped = set(fallback_ids)
+        pairs = [
+            (b.content, b.translation) for b in final_blocks
+            if b.id not in skipped and isinstance(b.translation, str) and b.translation.strip()
+            and b.translation.strip() != b.content.strip()
+        ]
+        return self.add_pairs(pairs, target_lang, model)
+
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def report(self) -> str:
+        return (f"翻译记忆命中 {self.hits}/{self.lookups} 块 ({self.hit_rate():.1%})，"
+                f"其中模糊复用 {self.fuzzy_hits} 块，另有 {self.references} 块附带参考译文")
+
+    def stats(self) -> List[Tuple[str, str, int, int]]:
+        """按 (目标语言, 模型) 汇总条目数与累计命中次数"""
+        if not Path(self.db_path).exists():
+            return []
+        self._init_db()
+        with db.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT target_lang, model, COUNT(*), COALESCE(SUM(hit_count), 0)
+                FROM tm GROUP BY target_lang, model ORDER BY target_lang, model
+            ''')
+            rows = cursor.fetchall()
+        return rows
+
+
+# 全局单例
+translation_memory = TranslationMemory()
@@ -1,14 +1,20 @@
 # -*- coding: utf-8 -*- 
 
 import json
+import zlib
+import random
 import asyncio
 import logging
-from typing import List, Dict, Tuple
-from tqdm import tqdm
+from typing import List, Dict, Set, Tuple, Optional
 
 from .llm_client import call_llm, clean_and_extract_json
 from .prompts import get_prompt_templates
-from .glossary_manager import glossary_manager
+from .glossary_manager import get_glossary_manager
+from .db import run_db
+from .batch_controller import get_batch_controller
+from .term_candidates import extract_candidates, mine_term_candidates, get_term_background
+from .metrics import pipeline_metrics
+from .subtitle_io import SubtitleBlock
 
 logger = logging.getLogger(__name__)
 
@@ -20,132 +26,286 @@ def filter_relevant_glossary(text_content: str, full_glossary: Dict[str, str]) -
             relevant[src] = tgt
     return relevant
 
-async def extract_global_terms(config, blocks: List[Dict]) -> Dict[str, str]:
-    """提取术语（动态循环采样版）"""
-    templates = get_prompt_templates(config.target_lang)
-    
+MAX_SAMPLE_LEN = 4000
+
+def _group_lines(lines: List[str], max_len: int = MAX_SAMPLE_LEN) -> List[List[str]]:
+    """按整行分组，每组拼接后不超过 max_len 个字符"""
+    groups, current, length = [], [], 0
+    for line in lines:
+        if current and length + len(line) + 1 > max_len:
+            groups.append(current)
+            current, length = [], 0
+        current.append(line)
+        length += len(line) + 1
+    if current:
+        groups.append(current)
+    return groups
+
+def _chunk_lines(lines: List[str], max_len: int = MAX_SAMPLE_LEN) -> List[str]:
+    """按整行拼接文本块，每块不超过 max_len 个字符"""
+    return ["".join(line + "\n" for line in group) for group in _group_lines(lines, max_len)]
+
+def _cyclic_sample_parts(blocks: List[SubtitleBlock]) -> Tuple[int, List[str]]:
+    """循环采样：第 k 步取下标 ≡ k (mod 步数) 的块，每步的文本按 MAX_SAMPLE_LEN 切分，返回 (步数, 文本块)"""
     # 动态计算采样步数：每 100 块对应 1 步，最少 5 步
     num_passes = max(5, (len(blocks) + 99) // 100)
-    print(f"=== Step 1: 构建术语表 (动态 {num_passes} 步循环采样) ===")
-    
-    all_llm_glossary = {}
-    
-    # 准备所有并发任务
-    tasks = []
-    
+    text_parts = []
     for pass_idx in range(num_passes):
         sampled_text = ""
         for i in range(pass_idx, len(blocks), num_passes):
-            sampled_text += blocks[i]['content'] + "\n"
-        
-        MAX_SAMPLE_LEN = 4000
-        text_parts = [sampled_text[i:i+MAX_SAMPLE_LEN] for i in range(0, len(sampled_text), MAX_SAMPLE_LEN)]
-        
-        for part_text in text_parts:
-            messages = [{"role": "system", "content": templates["TERM_EXTRACT"].format(content=part_text)}]
-            # 创建协程任务
-            tasks.append(call_llm(config, messages, temperature=config.temp_terms))
-    
-    if tasks:
-        print(f"  🚀 发起 {len(tasks)} 个并发采样请求...")
-        # 使用 tqdm 配合 asyncio.gather 的简单封装或手动分批
-        # 这里直接 gather 所有任务，并用 tqdm 展示
-        results = []
-        pbar = tqdm(total=len(tasks), desc="并发提取术语")
-        
-        # 为了能让 pbar 更新，我们需要包装一下任务
-        async def watched_task(task):
-            res = await task
-            pbar.update(1)
-            return res
-            
-        results = await asyncio.gather(*[watched_task(t) for t in tasks])
-        pbar.close()
-        
-        for result in results:
-            data = clean_and_extract_json(result)
-            if isinstance(data, dict):
-                all_llm_glossary.update(data)
-    
-    full_text = "\n".join([b['content'] for b in blocks])
-    historical_glossary = glossary_manager.extract_terms(full_text)
-    final_glossary = {**all_llm_glossary, **historical_glossary}
+            sampled_text += blocks[i].content + "\n"
+        text_parts.extend(sampled_text[i:i+MAX_SAMPLE_LEN] for i in range(0, len(sampled_text), MAX_SAMPLE_LEN))
+    return num_passes, text_parts
+
+async def _request_terms(config, text_parts: List[str]) -> Tuple[Dict[str, str], List[bool]]:
+    """
+    并发发送术语提取请求，返回 (合并后的术语, 每个文本块是否提取成功)。
+    请求失败、被拒绝或返回内容无法解析为 JSON 对象的文本块视为未提取。
+    """
+    templates = get_prompt_templates(config.target_lang)
+    all_llm_glossary = {}
+    if not text_parts:
+        return all_llm_glossary, []
+
+    from tqdm import tqdm
+    print(f"  🚀 发起 {len(text_parts)} 个并发采样请求...")
+    pbar = tqdm(total=len(text_parts), desc="并发提取术语")
+
+    # 为了能让 pbar 更新，我们需要包装一下任务
+    async def watched_task(part_text):
+        messages = [{"role": "system", "content": templates["TERM_EXTRACT"].format(content=part_text)}]
+        timing = {}
+        res = await call_llm(config, messages, temperature=config.temp_terms, timing=timing)
+        pipeline_metrics.record_call("terms", 0, timing.get('latency', 0.0), success=res is not None)
+        pbar.update(1)
+        return res
+
+    results = await asyncio.gather(*[watched_task(t) for t in text_parts])
+    pbar.close()
+
+    succeeded = []
+    for result in results:
+        data = clean_and_extract_json(result) if result else None
+        succeeded.append(isinstance(data, dict))
+        if isinstance(data, dict):
+            all_llm_glossary.update(data)
+    return all_llm_glossary, succeeded
+
+def select_lines_with_new_candidates(blocks: List[SubtitleBlock], series_profile) -> Tuple[List[str], set]:
+    """
+    增量提取：只挑出含有“剧集画像中尚未检查过的候选短语”的字幕行。
+    返回 (需要送给 LLM 的行, 本集出现的全部候选)。
+    """
+    known = {k.lower() for k in series_profile.glossary}
+    seen_lines = set()
+    selected, all_candidates = [], set()
+    for b in blocks:
+        line = b.content.strip()
+        if not line or line in seen_lines:
+            continue
+        seen_lines.add(line)
+        candidates = extract_candidates(line)
+        all_candidates |= candidates
+        if any(c not in known and not series_profile.is_known(c) for c in candidates):
+            selected.append(line)
+    return selected, all_candidates
+
+def select_lines_with_unresolved_candidates(blocks: List[SubtitleBlock], known_terms, background,
+                                            sample_rate: float) -> Tuple[List[str], int, set]:
+    """
+    候选预筛：只挑出含有“未收录候选”(像术语、不是常用词、也不在历史术语表中) 的字幕行，
+    其余行按 sample_rate 随机抽样一部分一并发送，兜住预筛漏掉的术语。
+    返回 (需要送给 LLM 的行, 其中抽样的行数, 本文件出现的全部候选)。
+    """
+    known = {k.lower() for k in known_terms}
+    known_words = {w for k in known for w in k.split()}
+    lines, seen_lines = [], set()
+    for b in blocks:
+        line = b.content.strip()
+        if line and line not in seen_lines:
+            seen_lines.add(line)
+            lines.append(line)
+    per_line, all_candidates = mine_term_candidates(lines, background)
+
+    def unresolved(candidate: str) -> bool:
+        return candidate not in known and not all(w in known_words for w in candidate.split())
+
+    # 随机种子取自文本内容，同一文件每次选出相同的行
+    rng = random.Random(zlib.crc32("\n".join(lines).encode('utf-8')))
+    selected, sampled = [], 0
+    for line, candidates in zip(lines, per_line):
+        if any(unresolved(c) for c in candidates):
+            selected.append(line)
+        elif rng.random() < sample_rate:
+            selected.append(line)
+            sampled += 1
+    return selected, sampled, all_candidates
+
+async def extract_global_terms(config, blocks: List[SubtitleBlock], series_profile=None) -> Dict[str, str]:
+    """
+    提取术语（动态循环采样版）。
+    传入剧集画像时改为增量提取：只把含新候选短语的行送给 LLM，并把结果并入剧集术语表；
+    否则启用候选预筛时只发送含未收录候选的行 (外加少量随机抽样)。
+    """
+    full_text = "\n".join([b.content for b in blocks])
+    glossary_manager = get_glossary_manager()
+    # 目标为英文时使用反向 (中->英) 索引与发现库
+    reverse = config.target_lang == 'en'
+    historical_glossary = glossary_manager.extract_terms(full_text, reverse=reverse)
+
+    if series_profile is not None:
+        # 同一剧集的提取串行执行，批量模式下后一集可以直接利用前一集的结果
+        async with series_profile.lock:
+            selected, all_candidates = select_lines_with_new_candidates(blocks, series_profile)
+            groups = _group_lines(selected)
+            print(f"=== Step 1: 构建术语表 (剧集 [{series_profile.name}] 增量提取: "
+                  f"{len(selected)}/{len(blocks)} 行含新候选，{len(groups)} 个请求) ===")
+            all_llm_glossary, succeeded = await _request_terms(config, _chunk_lines(selected))
+            series_profile.glossary.update(all_llm_glossary)
+            # 提取失败的文本块中的候选不记为已检查，下一集会再次送给 LLM
+            failed = [group for group, ok in zip(groups, succeeded) if not ok]
+            if failed:
+                unexamined = {c for group in failed for line in group for c in extract_candidates(line)}
+                unexamined -= {c for group, ok in zip(groups, succeeded) if ok
+                               for line in group for c in extract_candidates(line)}
+                all_candidates -= unexamined
+                logger.warning(f"⚠️ {len(failed)}/{len(groups)} 个术语提取请求失败，其中的 {len(unexamined)} 个候选留待下一集重新提取")
+            series_profile.examined |= all_candidates
+            series_profile.episodes += 1
+            series_profile.save()
+            series_glossary = filter_relevant_glossary(full_text, series_profile.glossary)
+    elif config.enable_term_prefilter:
+        background = get_term_background()
+        selected, sampled, all_candidates = select_lines_with_unresolved_candidates(
+            blocks, historical_glossary, background, config.term_prefilter_sample_rate)
+        text_parts = _chunk_lines(selected)
+        print(f"=== Step 1: 构建术语表 (候选预筛: {len(selected) - sampled} 行含未收录候选 + {sampled} 行随机抽样"
+              f"/{len(blocks)} 块，{len(text_parts)} 个请求) ===")
+        all_llm_glossary, succeeded = await _request_terms(config, text_parts)
+        # 只从提取成功的文件学习背景词频，且不计入确认为术语的候选 (否则剧中反复出现的专名会被当作常用词)
+        if all(succeeded) and background.add_document(all_candidates, confirmed=[*all_llm_glossary, *historical_glossary]):
+            background.save()
+        series_glossary = {}
+    else:
+        num_passes, text_parts = _cyclic_sample_parts(blocks)
+        print(f"=== Step 1: 构建术语表 (动态 {num_passes} 步循环采样) ===")
+        all_llm_glossary, _ = await _request_terms(config, text_parts)
+        series_glossary = {}
+
+    final_glossary = {**series_glossary, **all_llm_glossary, **historical_glossary}
     
-    if all_llm_glossary:
-        glossary_manager.save_terms(all_llm_glossary)
+    if all_llm_glossary and config.save_discovered_terms:
+        await run_db(glossary_manager.save_terms, all_llm_glossary, reverse=reverse)
     
     print(f"  ✅ 最终术语表包含 {len(final_glossary)} 条目")
     return final_glossary
 
-async def _do_single_request(stage: str, sub_blocks: List[Dict], config, glossary_text: str, use_context: bool, **kwargs) -> List[Dict]:
+def format_reference_translations(sub_blocks: List[SubtitleBlock], references: Optional[Dict[int, List[Dict]]]) -> str:
+    """将翻译记忆的模糊匹配整理为润色 prompt 中的参考译文段落"""
+    if not references:
+        return "None"
+    lines = []
+    for b in sub_blocks:
+        for match in references.get(b.id, []):
+            lines.append(f"- [id {b.id}] {match['source']} -> {match['target']} (sim {match['similarity']:.2f})")
+    return "\n".join(lines) if lines else "None"
+
+async def _do_single_request(stage: str, sub_blocks: List[SubtitleBlock], config, glossary_text: str, use_context: bool, **kwargs) -> List[Dict]:
     """执行单次 API 请求并进行严格的 ID 校验"""
     templates = get_prompt_templates(config.target_lang)
     # 提取当前批次期望的所有 ID
-    expected_ids = {int(b['index']) for b in sub_blocks}
+    expected_ids = {b.id for b in sub_blocks}
+    timing = {}
 
     if stage == "literal":
-        input_data = [{"id": int(b['index']), "text": b['content']} for b in sub_blocks]
+        input_data = [{"id": b.id, "text": b.content} for b in sub_blocks]
         # 如果剥离上下文，直译阶段则不传入术语表
         g_text = glossary_text if use_context else "{}"
         msgs = [{"role": "system", "content": templates["LITERAL_TRANS"].format(
             glossary=g_text, json_input=json.dumps(input_data, ensure_ascii=False)
         )}]
-        raw = await call_llm(config, msgs, temperature=config.temp_literal)
+        raw = await call_llm(config, msgs, temperature=config.temp_literal, timing=timing)
         res = clean_and_extract_json(raw)
     else:
         # polish 阶段
         polish_input = []
         for b in sub_blocks:
-            lit_text = kwargs.get('literal_map', {}).get(str(b['index']), b['content'])
-            polish_input.append({"id": int(b['index']), "original": b['content'], "literal": lit_text})
+            lit_text = kwargs.get('literal_map', {}).get(b.id, b.content)
+            polish_input.append({"id": b.id, "original": b.content, "literal": lit_text})
         
         ctx = kwargs.get('previous_context', "None") if use_context else "None"
         f_ctx = kwargs.get('future_context', "None") if use_context else "None"
         g_text = glossary_text if use_context else "{}"
+        refs = format_reference_translations(sub_blocks, kwargs.get('references')) if use_context else "None"
 
         msgs = [{"role": "system", "content": templates["REVIEW_AND_POLISH"].format(
             glossary=g_text, 
             json_input=json.dumps(polish_input, ensure_ascii=False),
             previous_context=ctx,
-            future_context=f_ctx
+            future_context=f_ctx,
+            reference_translations=refs
         )}]
-        raw = await call_llm(config, msgs, temperature=config.temp_polish)
+        raw = await call_llm(config, msgs, temperature=config.temp_polish, timing=timing)
         res = clean_and_extract_json(raw)
 
-    # --- 严格 ID 校验逻辑 ---
-    if not isinstance(res, list):
+    # 调用方需要不含排队等待的耗时时，累加到其传入的字典 (同一梯次中的请求串行执行)
+    service_time = kwargs.get('service_time')
+    if service_time is not None:
+        service_time['latency'] = service_time.get('latency', 0.0) + timing.get('latency', 0.0)
+
+    valid = raw is not None and _validate_response(stage, res, sub_blocks, expected_ids)
+    # 将结果反馈给自适应批次控制器：传输失败 (无响应) 与批次大小无关，单独统计；
+    # 校验失败在同一档批次的多次重试中只计一次 (batch_attempt 由梯次引擎按档传入)
+    controller = get_batch_controller(config)
+    attempt = kwargs.get('batch_attempt')
+    if raw is None:
+        controller.record_transport_failure(stage, len(sub_blocks))
+    elif valid:
+        controller.record(stage, len(sub_blocks), True, timing.get('latency', 0.0))
+    elif attempt is None or not attempt.get('failed'):
+        controller.record(stage, len(sub_blocks), False, timing.get('latency', 0.0))
+        if attempt is not None:
+            attempt['failed'] = True
+    pipeline_metrics.record_call(stage, len(sub_blocks), timing.get('latency', 0.0), success=valid)
+    if not valid:
         return None
 
+    # 将原文附带回去，方便后续 context 构建
+    if stage == "polish":
+        id_to_original = {b.id: b.content for b in sub_blocks}
+        for item in res:
+            item['original'] = id_to_original.get(int(item['id']), "")
+
+    return res
+
+def _validate_response(stage: str, res, sub_blocks: List[SubtitleBlock], expected_ids: set) -> bool:
+    """严格 ID 校验逻辑"""
+    if not isinstance(res, list):
+        return False
+
     # 1. 检查长度
     if len(res) != len(sub_blocks):
         logger.warning(f"[{stage.upper()}] 长度不匹配: 期望 {len(sub_blocks)}, 实际 {len(res)}。准备重试...")
-        return None
+        return False
 
     # 2. 检查 ID 是否完全匹配
     returned_ids = set()
     for item in res:
         if not isinstance(item, dict) or 'id' not in item:
-            return None
+            return False
         try:
             returned_ids.add(int(item['id']))
         except (ValueError, TypeError):
-            return None
+            return False
 
     if returned_ids != expected_ids:
         logger.warning(f"[{stage.upper()}] ID 不匹配: 输入 {expected_ids} vs 返回 {returned_ids}。准备重试...")
-        return None
+        return False
+    return True
 
-    # 将原文附带回去，方便后续 context 构建
-    if stage == "polish":
-        id_to_original = {int(b['index']): b['content'] for b in sub_blocks}
-        for item in res:
-            item['original'] = id_to_original.get(int(item['id']), "")
-
-    return res
-
-async def ladder_rescue_engine(blocks: List[Dict], config, glossary_text: str, stage: str, **kwargs) -> List[Dict]:
-    """梯次拯救引擎：8 -> 6 -> 4 -> 2 -> 1，支持动态上下文维护"""
-    ladder = [8, 6, 4, 2, 1]
+async def ladder_rescue_engine(blocks: List[SubtitleBlock], config, glossary_text: str, stage: str, **kwargs) -> List[Dict]:
+    """梯次拯救引擎：从当前自适应批次大小逐级降级 (如 8 -> 6 -> 4 -> 2 -> 1)，支持动态上下文维护"""
+    controller = get_batch_controller(config)
     results = []
     
     # 动态维护上下文语境
@@ -156,11 +316,11 @@ async def ladder_rescue_engine(blocks: List[Dict], config, glossary_text: str, s
         success = False
         remaining = len(blocks) - idx
         
-        for size in [s for s in ladder if s <= remaining]:
+        for size in controller.ladder(stage, remaining):
             chunk = blocks[idx:idx+size]
             
-            # 更新当前尝试的参数，确保使用最新的上下文
-            current_kwargs = {**kwargs, 'previous_context': running_context}
+            # 更新当前尝试的参数，确保使用最新的上下文；同一档的重试共享一份尝试记录
+            current_kwargs = {**kwargs, 'previous_context': running_context, 'batch_attempt': {}}
             
             # 尝试带上下文
             for _ in range(2):
@@ -197,16 +357,17 @@ async def ladder_rescue_engine(blocks: List[Dict], config, glossary_text: str, s
         
         if not success:
             bad_block = blocks[idx]
-            logger.warning(f"ID {bad_block['index']} 无法翻译，将降级保留原文/直译")
+            logger.warning(f"ID {bad_block.id} 无法翻译，将降级保留原文/直译")
+            # fallback 标记：兜底结果不是模型的润色译文，不写入翻译记忆
             if stage == "literal":
-                res_item = {"id": int(bad_block['index']), "trans": bad_block['content']}
+                res_item = {"id": bad_block.id, "trans": bad_block.content, "fallback": True}
                 results.append(res_item)
             else:
-                lit = kwargs.get('literal_map', {}).get(str(bad_block['index']), bad_block['content'])
-                res_item = {"id": int(bad_block['index']), "polished": lit}
+                lit = kwargs.get('literal_map', {}).get(bad_block.id, bad_block.content)
+                res_item = {"id": bad_block.id, "polished": lit, "fallback": True}
                 results.append(res_item)
                 # 即使失败也把这个“原文”作为后续参考，防止断档
-                new_line = f"- {bad_block['content']} -> {res_item['polished']}"
+                new_line = f"- {bad_block.content} -> {res_item['polished']}"
                 if running_context == "None":
                     running_context = new_line
                 else:
@@ -215,29 +376,51 @@ async def ladder_rescue_engine(blocks: List[Dict], config, glossary_text: str, s
             
     return results
 
-async def process_literal_stage(batch_blocks: List[Dict], config, glossary: Dict[str, str]) -> Tuple[Dict[str, str], str]:
-    batch_text_all = " ".join([b['content'] for b in batch_blocks])
+def _as_text(value) -> str:
+    """模型偶尔把译文写成数字、列表或 null：非字符串按空译文处理 (后续降级为直译/原文)"""
+    return value if isinstance(value, str) else ""
+
+async def process_literal_stage(batch_blocks: List[SubtitleBlock], config, glossary: Dict[str, str], timing: Optional[Dict] = None) -> Tuple[Dict[int, str], str]:
+    """
+    直译一个批次，返回 ({ID: 直译}, 本批次的术语表 JSON)。
+    timing: 可选字典，结束后写入 'latency'：请求本身的耗时 (不含排队等待；并发切块取最长的一块)
+    """
+    batch_text_all = " ".join([b.content for b in batch_blocks])
     relevant_glossary = filter_relevant_glossary(batch_text_all, glossary)
     glossary_text = json.dumps(relevant_glossary, ensure_ascii=False)
-    trans_list = await ladder_rescue_engine(batch_blocks, config, glossary_text, stage="literal")
-    literal_map = {str(item['id']): item.get('trans', '') for item in trans_list if 'id' in item}
+    # 直译不依赖上下文：按直译阶段自己的批次大小切分后并发请求
+    literal_size = get_batch_controller(config).current_size("literal")
+    chunks = [batch_blocks[i:i + literal_size] for i in range(0, len(batch_blocks), literal_size)]
+    service_times = [{} for _ in chunks]
+    chunk_results = await asyncio.gather(*[
+        ladder_rescue_engine(chunk, config, glossary_text, stage="literal", service_time=spent)
+        for chunk, spent in zip(chunks, service_times)
+    ])
+    if timing is not None:
+        timing['latency'] = max((spent.get('latency', 0.0) for spent in service_times), default=0.0)
+    trans_list = [item for res in chunk_results for item in res]
+    # 校验通过的结果 ID 都能转换为整数；模型偶尔把 ID 写成字符串
+    literal_map = {int(item['id']): _as_text(item.get('trans')) for item in trans_list if 'id' in item}
     return literal_map, glossary_text
 
-async def process_polish_stage(batch_blocks: List[Dict], config, literal_map: Dict[str, str], glossary_text: str, previous_context: str = "", future_context: str = "") -> List[Dict]:
+async def process_polish_stage(batch_blocks: List[SubtitleBlock], config, literal_map: Dict[int, str], glossary_text: str, previous_context: str = "", future_context: str = "", references: Optional[Dict[int, List[Dict]]] = None) -> Tuple[List[SubtitleBlock], Set[int]]:
+    """
+    润色一个批次，结果写入每个块的 translation，返回 (按原顺序的这些块, 降级块的 ID)。
+    降级块的译文是直译或原文兜底，不是润色结果。
+    """
     polished_list = await ladder_rescue_engine(
         batch_blocks, config, glossary_text, stage="polish",
         literal_map=literal_map,
         previous_context=previous_context,
-        future_context=future_context
+        future_context=future_context,
+        references=references
     )
-    polish_map = {str(item['id']): item.get('polished', '') for item in polished_list if 'id' in item}
+    polish_map = {int(item['id']): _as_text(item.get('polished')) for item in polished_list if 'id' in item}
+    fallback_ids = {int(item['id']) for item in polished_list if 'id' in item and item.get('fallback')}
 
-    final_blocks = []
     for block in batch_blocks:
-        idx = str(block['index'])
-        final_text = polish_map.get(idx) or literal_map.get(idx) or block['content']
-        final_blocks.append({
-            "index": block['index'], "timestamp": block['timestamp'],
-            "original": block['content'], "polished": final_text
-        })
-    return final_blocks
\ No newline at end of file
+        polished = polish_map.get(block.id)
+        if not polished:
+            fallback_ids.add(block.id)
+        block.translation = polished or literal_map.get(block.id) or block.content
+    return batch_blocks, fallback_ids
\ No newline at end of file
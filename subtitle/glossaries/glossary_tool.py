@@ -1,14 +1,23 @@
 import os
 import re
+import sys
 import glob
+import json
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
-def clean_ass_text(text):
+# 允许导入 subtitle/core 下的模块（字幕读写与翻译记忆导入时使用）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-    # 去除 ASS 标签 { ... }
-    text = re.sub(r'\{.*?\}', '', text)
-    # 替换换行符
-    text = text.replace(r'\N', ' ').replace(r'\n', ' ')
-    return text.strip()
+from core.subtitle_io import iter_ass, iter_blocks, clean_ass_text
+
+SUBTITLE_EXTS = ('*.ass', '*.srt', '*.vtt')
+# 增量清单默认保存在扫描目录下
+MANIFEST_NAME = ".glossary_manifest.json"
+# 每个工作进程最多排队的文件数 (限制已解析但尚未写出的结果占用的内存)
+MAX_PENDING_PER_WORKER = 4
 
 def is_contains_chinese(text):
     """判断文本是否包含中文字符"""
@@ -20,67 +29,30 @@ def is_contains_chinese(text):
 def parse_ass(file_path):
     """
     解析 ASS 文件，返回 [(en_line, cn_line), ...]
-    策略：根据 'Start Time' 对齐不同层级的字幕
+    策略：根据 'Start Time' 对齐不同层级的字幕 (字段位置由 subtitle_io 按 Format 行确定)
     """
-    with open(file_path, 'r', encoding='utf-8-sig', errors='ignore') as f:
-        lines = f.readlines()
-
-    events_start = False
-    format_indices = {}
-    time_groups = {}; # Key: Start_Time, Value: { 'cn': [], 'en': [] }
-
-    # 1. 读取并分组
-    for line in lines:
-        line = line.strip()
-        if line.startswith('[Events]'):
-            events_start = True
-            continue
-        
-        if not events_start:
-            continue
+    time_groups = {}  # Key: Start_Time, Value: { 'cn': [], 'en': [] }
 
-        if line.startswith('Format:'):
-            # 解析 Format 行，获取字段位置
-            parts = [p.strip() for p in line[7:].split(',')]
-            format_indices = {name: i for i, name in enumerate(parts)}
+    # 1. 流式读取并分组
+    for event in iter_ass(file_path):
+        start_time = event.get('Start', '')
+        clean_content = clean_ass_text(event.get('Text', ''), newline=' ')
+        if not clean_content:
             continue
 
-        if line.startswith('Dialogue:'):
-            # 这是一个非常简化的 CSV 解析，因为 Text 字段可能包含逗号
-            # ASS 的格式通常是前几个字段固定，最后一个字段是 Text
-            # 我们假设 Text 是第 9 个字段 (下标 9)
-            
-            # 找到 Text 之前的逗号数量
-            text_idx = format_indices.get('Text', 9)
-            parts = line[9:].split(',', text_idx) 
-            
-            if len(parts) <= text_idx:
-                continue
-                
-            start_time = parts[format_indices.get('Start', 1)].strip()
-            style = parts[format_indices.get('Style', 3)].strip()
-            raw_text = parts[-1].strip()
-            
-            # 清洗文本
-            clean_content = clean_ass_text(raw_text)
-            if not clean_content:
-                continue
-
-            # 过滤策略：
-            # 1. 忽略 "水印", "注释", "特效" 等 Style (可选，根据实际情况)
-            # 这里简单通过判断是否包含汉字来区分中英文
-            # 2. 忽略极短的数字或符号
-            if len(clean_content) < 2 and not clean_content.isalnum():
-                continue
+        # 过滤策略：
+        # 1. 忽略 "水印", "注释", "特效" 等 Style (可选，根据实际情况)
+        # 这里简单通过判断是否包含汉字来区分中英文
+        # 2. 忽略极短的数字或符号
+        if len(clean_content) < 2 and not clean_content.isalnum():
+            continue
 
-            if start_time not in time_groups:
-                time_groups[start_time] = {'cn': [], 'en': []}
-            
-            # 区分中英文
-            if is_contains_chinese(clean_content):
-                time_groups[start_time]['cn'].append(clean_content)
-            else:
-                time_groups[start_time]['en'].append(clean_content)
+        group = time_groups.setdefault(start_time, {'cn': [], 'en': []})
+        # 区分中英文
+        if is_contains_chinese(clean_content):
+            group['cn'].append(clean_content)
+        else:
+            group['en'].append(clean_content)
 
     # 2. 配对输出
     pairs = []
@@ -103,27 +75,14 @@ def parse_ass(file_path):
 
 def parse_srt(file_path):
     """
-    解析 SRT 文件 (简易版)
-    假设 SRT 块内部是双语，或者是上下两个块时间轴一致
-    这里为了通用，采用简单策略：
-    读取所有文本块，判断是否包含中文，如果一段英文紧接着一段中文，则配对。
+    解析 SRT / WebVTT 文件 (简易版)
+    假设 SRT 块内部是双语：一行英文一行中文，则按行配对。
+    字幕块由 subtitle_io 逐块读取，不会把整个文件放进内存。
     """
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-        content = f.read()
-
-    # 正则匹配 SRT 块
-    # 格式: 序号 \n 时间轴 \n 文本
-    blocks = re.split(r'\n\s*\n', content.strip())
-    
     parsed_lines = []
-    
-    for block in blocks:
-        lines = block.strip().split('\n')
-        if len(lines) < 3: 
-            continue
-            
-        # 抛弃序号和时间轴，只保留文本行
-        text_lines = lines[2:]
+
+    for block in iter_blocks(file_path):
+        text_lines = block.content.split('\n')
         full_text = " ".join(text_lines)
         
         # 尝试在单块内分割双语 (常见的字幕格式：一行英文一行中文)
@@ -146,41 +105,316 @@ def parse_srt(file_path):
     
     return parsed_lines
 
+def collect_pairs(file_path):
+    """按后缀选择解析器，返回 [(en, cn), ...]"""
+    if file_path.lower().endswith('.ass'):
+        return parse_ass(file_path)
+    elif file_path.lower().endswith(('.srt', '.vtt')):
+        return parse_srt(file_path)
+    return []
+
+def file_digest(file_path):
+    """文件内容的 SHA-1 (分块读取)"""
+    h = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def mine_file(file_path, known_digest=None):
+    """
+    工作进程：计算文件摘要并解析双语对，返回 (大小, mtime, 摘要, 双语对)。
+    摘要与清单中的一致 (只是 mtime 变了，内容未变) 时不再解析，双语对返回 None。
+    """
+    stat = os.stat(file_path)
+    digest = file_digest(file_path)
+    pairs = None if digest == known_digest else collect_pairs(file_path)
+    return stat.st_size, stat.st_mtime_ns, digest, pairs
+
+def iter_mined(tasks, workers):
+    """
+    在进程池中解析 [(路径, 已知摘要)]，按完成顺序产出 (路径, 结果, 异常)。
+    同时在途的文件数有上限，结果边解析边交给写入端，不会全部堆在内存中。
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        for file_path, known_digest in tasks:
+            try:
+                yield file_path, mine_file(file_path, known_digest), None
+            except Exception as e:
+                yield file_path, None, e
+        return
+
+    remaining = iter(tasks)
+    limit = workers * MAX_PENDING_PER_WORKER
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        while True:
+            for file_path, known_digest in itertools.islice(remaining, limit - len(pending)):
+                pending[pool.submit(mine_file, file_path, known_digest)] = file_path
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path = pending.pop(future)
+                try:
+                    yield file_path, future.result(), None
+                except Exception as e:
+                    yield file_path, None, e
+
+class Manifest:
+    """
+    增量清单：按输出目标记录已处理的字幕文件 (相对路径 -> 大小、mtime、内容摘要、双语对数)。
+    大小与 mtime 都未变的文件直接跳过；mtime 变化时由工作进程比对摘要，内容相同则不再解析。
+    """
+    def __init__(self, path, target):
+        self.path = path
+        self.targets = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.targets = json.load(f).get("targets", {})
+            except (json.JSONDecodeError, IOError):
+                print(f"⚠️  增量清单损坏，将重新处理全部文件: {path}")
+        self.entries = self.targets.setdefault(target, {})
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "targets": self.targets}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+class TxtWriter:
+    """每个字幕文件旁生成同名 .txt (一行英文，一行中文)，避免不同子目录的同名文件互相覆盖"""
+    target = "txt"
+
+    def open(self, fresh, rewrite):
+        pass
+
+    def write(self, rel_path, file_path, pairs):
+        if not pairs:
+            return
+        with open(file_path + ".txt", 'w', encoding='utf-8') as f:
+            for en, cn in pairs:
+                f.write(f"{en}\n{cn}\n")
+
+    def remove(self, rel_path):
+        # 源字幕已删除时保留已生成的 .txt
+        pass
+
+    def close(self, ok):
+        return True
+
+class JsonlWriter:
+    """
+    合并输出到单个 JSONL，每行一个 {"file", "en", "cn"}。
+    没有文件被修改或删除时直接追加；否则新结果先写入临时文件，结束时把旧文件中仍有效的记录
+    逐行复制过来再替换，全程不把语料读入内存。
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.target = f"jsonl:{self.path}"
+        self.stale = set()
+        self.rewrite = False
+        self.f = None
+
+    def open(self, fresh, rewrite):
+        self.rewrite = rewrite and not fresh and os.path.exists(self.path)
+        if self.rewrite:
+            self.f = open(self.path + ".new", 'w', encoding='utf-8')
+        else:
+            # 清单中没有记录 (首次运行或 --force) 时重新生成，否则追加
+            self.f = open(self.path, 'w' if fresh else 'a', encoding='utf-8')
+
+    def write(self, rel_path, file_path, pairs):
+        self.stale.add(rel_path)
+        for en, cn in pairs:
+            self.f.write(json.dumps({"file": rel_path, "en": en, "cn": cn}, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def remove(self, rel_path):
+        self.stale.add(rel_path)
+
+    def close(self, ok):
+        self.f.close()
+        if not self.rewrite:
+            return True
+        new_path = self.path + ".new"
+        if not ok:
+            os.remove(new_path)
+            return False
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            with open(self.path, 'r', encoding='utf-8') as old:
+                for line in old:
+                    if line.strip() and json.loads(line).get("file") not in self.stale:
+                        out.write(line)
+            with open(new_path, 'r', encoding='utf-8') as new:
+                for line in new:
+                    out.write(line)
+        os.replace(tmp_path, self.path)
+        os.remove(new_path)
+        return True
+
+class SqliteWriter:
+    """合并输出到单个 SQLite 数据库的 pairs 表 (file, en, cn)，文件更新时先删除其旧记录"""
+    def __init__(self, path):
+        from core import db
+
+        self.db = db
+        self.path = os.path.abspath(path)
+        self.target = f"sqlite:{self.path}"
+
+    def open(self, fresh, rewrite):
+        with self.db.connect(self.path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS pairs (file TEXT NOT NULL, en TEXT NOT NULL, cn TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pairs_file ON pairs (file)")
+            if fresh:
+                conn.execute("DELETE FROM pairs")
+
+    def write(self, rel_path, file_path, pairs):
+        with self.db.connect(self.path) as conn:
+            conn.execute("DELETE FROM pairs WHERE file = ?", (rel_path,))
+            conn.executemany("INSERT INTO pairs (file, en, cn) VALUES (?, ?, ?)",
+                             ((rel_path, en, cn) for en, cn in pairs))
+
+    def remove(self, rel_path):
+        with self.db.connect(self.path) as conn:
+            conn.execute("DELETE FROM pairs WHERE file = ?", (rel_path,))
+
+    def close(self, ok):
+        return True
+
+class TmWriter:
+    """导入翻译记忆库（双向各一份，模型标记为人工译文）；源字幕删除时保留已导入的条目"""
+    def __init__(self):
+        from core.translation_memory import translation_memory, HUMAN_MODEL
+
+        self.tm = translation_memory
+        self.model = HUMAN_MODEL
+        self.target = f"tm:{os.path.abspath(translation_memory.db_path)}"
+
+    def open(self, fresh, rewrite):
+        pass
+
+    def write(self, rel_path, file_path, pairs):
+        # 英译中: en -> cn；中译英: cn -> en
+        self.tm.add_pairs(pairs, "zh", self.model)
+        self.tm.add_pairs([(cn, en) for en, cn in pairs], "en", self.model)
+
+    def remove(self, rel_path):
+        pass
+
+    def close(self, ok):
+        return True
+
+def make_writer(args):
+    if args.to_tm:
+        return TmWriter()
+    if not args.output:
+        return TxtWriter()
+    ext = os.path.splitext(args.output)[1].lower()
+    if ext == '.jsonl':
+        return JsonlWriter(args.output)
+    if ext in ('.db', '.sqlite', '.sqlite3'):
+        return SqliteWriter(args.output)
+    raise SystemExit(f"不支持的输出格式: {args.output} (应为 .jsonl 或 .db/.sqlite)")
+
+def print_tm_stats():
+    from core.translation_memory import translation_memory
+
+    rows = translation_memory.stats()
+    if not rows:
+        print("翻译记忆库为空。")
+        return
+    print("目标语言 | 模型 | 条目数 | 累计命中")
+    for target_lang, model, count, hits in rows:
+        print(f"{target_lang} | {model} | {count} | {hits}")
+
 def main():
-    # 获取脚本所在目录
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # 递归获取当前目录及子目录下所有的 .ass 和 .srt
+    parser = argparse.ArgumentParser(description="从双语字幕提取语料，或导入翻译记忆库")
+    parser.add_argument("--dir", default=None, help="扫描目录 (默认为本脚本所在目录)")
+    parser.add_argument("--to-tm", action="store_true", help="将双语对导入翻译记忆库，而不是生成 .txt")
+    parser.add_argument("--output", default=None,
+                        help="合并输出到单个文件 (.jsonl 或 .db/.sqlite)，而不是每个字幕旁各生成一个 .txt")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="解析字幕的进程数 (默认为 CPU 核数)")
+    parser.add_argument("--manifest", default=None, help=f"增量清单路径 (默认为扫描目录下的 {MANIFEST_NAME})")
+    parser.add_argument("--force", action="store_true", help="忽略增量清单，重新处理全部文件")
+    parser.add_argument("--tm-stats", action="store_true", help="打印翻译记忆库统计后退出")
+    args = parser.parse_args()
+
+    if args.tm_stats:
+        print_tm_stats()
+        return
+
+    # 获取扫描目录
+    base_dir = os.path.abspath(args.dir or os.path.dirname(os.path.abspath(__file__)))
+
+    # 递归获取当前目录及子目录下所有的 .ass、.srt 和 .vtt
     all_files = []
-    for ext in ['*.ass', '*.srt']:
+    for ext in SUBTITLE_EXTS:
         # 使用 ** 配合 recursive=True 实现递归搜索
         pattern = os.path.join(base_dir, '**', ext)
         all_files.extend(glob.glob(pattern, recursive=True))
-    
-    print(f"找到 {len(all_files)} 个字幕文件待处理...")
+    current = {os.path.relpath(path, base_dir).replace(os.sep, '/'): path for path in sorted(all_files)}
 
-    for file_path in all_files:
-        file_name = os.path.basename(file_path)
-        # 将 .txt 生成在原文件所在目录下，避免同名文件在不同子目录时发生冲突
-        output_path = file_path + ".txt"
-        
-        print(f"正在处理: {file_path} ...")
-        
-        pairs = []
-        if file_path.lower().endswith('.ass'):
-            pairs = parse_ass(file_path)
-        elif file_path.lower().endswith('.srt'):
-            pairs = parse_srt(file_path)
-            
-        if not pairs:
-            print(f"  ⚠️  未提取到有效双语对: {file_name}")
+    writer = make_writer(args)
+    manifest = Manifest(args.manifest or os.path.join(base_dir, MANIFEST_NAME), writer.target)
+    entries = manifest.entries
+    if args.force:
+        entries.clear()
+
+    # 大小与 mtime 都未变的文件直接跳过；其余交给工作进程 (清单中已有的文件带上旧摘要)
+    tasks, unchanged = [], 0
+    for rel_path, file_path in current.items():
+        entry = entries.get(rel_path)
+        stat = os.stat(file_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            unchanged += 1
             continue
-            
-        with open(output_path, 'w', encoding='utf-8') as f:
-            for en, cn in pairs:
-                f.write(f"{en}\n{cn}\n")
-        
-        print(f"  ✅ 已生成语料: {os.path.basename(output_path)} (共 {len(pairs)} 对)")
+        tasks.append((file_path, entry["sha1"] if entry else None))
+    removed = [rel_path for rel_path in entries if rel_path not in current]
+    rel_of = {file_path: rel_path for rel_path, file_path in current.items()}
+
+    print(f"找到 {len(current)} 个字幕文件: 待处理 {len(tasks)} 个，未变化跳过 {unchanged} 个，已删除 {len(removed)} 个")
+
+    # 已处理过的文件有变化或被删除时，合并输出需要剔除其旧记录
+    writer.open(fresh=not entries, rewrite=bool(removed) or any(digest for _, digest in tasks))
+    written, touched, failed, total = 0, 0, 0, 0
+    ok = False
+    try:
+        for rel_path in removed:
+            writer.remove(rel_path)
+            del entries[rel_path]
+        for file_path, result, error in iter_mined(tasks, args.workers):
+            rel_path = rel_of[file_path]
+            if error is not None:
+                failed += 1
+                print(f"  ❌ 解析失败: {rel_path} ({error})")
+                continue
+            size, mtime_ns, digest, pairs = result
+            entry = {"size": size, "mtime_ns": mtime_ns, "sha1": digest}
+            if pairs is None:
+                # 内容未变，只更新清单中的大小与 mtime
+                touched += 1
+                entries[rel_path] = {**entries[rel_path], **entry}
+                continue
+            writer.write(rel_path, file_path, pairs)
+            entries[rel_path] = {**entry, "pairs": len(pairs)}
+            if not pairs:
+                print(f"  ⚠️  未提取到有效双语对: {rel_path}")
+                continue
+            written += 1
+            total += len(pairs)
+            print(f"  ✅ {rel_path} (共 {len(pairs)} 对)")
+        ok = True
+    finally:
+        # 中断时已完整写出的文件仍记入清单，下次运行从未完成的文件继续
+        if writer.close(ok):
+            manifest.save()
+
+    print(f"完成: 写出 {written} 个文件 (共 {total} 对双语句子)，内容未变 {touched} 个，失败 {failed} 个")
+    if args.to_tm:
+        print_tm_stats()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+main.py 的图形界面：不带参数运行 main.py 时才导入本模块，
+命令行模式不会加载 tkinter。
+"""
+import os
+import asyncio
+import logging
+import threading
+import tkinter as tk
+from tkinter import ttk, filedialog, scrolledtext
+
+from core.job_cache import job_dir_for_file
+from core.tools import get_extract_tool, get_ass_tool, ass_head_path
+from translate_srt_llm import run_translation, TranslationArgs
+
+logger = logging.getLogger("MainWorkflow")
+
+class GuiLogger(logging.Handler):
+    def __init__(self, text_widget):
+        super().__init__()
+        self.text_widget = text_widget
+        self.text_widget.tag_config("INFO", foreground="black")
+        self.text_widget.tag_config("ERROR", foreground="red")
+        self.text_widget.tag_config("WARNING", foreground="orange")
+
+    def emit(self, record):
+        msg = self.format(record)
+        def append():
+            self.text_widget.configure(state='normal')
+            tag = record.levelname if record.levelname in ["INFO", "ERROR", "WARNING"] else "INFO"
+            self.text_widget.insert(tk.END, msg + "\n", tag)
+            self.text_widget.see(tk.END)
+            self.text_widget.configure(state='disabled')
+        
+        # Ensure thread safety by scheduling update on main thread
+        self.text_widget.after(0, append)
+
+class SubtitleTranslatorApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Subtitle Translator GUI")
+        self.root.geometry("800x600")
+        
+        self.input_file = tk.StringVar()
+        self.output_file = tk.StringVar()
+        self.format_var = tk.StringVar(value="ass")
+        self.bilingual_var = tk.BooleanVar(value=True)
+        self.target_lang_var = tk.StringVar(value="zh")
+        self.model_var = tk.StringVar()
+        self.batch_size_var = tk.IntVar(value=0) # 0 means use env default
+
+        self.setup_ui()
+        
+        # Redirect logging
+        self.log_handler = GuiLogger(self.log_area)
+        self.log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        logging.getLogger().addHandler(self.log_handler)
+        # Also capture the specific logger
+        logger.addHandler(self.log_handler)
+
+    def setup_ui(self):
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # File Selection
+        file_frame = ttk.LabelFrame(main_frame, text="File Selection", padding="5")
+        file_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(file_frame, text="Input File (MKV/SRT/VTT/ASS):").grid(row=0, column=0, sticky="w")
+        ttk.Entry(file_frame, textvariable=self.input_file, width=50).grid(row=0, column=1, padx=5)
+        ttk.Button(file_frame, text="Browse...", command=self.browse_input).grid(row=0, column=2)
+
+        ttk.Label(file_frame, text="Output File (Optional):").grid(row=1, column=0, sticky="w")
+        ttk.Entry(file_frame, textvariable=self.output_file, width=50).grid(row=1, column=1, padx=5)
+        ttk.Button(file_frame, text="Browse...", command=self.browse_output).grid(row=1, column=2)
+
+        # Options
+        opt_frame = ttk.LabelFrame(main_frame, text="Configuration Options", padding="5")
+        opt_frame.pack(fill=tk.X, pady=5)
+
+        ttk.Checkbutton(opt_frame, text="Bilingual Subtitles", variable=self.bilingual_var).grid(row=0, column=0, padx=5, sticky="w")
+        
+        ttk.Label(opt_frame, text="Target Format:").grid(row=0, column=1, padx=5, sticky="e")
+        ttk.Combobox(opt_frame, textvariable=self.format_var, values=["ass", "srt"], state="readonly", width=10).grid(row=0, column=2, sticky="w")
+
+        ttk.Label(opt_frame, text="Target Language:").grid(row=0, column=3, padx=5, sticky="e")
+        ttk.Combobox(opt_frame, textvariable=self.target_lang_var, values=["zh", "en"], state="readonly", width=10).grid(row=0, column=4, sticky="w")
+
+        ttk.Label(opt_frame, text="Model (Optional):").grid(row=1, column=0, padx=5, sticky="w")
+        ttk.Entry(opt_frame, textvariable=self.model_var, width=15).grid(row=1, column=1, sticky="w")
+
+        ttk.Label(opt_frame, text="Batch Size (0=Default):").grid(row=1, column=2, padx=5, sticky="e")
+        ttk.Entry(opt_frame, textvariable=self.batch_size_var, width=5).grid(row=1, column=3, sticky="w")
+
+        # Actions
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X, pady=10)
+        self.start_btn = ttk.Button(btn_frame, text="Start Translation", command=self.start_thread)
+        self.start_btn.pack(fill=tk.X, ipady=5)
+
+        # Log Area
+        log_frame = ttk.LabelFrame(main_frame, text="Run Logs", padding="5")
+        log_frame.pack(fill=tk.BOTH, expand=True)
+        
+        self.log_area = scrolledtext.ScrolledText(log_frame, state='disabled', height=15)
+        self.log_area.pack(fill=tk.BOTH, expand=True)
+
+    def browse_input(self):
+        filetypes = [("Media Files", "*.mkv *.srt *.vtt *.ass"), ("All Files", "*.*")]
+        path = filedialog.askopenfilename(filetypes=filetypes)
+        if path:
+            self.input_file.set(path)
+            # Auto set output if empty
+            if not self.output_file.get():
+                base, _ = os.path.splitext(path)
+                self.output_file.set(f"{base}.{self.format_var.get()}")
+
+    def browse_output(self):
+        path = filedialog.asksaveasfilename(defaultextension=f".{self.format_var.get()}")
+        if path:
+            self.output_file.set(path)
+
+    def start_thread(self):
+        if not self.input_file.get():
+            logger.error("Please select an input file first!")
+            return
+        
+        self.start_btn.config(state="disabled")
+        thread = threading.Thread(target=self.run_process)
+        thread.daemon = True # Ensure thread closes when app closes
+        thread.start()
+
+    def run_process(self):
+        try:
+            # Prepare arguments
+            input_path = self.input_file.get()
+            output_path = self.output_file.get()
+            final_fmt = self.format_var.get()
+            
+            # If output path doesn't match format, adjust it
+            if output_path and not output_path.lower().endswith(f".{final_fmt}"):
+                output_path += f".{final_fmt}"
+
+            # 1. Pre-process logic (simplified for GUI)
+            working_srt = None
+            if input_path.lower().endswith(".mkv"):
+                logger.info("Extracting subtitles from MKV...")
+                srt_files = get_extract_tool().extract_subtitles(input_path)
+                if srt_files:
+                    working_srt = srt_files[0]
+                else:
+                    logger.error("Failed to extract subtitles from MKV.")
+                    return
+            elif input_path.lower().endswith(".srt"):
+                working_srt = input_path
+            elif input_path.lower().endswith(".ass"):
+                logger.info("Converting ASS to SRT...")
+                working_srt = get_extract_tool().convert_ass_file_to_srt(input_path)
+            elif input_path.lower().endswith(".vtt"):
+                logger.info("Converting WebVTT to SRT...")
+                working_srt = get_extract_tool().convert_vtt_file_to_srt(input_path)
+            
+            if not working_srt:
+                logger.error("Invalid input file or pre-processing failed.")
+                return
+
+            # 2. Translation
+            trans_args = TranslationArgs(
+                input_file=working_srt,
+                output_file=None,
+                bilingual=self.bilingual_var.get(),
+                model_name=self.model_var.get() if self.model_var.get() else None,
+                batch_size=self.batch_size_var.get() if self.batch_size_var.get() > 0 else None,
+                target_lang=self.target_lang_var.get()
+            )
+
+            if final_fmt == "ass":
+                cache_dir = job_dir_for_file(working_srt, trans_args.target_lang, trans_args.model_name)
+                translated_srt = os.path.join(cache_dir, "translated.srt")
+            else:
+                translated_srt = output_path if output_path else os.path.splitext(input_path)[0] + ".srt"
+            trans_args.output_file = translated_srt
+
+            # Run async loop in this thread
+            asyncio.run(run_translation(trans_args))
+
+            # 3. Post-process
+            if final_fmt == "ass":
+                logger.info(f"Generating ASS: {output_path}")
+                get_ass_tool().srt_to_ass(translated_srt, ass_head_path(), output_path)
+            
+            logger.info("🎉 All tasks completed!")
+
+        except Exception as e:
+            logger.error(f"Task failed: {e}", exc_info=True)
+        finally:
+            self.root.after(0, lambda: self.start_btn.config(state="normal"))
+
+def run_gui():
+    root = tk.Tk()
+    app = SubtitleTranslatorApp(root)
+    root.mainloop()
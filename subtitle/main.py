@@ -3,32 +3,22 @@ import os
 import sys
 import argparse
 import asyncio
-import hashlib
+import re
+import glob
+import time
 import logging
-from typing import List
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 # 添加当前目录到路径，确保可以导入核心模块
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from core.config import TranslationConfig
-from translate_srt_llm import run_translation
-
-# 动态加载子模块
-import importlib.util
-
-def load_module(name, path):
-    spec = importlib.util.spec_from_file_location(name, path)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    return module
-
-# 获取子工具路径
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-EXTRACT_TOOL_PATH = os.path.join(BASE_DIR, "pre-process", "01-extract_srt.py")
-ASS_TOOL_PATH = os.path.join(BASE_DIR, "post-process", "02-post_process_ass.py")
-
-extract_tool = load_module("extract_tool", EXTRACT_TOOL_PATH)
-ass_tool = load_module("ass_tool", ASS_TOOL_PATH)
+from core.config import TranslationConfig, CACHE_MAX_AGE_DAYS, CACHE_MAX_SIZE_MB
+from core.job_cache import job_dir_for_file, clean_cache
+from core.tools import get_extract_tool, get_ass_tool, ass_head_path
+from translate_srt_llm import run_translation, TranslationArgs
+from core.cassette import install_cassette, close_cassette
 
 # 配置日志
 logging.basicConfig(
@@ -37,320 +27,260 @@ logging.basicConfig(
 )
 logger = logging.getLogger("MainWorkflow")
 
-class TranslationArgs:
-    def __init__(self, input_file, output_file, bilingual, model_name=None, batch_size=None, target_lang="zh"):
-        self.input_file = input_file
-        self.output_file = output_file
-        self.bilingual = bilingual
-        self.target_lang = target_lang
-        
-        # 加载基础配置 (从 .env 读取)
-        config = TranslationConfig()
-        
-        self.api_key = config.api_key
-        self.api_url = config.api_url
-        self.model_name = model_name if model_name else config.model_name
-        self.batch_size = batch_size if batch_size else config.batch_size
-        
-        self.max_concurrent = config.max_concurrent_requests
-        self.temp_terms = config.temp_terms
-        self.temp_literal = config.temp_literal
-        self.temp_polish = config.temp_polish
-        self.progress_file = None
-        self.glossary_cache_file = None
-
-async def main():
-    parser = argparse.ArgumentParser(description="字幕翻译一站式工具 - 从 MKV 到最终版字幕")
-    
-    # 输入输出控制 (CLI 的主要职责)
-    parser.add_argument("-i", "--input", required=True, help="输入文件 (MKV 或 SRT)")
-    parser.add_argument("-o", "--output", help="最终输出文件名 (可选)")
-    parser.add_argument("-f", "--format", choices=["srt", "ass"], default="ass", help="最终输出格式 (默认 ass)")
-    
-    # 常用覆盖参数 (可选)
-    parser.add_argument("--to-english", action="store_true", help="开启中译英模式")
-    parser.add_argument("--bilingual", action="store_true", default=True, help="是否生成双语字幕 (默认开启)")
-    parser.add_argument("--no-bilingual", action="store_false", dest="bilingual", help="仅保留中文字幕")
-    parser.add_argument("--model", type=str, help="覆盖 .env 中的模型名称")
-    parser.add_argument("--batch-size", type=int, help="覆盖 .env 中的批次大小")
-    
-    args = parser.parse_args()
-
-    # 逻辑判断
-    target_lang = "en" if args.to_english else "zh"
-
-    input_path = os.path.abspath(args.input)
-    if not os.path.exists(input_path):
-        logger.error(f"找不到输入文件: {input_path}")
-        return
-
-    # 0. 确定最终输出格式和路径
-    final_format = args.format
-    if args.output:
-        if args.output.lower().endswith(".srt"):
+SUPPORTED_EXTS = (".mkv", ".srt", ".vtt", ".ass")
+# 同一集有多个候选输入时的优先级：MKV 原片 > SRT > WebVTT > ASS（ASS 往往是上一次运行的成品）
+_EXT_PRIORITY = {".mkv": 0, ".srt": 1, ".vtt": 2, ".ass": 3}
+_TRACK_SUFFIX_RE = re.compile(r'_track\d+_[^_]+$')
+
+def expand_inputs(input_arg: str) -> List[str]:
+    """
+    将 -i 参数展开为待处理文件列表：支持单个文件、目录或通配符。
+    目录/通配符模式下按文件名 (不含后缀) 去重，并跳过从 MKV 提取出的中间字幕轨道。
+    """
+    if os.path.isfile(input_arg):
+        return [os.path.abspath(input_arg)]
+
+    if os.path.isdir(input_arg):
+        candidates = [os.path.join(input_arg, name) for name in os.listdir(input_arg)]
+    else:
+        candidates = glob.glob(input_arg)
+    candidates = [os.path.abspath(p) for p in candidates
+                  if os.path.isfile(p) and p.lower().endswith(SUPPORTED_EXTS)]
+
+    mkv_stems = {os.path.splitext(p)[0] for p in candidates if p.lower().endswith(".mkv")}
+    chosen: Dict[str, str] = {}
+    for path in sorted(candidates):
+        stem, ext = os.path.splitext(path)
+        # 跳过 01-extract_srt.py 生成的 "<原片>_track3_eng.srt" 之类的中间文件
+        if _TRACK_SUFFIX_RE.sub('', stem) in mkv_stems and stem not in mkv_stems:
+            continue
+        current = chosen.get(stem)
+        if current is None or _EXT_PRIORITY[ext.lower()] < _EXT_PRIORITY[os.path.splitext(current)[1].lower()]:
+            chosen[stem] = path
+    return sorted(chosen.values())
+
+def resolve_output(input_path: str, output: Optional[str], default_format: str, output_dir: Optional[str] = None):
+    """确定最终输出格式与路径，返回 (final_format, final_output)"""
+    final_format = default_format
+    if output:
+        if output.lower().endswith(".srt"):
             final_format = "srt"
-        elif args.output.lower().endswith(".ass"):
+        elif output.lower().endswith(".ass"):
             final_format = "ass"
-    
-    final_output = args.output if args.output else os.path.splitext(input_path)[0] + f".{final_format}"
+        return final_format, output
 
-    # 1. 预处理
-    working_srt = None
+    base = os.path.splitext(os.path.basename(input_path))[0]
+    target_dir = output_dir or os.path.dirname(input_path)
+    return final_format, os.path.join(target_dir, f"{base}.{final_format}")
+
+def prepare_input(input_path: str) -> Optional[str]:
+    """预处理：MKV 提取字幕 / ASS、WebVTT 转为中间 SRT，返回待翻译的 SRT 路径（同步，运行在 I/O 线程池中）"""
     if input_path.lower().endswith(".mkv"):
         logger.info(f"检测到 MKV 文件，正在提取字幕...")
-        srt_files = extract_tool.extract_subtitles(input_path)
+        srt_files = get_extract_tool().extract_subtitles(input_path)
         if not srt_files:
             logger.error("未能从 MKV 中提取到有效的 SRT 字幕。")
-            return
-        working_srt = srt_files[0]
-        logger.info(f"将处理提取出的第一个字幕轨道: {working_srt}")
+            return None
+        logger.info(f"将处理提取出的第一个字幕轨道: {srt_files[0]}")
+        return srt_files[0]
     elif input_path.lower().endswith(".srt"):
-        working_srt = input_path
+        return input_path
     elif input_path.lower().endswith(".ass"):
         logger.info(f"检测到 ASS 字幕输入，正在转换为中间格式 SRT...")
-        working_srt = extract_tool.convert_ass_file_to_srt(input_path)
+        working_srt = get_extract_tool().convert_ass_file_to_srt(input_path)
         if not working_srt:
             logger.error("无法将 ASS 转换为 SRT 进行处理。")
-            return
-    else:
-        logger.error("不支持的文件格式，请提供 MKV、SRT 或 ASS 文件。")
-        return
-
-    # 2. 翻译阶段
-    cache_dir = os.path.join(BASE_DIR, ".cache")
-    if not os.path.exists(cache_dir):
-        os.makedirs(cache_dir, exist_ok=True)
+        return working_srt
+    elif input_path.lower().endswith(".vtt"):
+        logger.info(f"检测到 WebVTT 字幕输入，正在转换为中间格式 SRT...")
+        working_srt = get_extract_tool().convert_vtt_file_to_srt(input_path)
+        if not working_srt:
+            logger.error("无法将 WebVTT 转换为 SRT 进行处理。")
+        return working_srt
+    logger.error("不支持的文件格式，请提供 MKV、SRT、VTT 或 ASS 文件。")
+    return None
+
+def render_ass(translated_srt: str, final_output: str):
+    """后处理：将翻译后的 SRT 渲染为 ASS（同步，运行在 I/O 线程池中）"""
+    get_ass_tool().srt_to_ass(translated_srt, ass_head_path(), final_output)
+
+# 预处理/后处理共用的线程池：MKV 提取主要等待 mkvextract 子进程，ASS 渲染是轻量的文本处理
+_io_executor: Optional[ThreadPoolExecutor] = None
+
+async def run_in_io_pool(func, *args):
+    """在 I/O 线程池中执行阻塞的预处理/后处理函数，不阻塞事件循环"""
+    global _io_executor
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(max_workers=max(1, TranslationConfig().io_workers),
+                                          thread_name_prefix="subtitle-io")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, functools.partial(func, *args))
+
+async def process_file(input_path: str, final_output: str, final_format: str, args, target_lang: str,
+                       slots: Optional[asyncio.Queue] = None) -> Dict:
+    """
+    处理单个输入文件：预处理 -> 翻译 -> 后处理。
+    预处理与后处理在线程池中运行；批量模式下只有翻译阶段占用 slots 中的槽位，
+    因此第 N 个文件翻译时，第 N+1 个文件的提取可以同时进行。
+    返回该文件的运行摘要，供批量模式汇总。
+    """
+    summary = {"input": input_path, "output": final_output, "status": "失败", "blocks": 0, "tm_hits": 0, "bypassed": 0, "elapsed": 0.0}
+    started = time.monotonic()
 
-    input_filename = os.path.basename(working_srt)
-    file_hash = hashlib.md5(input_filename.encode('utf-8')).hexdigest()
+    # 1. 预处理
+    working_srt = await run_in_io_pool(prepare_input, input_path)
+    if not working_srt:
+        return summary
 
-    # 确定中间输出文件名（翻译后的 SRT）
-    if final_format == "ass":
-        # 如果最终要转 ASS，中间 SRT 丢到 cache
-        translated_srt = os.path.join(cache_dir, f"translated_{file_hash}.srt")
-    else:
-        # 如果最终就要 SRT，直接输出到目标位置
-        translated_srt = final_output
-    
+    # 2. 翻译阶段
     trans_args = TranslationArgs(
         input_file=working_srt,
-        output_file=translated_srt,
+        output_file=final_output,
         bilingual=args.bilingual,
         model_name=args.model,
         batch_size=args.batch_size,
-        target_lang=target_lang
+        target_lang=target_lang,
+        series=args.series
     )
 
-    logger.info(f"开始翻译流程: {working_srt} -> {translated_srt} (Target: {target_lang})")
-    await run_translation(trans_args)
+    # 确定中间输出文件名（翻译后的 SRT）
+    if final_format == "ass":
+        # 如果最终要转 ASS，中间 SRT 丢到该任务的缓存目录
+        cache_dir = await run_in_io_pool(job_dir_for_file, working_srt, target_lang, trans_args.model_name)
+        trans_args.output_file = os.path.join(cache_dir, "translated.srt")
+    translated_srt = trans_args.output_file
+
+    # 批量模式：每个翻译槽位对应一条固定位置的进度条
+    slot = await slots.get() if slots is not None else None
+    try:
+        if slot is not None:
+            trans_args.progress_desc = os.path.basename(input_path)[:30]
+            trans_args.progress_position = slot
+
+        logger.info(f"开始翻译流程: {working_srt} -> {translated_srt} (Target: {target_lang})")
+        run_summary = await run_translation(trans_args) or {}
+    finally:
+        if slots is not None:
+            slots.put_nowait(slot)
+    summary["blocks"] = run_summary.get("blocks", 0)
+    summary["tm_hits"] = run_summary.get("tm_hits", 0)
+    summary["bypassed"] = run_summary.get("bypassed", 0)
 
     # 3. 后处理
     if final_format == "ass":
         logger.info(f"正在将翻译后的 SRT 转换为 ASS 格式: {final_output}")
-        
-        head_path = os.path.join(BASE_DIR, "post-process", "asshead.txt")
-        if not os.path.exists(head_path):
-             head_path = "asshead.txt"
-        
-        ass_tool.srt_to_ass(translated_srt, head_path, final_output)
+        await run_in_io_pool(render_ass, translated_srt, final_output)
         logger.info(f"✅ 完成！最终字幕文件已生成: {os.path.abspath(final_output)}")
     else:
         logger.info(f"✅ Done! Final subtitle file generated at: {os.path.abspath(final_output)}")
 
-# --- GUI Implementation ---
-import tkinter as tk
-from tkinter import ttk, filedialog, scrolledtext
-import threading
-import queue
-
-class GuiLogger(logging.Handler):
-    def __init__(self, text_widget):
-        super().__init__()
-        self.text_widget = text_widget
-        self.text_widget.tag_config("INFO", foreground="black")
-        self.text_widget.tag_config("ERROR", foreground="red")
-        self.text_widget.tag_config("WARNING", foreground="orange")
-
-    def emit(self, record):
-        msg = self.format(record)
-        def append():
-            self.text_widget.configure(state='normal')
-            tag = record.levelname if record.levelname in ["INFO", "ERROR", "WARNING"] else "INFO"
-            self.text_widget.insert(tk.END, msg + "\n", tag)
-            self.text_widget.see(tk.END)
-            self.text_widget.configure(state='disabled')
-        
-        # Ensure thread safety by scheduling update on main thread
-        self.text_widget.after(0, append)
-
-class SubtitleTranslatorApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Subtitle Translator GUI")
-        self.root.geometry("800x600")
-        
-        self.input_file = tk.StringVar()
-        self.output_file = tk.StringVar()
-        self.format_var = tk.StringVar(value="ass")
-        self.bilingual_var = tk.BooleanVar(value=True)
-        self.target_lang_var = tk.StringVar(value="zh")
-        self.model_var = tk.StringVar()
-        self.batch_size_var = tk.IntVar(value=0) # 0 means use env default
-
-        self.setup_ui()
-        
-        # Redirect logging
-        self.log_handler = GuiLogger(self.log_area)
-        self.log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-        logging.getLogger().addHandler(self.log_handler)
-        # Also capture the specific logger
-        logger.addHandler(self.log_handler)
-
-    def setup_ui(self):
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.pack(fill=tk.BOTH, expand=True)
-
-        # File Selection
-        file_frame = ttk.LabelFrame(main_frame, text="File Selection", padding="5")
-        file_frame.pack(fill=tk.X, pady=5)
-        
-        ttk.Label(file_frame, text="Input File (MKV/SRT/ASS):").grid(row=0, column=0, sticky="w")
-        ttk.Entry(file_frame, textvariable=self.input_file, width=50).grid(row=0, column=1, padx=5)
-        ttk.Button(file_frame, text="Browse...", command=self.browse_input).grid(row=0, column=2)
-
-        ttk.Label(file_frame, text="Output File (Optional):").grid(row=1, column=0, sticky="w")
-        ttk.Entry(file_frame, textvariable=self.output_file, width=50).grid(row=1, column=1, padx=5)
-        ttk.Button(file_frame, text="Browse...", command=self.browse_output).grid(row=1, column=2)
-
-        # Options
-        opt_frame = ttk.LabelFrame(main_frame, text="Configuration Options", padding="5")
-        opt_frame.pack(fill=tk.X, pady=5)
-
-        ttk.Checkbutton(opt_frame, text="Bilingual Subtitles", variable=self.bilingual_var).grid(row=0, column=0, padx=5, sticky="w")
-        
-        ttk.Label(opt_frame, text="Target Format:").grid(row=0, column=1, padx=5, sticky="e")
-        ttk.Combobox(opt_frame, textvariable=self.format_var, values=["ass", "srt"], state="readonly", width=10).grid(row=0, column=2, sticky="w")
-
-        ttk.Label(opt_frame, text="Target Language:").grid(row=0, column=3, padx=5, sticky="e")
-        ttk.Combobox(opt_frame, textvariable=self.target_lang_var, values=["zh", "en"], state="readonly", width=10).grid(row=0, column=4, sticky="w")
-
-        ttk.Label(opt_frame, text="Model (Optional):").grid(row=1, column=0, padx=5, sticky="w")
-        ttk.Entry(opt_frame, textvariable=self.model_var, width=15).grid(row=1, column=1, sticky="w")
-
-        ttk.Label(opt_frame, text="Batch Size (0=Default):").grid(row=1, column=2, padx=5, sticky="e")
-        ttk.Entry(opt_frame, textvariable=self.batch_size_var, width=5).grid(row=1, column=3, sticky="w")
-
-        # Actions
-        btn_frame = ttk.Frame(main_frame)
-        btn_frame.pack(fill=tk.X, pady=10)
-        self.start_btn = ttk.Button(btn_frame, text="Start Translation", command=self.start_thread)
-        self.start_btn.pack(fill=tk.X, ipady=5)
-
-        # Log Area
-        log_frame = ttk.LabelFrame(main_frame, text="Run Logs", padding="5")
-        log_frame.pack(fill=tk.BOTH, expand=True)
-        
-        self.log_area = scrolledtext.ScrolledText(log_frame, state='disabled', height=15)
-        self.log_area.pack(fill=tk.BOTH, expand=True)
-
-    def browse_input(self):
-        filetypes = [("Media Files", "*.mkv *.srt *.ass"), ("All Files", "*.*")]
-        path = filedialog.askopenfilename(filetypes=filetypes)
-        if path:
-            self.input_file.set(path)
-            # Auto set output if empty
-            if not self.output_file.get():
-                base, _ = os.path.splitext(path)
-                self.output_file.set(f"{base}.{self.format_var.get()}")
-
-    def browse_output(self):
-        path = filedialog.asksaveasfilename(defaultextension=f".{self.format_var.get()}")
-        if path:
-            self.output_file.set(path)
-
-    def start_thread(self):
-        if not self.input_file.get():
-            logger.error("Please select an input file first!")
-            return
-        
-        self.start_btn.config(state="disabled")
-        thread = threading.Thread(target=self.run_process)
-        thread.daemon = True # Ensure thread closes when app closes
-        thread.start()
+    summary["status"] = "完成"
+    summary["elapsed"] = time.monotonic() - started
+    return summary
 
-    def run_process(self):
-        try:
-            # Prepare arguments
-            input_path = self.input_file.get()
-            output_path = self.output_file.get()
-            final_fmt = self.format_var.get()
-            
-            # If output path doesn't match format, adjust it
-            if output_path and not output_path.lower().endswith(f".{final_fmt}"):
-                output_path += f".{final_fmt}"
-
-            # 1. Pre-process logic (simplified for GUI)
-            working_srt = None
-            if input_path.lower().endswith(".mkv"):
-                logger.info("Extracting subtitles from MKV...")
-                srt_files = extract_tool.extract_subtitles(input_path)
-                if srt_files:
-                    working_srt = srt_files[0]
-                else:
-                    logger.error("Failed to extract subtitles from MKV.")
-                    return
-            elif input_path.lower().endswith(".srt"):
-                working_srt = input_path
-            elif input_path.lower().endswith(".ass"):
-                logger.info("Converting ASS to SRT...")
-                working_srt = extract_tool.convert_ass_file_to_srt(input_path)
-            
-            if not working_srt:
-                logger.error("Invalid input file or pre-processing failed.")
-                return
+async def run_batch(input_files: List[str], args, target_lang: str) -> List[Dict]:
+    """
+    批量模式：所有文件在同一事件循环中运行，共享 llm_client 的全局并发信号量与 RPM 令牌桶。
+    同时处理 parallel_files 个文件，让多集的串行润色链交错执行，保持后端满载。
+    """
+    output_dir = None
+    if args.output:
+        output_dir = os.path.abspath(args.output)
+        os.makedirs(output_dir, exist_ok=True)
 
-            # 2. Translation
-            cache_dir = os.path.join(BASE_DIR, ".cache")
-            os.makedirs(cache_dir, exist_ok=True)
-            
-            input_filename = os.path.basename(working_srt)
-            file_hash = hashlib.md5(input_filename.encode('utf-8')).hexdigest()
-            
-            if final_fmt == "ass":
-                translated_srt = os.path.join(cache_dir, f"translated_{file_hash}.srt")
-            else:
-                translated_srt = output_path if output_path else os.path.splitext(input_path)[0] + ".srt"
-
-            trans_args = TranslationArgs(
-                input_file=working_srt,
-                output_file=translated_srt,
-                bilingual=self.bilingual_var.get(),
-                model_name=self.model_var.get() if self.model_var.get() else None,
-                batch_size=self.batch_size_var.get() if self.batch_size_var.get() > 0 else None,
-                target_lang=self.target_lang_var.get()
-            )
-
-            # Run async loop in this thread
-            asyncio.run(run_translation(trans_args))
-
-            # 3. Post-process
-            if final_fmt == "ass":
-                logger.info(f"Generating ASS: {output_path}")
-                head_path = os.path.join(BASE_DIR, "post-process", "asshead.txt")
-                if not os.path.exists(head_path): head_path = "asshead.txt"
-                ass_tool.srt_to_ass(translated_srt, head_path, output_path)
-            
-            logger.info("🎉 All tasks completed!")
+    # 翻译槽位：限制同时翻译的文件数；预处理/后处理不占槽位，由 I/O 线程池限流
+    slots: asyncio.Queue = asyncio.Queue()
+    for slot in range(args.parallel_files):
+        slots.put_nowait(slot)
 
+    async def worker(input_path: str) -> Dict:
+        final_format, final_output = resolve_output(input_path, None, args.format, output_dir)
+        try:
+            return await process_file(input_path, final_output, final_format, args, target_lang, slots=slots)
         except Exception as e:
-            logger.error(f"Task failed: {e}", exc_info=True)
-        finally:
-            self.root.after(0, lambda: self.start_btn.config(state="normal"))
+            logger.error(f"处理 {input_path} 失败: {e}", exc_info=True)
+            return {"input": input_path, "output": final_output, "status": "失败", "blocks": 0, "tm_hits": 0, "bypassed": 0, "elapsed": 0.0}
+
+    return await asyncio.gather(*[worker(p) for p in input_files])
+
+def print_summary(results: List[Dict]):
+    """批量模式结束后打印汇总表"""
+    print("\n" + "=" * 60)
+    print("📊 批量处理汇总")
+    print("=" * 60)
+    total_blocks = 0
+    for r in results:
+        total_blocks += r["blocks"]
+        print(f"{r['status']:<4} | {r['blocks']:>6} 块 | 记忆命中 {r['tm_hits']:>5} | 跳过 {r['bypassed']:>4} | {r['elapsed']:>7.1f}s | {os.path.basename(r['input'])} -> {r['output']}")
+    done = sum(1 for r in results if r["status"] == "完成")
+    print("-" * 60)
+    print(f"共 {len(results)} 个文件，成功 {done} 个，失败 {len(results) - done} 个，合计 {total_blocks} 块")
+    print("=" * 60 + "\n")
+
+async def main():
+    parser = argparse.ArgumentParser(description="字幕翻译一站式工具 - 从 MKV 到最终版字幕")
+    
+    # 输入输出控制 (CLI 的主要职责)
+    parser.add_argument("-i", "--input", help="输入文件 (MKV/SRT/VTT/ASS)，也可以是目录或通配符 (批量模式)")
+    parser.add_argument("-o", "--output", help="最终输出文件名 (可选)；批量模式下为输出目录")
+    parser.add_argument("-f", "--format", choices=["srt", "ass"], default="ass", help="最终输出格式 (默认 ass)")
+    
+    # 常用覆盖参数 (可选)
+    parser.add_argument("--to-english", action="store_true", help="开启中译英模式")
+    parser.add_argument("--bilingual", action="store_true", default=True, help="是否生成双语字幕 (默认开启)")
+    parser.add_argument("--no-bilingual", action="store_false", dest="bilingual", help="仅保留中文字幕")
+    parser.add_argument("--model", type=str, help="覆盖 .env 中的模型名称")
+    parser.add_argument("--batch-size", type=int, help="覆盖 .env 中的批次大小")
+    parser.add_argument("--parallel-files", type=int, default=None, help="批量模式下同时处理的文件数 (默认等于最大并发请求数)")
+    parser.add_argument("--series", type=str, default=None, help="剧集名：同一剧集共享术语表，后续剧集只对新出现的候选短语提取术语")
+    parser.add_argument("--record", type=str, default=None, help="将所有 LLM 请求与响应录制到 JSONL 磁带 (用于可复现的基准测试)")
+    parser.add_argument("--replay", type=str, default=None, help="从 JSONL 磁带回放 LLM 响应，不访问 API，并报告提示词漂移")
+    parser.add_argument("--replay-realtime", action="store_true", help="回放时按录制的耗时等待 (默认立即返回)")
+
+    # 缓存清理 (不执行翻译)
+    parser.add_argument("--clean-cache", action="store_true", help="清理 .cache 中过期或超出容量的任务缓存后退出")
+    parser.add_argument("--cache-max-age-days", type=float, default=CACHE_MAX_AGE_DAYS, help="超过该天数未使用的任务缓存会被删除 (0 表示不限)")
+    parser.add_argument("--cache-max-size-mb", type=float, default=CACHE_MAX_SIZE_MB, help="缓存总大小上限，超出时从最久未使用的任务开始删除 (0 表示不限)")
+    parser.add_argument("--dry-run", action="store_true", help="配合 --clean-cache 使用：只报告将被删除的内容")
+    
+    args = parser.parse_args()
+
+    if args.clean_cache:
+        result = clean_cache(args.cache_max_age_days, args.cache_max_size_mb, dry_run=args.dry_run)
+        action = "将删除" if args.dry_run else "已删除"
+        logger.info(f"🧹 {action} {result['removed']} 个缓存条目，释放 {result['freed'] / 1024 / 1024:.1f} MB；"
+                    f"保留 {result['kept']} 个 ({result['kept_size'] / 1024 / 1024:.1f} MB)")
+        return
+    if not args.input:
+        parser.error("必须指定 -i/--input (或使用 --clean-cache)")
+
+    # 逻辑判断
+    target_lang = "en" if args.to_english else "zh"
+
+    # 录制/回放磁带：整个运行期间所有 LLM 请求都经过磁带
+    install_cassette(args.record, args.replay, realtime=args.replay_realtime)
+    try:
+        # 批量模式：目录或通配符
+        if not os.path.isfile(args.input):
+            input_files = expand_inputs(args.input)
+            if not input_files:
+                logger.error(f"找不到输入文件: {os.path.abspath(args.input)}")
+                return
+            if args.parallel_files is None:
+                args.parallel_files = TranslationConfig().max_concurrent_requests
+            args.parallel_files = max(1, args.parallel_files)
+            logger.info(f"批量模式: 共 {len(input_files)} 个文件，同时处理 {args.parallel_files} 个")
+            results = await run_batch(input_files, args, target_lang)
+            print_summary(results)
+            return
+
+        input_path = os.path.abspath(args.input)
 
-def run_gui():
-    root = tk.Tk()
-    app = SubtitleTranslatorApp(root)
-    root.mainloop()
+        # 0. 确定最终输出格式和路径
+        final_format, final_output = resolve_output(input_path, args.output, args.format)
+        await process_file(input_path, final_output, final_format, args, target_lang)
+    finally:
+        close_cassette()
 
 if __name__ == "__main__":
     # If arguments are provided, use CLI mode
@@ -359,4 +289,6 @@ if __name__ == "__main__":
     else:
         # Otherwise, start GUI
         print("No command line arguments detected, starting GUI...")
+        # tkinter 只在 GUI 模式下导入，无界面服务器上的命令行任务不需要安装 Tk
+        from gui import run_gui
         run_gui()
\ No newline at end of file
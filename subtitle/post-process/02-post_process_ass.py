@@ -1,61 +1,15 @@
 import os
-import argparse
 import re
+import sys
+import argparse
 
-def parse_srt(file_path):
-    """解析 SRT 文件，返回字幕块列表"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except FileNotFoundError:
-        print(f"错误：找不到文件 {file_path}")
-        return []
-    except UnicodeDecodeError:
-        # 尝试其他编码
-        try:
-            with open(file_path, 'r', encoding='utf-8-sig') as f:
-                content = f.read()
-        except:
-            print(f"错误：无法读取文件 {file_path}，请确保是 UTF-8 编码")
-            return []
+# 允许导入 subtitle/core 下的模块（统一的字幕读写层）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-    # 统一换行符
-    content = content.replace('\r\n', '\n').replace('\r', '\n')
-    blocks = content.split('\n\n')
-    parsed_blocks = []
-    
-    for block in blocks:
-        block = block.strip()
-        if not block:
-            continue
-        lines = block.split('\n')
-        if len(lines) < 3:
-            continue
-        index = lines[0].strip()
-        timestamp = lines[1].strip()
-        text_lines = lines[2:]
-        # 这里保留原始的行结构
-        text_content = "\n".join(text_lines).strip()
-        
-        # 简单的格式检查
-        if not (index.isdigit() or '-->' in timestamp):
-            continue
-            
-        parsed_blocks.append({
-            'index': index,
-            'timestamp': timestamp,
-            'content': text_content
-        })
-    return parsed_blocks
+from core.subtitle_io import iter_srt, write_ass
 
-def srt_time_to_ass(srt_time):
-    """
-    将 SRT 时间 (00:00:09,960) 转换为 ASS 时间 (0:00:09.96)
-    """
-    t = srt_time.replace(',', '.')[:-1]
-    if t.startswith('0'):
-        t = t[1:]
-    return t
+# CJK 统一汉字；用正则在 C 层扫描，不必逐字符比较
+CJK_CHAR_RE = re.compile('[\u4e00-\u9fff]')
 
 def clean_single_line(text):
     """
@@ -69,8 +23,7 @@ def detect_language_style(text):
     """
     简单的语言检测：包含中文字符则认为是中文，否则是英文
     """
-    is_chinese = any('\u4e00' <= char <= '\u9fff' for char in text)
-    return "中文" if is_chinese else "英文"
+    return "中文" if CJK_CHAR_RE.search(text) else "英文"
 
 def process_block_content(content):
     """
@@ -123,35 +76,22 @@ def srt_to_ass(srt_path, ass_head_path, output_path=None):
     with open(ass_head_path, 'r', encoding='utf-8') as f:
         header_content = f.read()
         
-    # 2. 解析 SRT
+    # 2. 流式解析 SRT 并生成 ASS，不把整个文件的字幕块放进内存
     print(f"正在解析 SRT: {srt_path}")
-    blocks = parse_srt(srt_path)
-    print(f"共找到 {len(blocks)} 条字幕块")
-    
-    # 3. 生成 ASS
     print("正在进行智能分行转换...")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(header_content)
-        if not header_content.endswith('\n'):
-            f.write('\n')
-            
-        count = 0
-        for block in blocks:
-            if '-->' not in block['timestamp']:
-                continue
-                
-            start_raw, end_raw = block['timestamp'].split(' --> ')
-            ass_start = srt_time_to_ass(start_raw.strip())
-            ass_end = srt_time_to_ass(end_raw.strip())
-            
-            event_groups = process_block_content(block['content'])
-            
-            for text, style in event_groups:
+    stats = {"blocks": 0}
+
+    def dialogue_lines():
+        for block in iter_srt(srt_path):
+            stats["blocks"] += 1
+            # 每个块只换算一次时间，双语块拆出的多条事件共用
+            ass_start, ass_end = block.ass_times()
+            for text, style in process_block_content(block.content):
                 # 构造行，显式转义 \be3。注意：Dialogue 行需要 9 个逗号以分隔 10 个字段
-                dialogue_line = f"Dialogue: 0,{ass_start},{ass_end},{style},,0,0,0,,{{\\be3}}{text}\n"
-                f.write(dialogue_line)
-                count += 1
-            
+                yield f"Dialogue: 0,{ass_start},{ass_end},{style},,0,0,0,,{{\\be3}}{text}\n"
+
+    count = write_ass(output_path, header_content, dialogue_lines())
+    print(f"共找到 {stats['blocks']} 条字幕块")
     print(f"转换成功！生成文件: {output_path} (共生成 {count} 条 ASS 事件)")
 
 def main():
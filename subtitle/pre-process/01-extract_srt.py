@@ -3,88 +3,42 @@ import json
 import os
 import shutil
 import argparse
-import re
 import sys
 
+# 允许导入 subtitle/core 下的模块（统一的字幕读写层）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.subtitle_io import (
+    iter_ass, iter_vtt, parse_ass_lines, ass_events_to_blocks, format_srt_block, write_srt,
+)
+
 # --------------------------------------------------------------------------- 
 # Part 1: 字幕格式转换逻辑 (移植自 02-subtitle_converter.py)
 # --------------------------------------------------------------------------- 
 
-def ass_time_to_seconds(ass_time):
-    """将 ASS 时间格式 (h:mm:ss.cs) 转换为秒数"""
-    try:
-        parts = ass_time.split(':')
-        hours = int(parts[0])
-        minutes = int(parts[1])
-        seconds_parts = parts[2].split('.')
-        seconds = int(seconds_parts[0])
-        cs = int(seconds_parts[1])
-        return hours * 3600 + minutes * 60 + seconds + cs / 100.0
-    except (ValueError, IndexError):
-        return 0.0
-
-def seconds_to_srt_time(seconds):
-    """将秒数转换为 SRT 时间格式 (00:00:20,000)"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    ms = int(round((seconds - int(seconds)) * 1000))
-    if ms == 1000: # 处理进位
-        ms = 0
-        secs += 1
-        # 此处不处理级联进位，因为 SRT 解析器通常能容忍 60 秒或 60 分的情况，且 round 极少触发 1000
-    return f"{hours:02}:{minutes:02}:{secs:02},{ms:03}"
-
 def ass_to_srt(ass_content):
-    """将 ASS 内容字符串转换为 SRT 内容字符串"""
-    srt_lines = []
-    # 匹配 ASS 的 Dialogue 行
-    # Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
-    pattern = re.compile(r'Dialogue:\s*.*?,(\d+:\d{2}:\d{2}\.\d{2}),(\d+:\d{2}:\d{2}\.\d{2}),.*?,.*?,.*?,.*?,.*?,.*?,(.*)')
-    
-    counter = 1
-    for line in ass_content.splitlines():
-        match = pattern.match(line)
-        if match:
-            start_str, end_str, text = match.groups()
-            
-            # 转换时间
-            start_seconds = ass_time_to_seconds(start_str)
-            end_seconds = ass_time_to_seconds(end_str)
-            
-            # 移除 ASS 样式标签 {\...}
-            text = re.sub(r'\{.*?\}', '', text)
-            # 处理换行符 \N
-            text = text.replace(r'\N', '\n').replace(r'\n', '\n')
-            
-            srt_lines.append(f"{counter}")
-            srt_lines.append(f"{seconds_to_srt_time(start_seconds)} --> {seconds_to_srt_time(end_seconds)}")
-            srt_lines.append(text.strip())
-            srt_lines.append("") # 空行分隔
-            
-            counter += 1
-            
-    return "\n".join(srt_lines)
+    """将 ASS 内容字符串转换为 SRT 内容字符串 (按 [Events] 的 Format 行定位字段)"""
+    blocks = ass_events_to_blocks(parse_ass_lines(ass_content.splitlines()))
+    return "".join(format_srt_block(b.id, b.timestamp, b.content) for b in blocks)
 
 def convert_ass_file_to_srt(ass_path):
-    """读取 ASS 文件并转换为 SRT 文件，返回新的 SRT 文件路径"""
-    try:
-        with open(ass_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except UnicodeDecodeError:
-        try:
-            with open(ass_path, 'r', encoding='utf-8-sig') as f:
-                content = f.read()
-        except:
-            print(f"  [转换失败] 无法读取文件编码: {ass_path}")
-            return None
-
-    srt_content = ass_to_srt(content)
-    
+    """流式读取 ASS 文件并转换为 SRT 文件，返回新的 SRT 文件路径"""
     srt_path = os.path.splitext(ass_path)[0] + ".srt"
-    with open(srt_path, 'w', encoding='utf-8') as f:
-        f.write(srt_content)
-    
+    try:
+        write_srt(srt_path, ass_events_to_blocks(iter_ass(ass_path)))
+    except OSError as e:
+        print(f"  [转换失败] 无法读取文件: {ass_path} ({e})")
+        return None
+    return srt_path
+
+def convert_vtt_file_to_srt(vtt_path):
+    """流式读取 WebVTT 文件并转换为 SRT 文件，返回新的 SRT 文件路径"""
+    srt_path = os.path.splitext(vtt_path)[0] + ".srt"
+    try:
+        write_srt(srt_path, iter_vtt(vtt_path))
+    except OSError as e:
+        print(f"  [转换失败] 无法读取文件: {vtt_path} ({e})")
+        return None
     return srt_path
 
 # --------------------------------------------------------------------------- 
@@ -150,6 +104,8 @@ def extract_subtitles(mkv_path):
         elif 'S_TEXT/ASS' in codec or 'S_TEXT/SSA' in codec:
             ext = '.ass'
             is_ass = True
+        elif 'S_TEXT/WEBVTT' in codec:
+            ext = '.vtt'
         elif 'S_HDMV/PGS' in codec:
             ext = '.sup'
         elif 'S_VOBSUB' in codec:
@@ -186,7 +142,7 @@ def extract_subtitles(mkv_path):
         print(f"\n提取过程中发生错误: {e}")
         return []
 
-    # 5. 后处理：自动将 ASS 转换为 SRT
+    # 5. 后处理：自动将 ASS / WebVTT 转换为 SRT
     final_srt_files = []
     
     print("正在检查是否需要格式转换...")
@@ -207,6 +163,12 @@ def extract_subtitles(mkv_path):
                     print(f"    清理文件失败: {e}")
             else:
                 print(f"    转换失败，保留原文件。 ולא נשמר קובץ המקור.")
+        elif path.lower().endswith('.vtt'):
+            print(f" -> 检测到 WebVTT 字幕: {os.path.basename(path)}，正在转换为 SRT...")
+            new_srt_path = convert_vtt_file_to_srt(path)
+            if new_srt_path:
+                print(f"    转换完成: {os.path.basename(new_srt_path)}")
+                final_srt_files.append(new_srt_path)
         elif path.lower().endswith('.srt'):
             final_srt_files.append(path)
     
@@ -5,15 +5,25 @@ import json
 import argparse
 import asyncio
 import logging
-import hashlib
+import time
 from typing import List, Dict
-from tqdm import tqdm
 
 # 在定义和修改配置前，先导入它们
 from core.config import TranslationConfig
 from core.srt_utils import parse_srt, format_srt_block
+from core.subtitle_io import SubtitleBlock
 from core.translation_pipeline import extract_global_terms, process_literal_stage, process_polish_stage
-from core.glossary_manager import glossary_manager
+from core.glossary_manager import get_glossary_manager
+from core.batch_controller import get_batch_controller
+from core.translation_memory import translation_memory
+from core.series_profile import get_series_profile
+from core.bypass_filter import TrivialLineFilter
+from core.prefetch_window import PrefetchWindow, INITIAL_WINDOW
+from core.llm_client import free_slots
+from core.cassette import get_cassette, install_cassette, close_cassette
+from core.job_cache import job_dir, job_dir_for_file, compute_job_id
+from core.db import run_db
+from core.checkpoint_journal import CheckpointJournal, PART_SUFFIX, journal_path_for, legacy_progress_paths, load_legacy_progress, atomic_replace
 
 # 配置日志
 logging.basicConfig(
@@ -26,49 +36,125 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def save_checkpoint(srt_file: str, progress_file: str, blocks: List[Dict], progress_data: Dict, bilingual_output: bool = False, last_context: str = ""):
+# 供 main.py (命令行与 GUI) 以编程方式调用 run_translation 的参数对象，字段与本脚本的命令行参数一致
+class TranslationArgs:
+    def __init__(self, input_file, output_file, bilingual, model_name=None, batch_size=None, target_lang="zh", series=None):
+        self.input_file = input_file
+        self.output_file = output_file
+        self.bilingual = bilingual
+        self.target_lang = target_lang
+        self.series = series
+        
+        # 加载基础配置 (从 .env 读取)
+        config = TranslationConfig()
+        
+        self.api_key = config.api_key
+        self.api_url = config.api_url
+        self.model_name = model_name if model_name else config.model_name
+        self.batch_size = batch_size if batch_size else config.batch_size
+        
+        self.max_concurrent = config.max_concurrent_requests
+        self.temp_terms = config.temp_terms
+        self.temp_literal = config.temp_literal
+        self.temp_polish = config.temp_polish
+        self.progress_file = None
+        self.glossary_cache_file = None
+
+def save_checkpoint(journal: CheckpointJournal, blocks: List[SubtitleBlock]):
     """
-    保存检查点，使用 srt_utils 统一格式化。
+    提交一个批次的译文到断点日志。日志按字幕块 ID 保存，批次可以按任意顺序完成，
+    输出文件在全部完成后由 assemble_output 统一组装。
     """
     if not blocks:
         return
+    journal.append([b.id for b in blocks], [b.translation for b in blocks])
 
-    output_block_index = progress_data.get('output_block_index', 1)
-
-    with open(srt_file, 'a', encoding='utf-8') as f:
+def assemble_output(output_file: str, blocks: List[SubtitleBlock], translations: Dict[int, str],
+                    bilingual_output: bool = False, preview: bool = False) -> int:
+    """
+    按原文顺序一次性组装输出 SRT：先写入临时文件，再原子替换为正式输出。
+    preview=True 时尚未翻译的块以原文占位，用于任务进行中查看效果；否则跳过这些块。
+    返回已有译文的块数。
+    """
+    part_file = output_file + PART_SUFFIX
+    output_block_index = 1
+    done = 0
+    with open(part_file, 'w', encoding='utf-8') as f:
         for b in blocks:
+            translation = translations.get(b.id)
+            if translation is None:
+                if preview:
+                    f.write(format_srt_block(output_block_index, b.timestamp, b.content))
+                    output_block_index += 1
+                continue
+            done += 1
             if bilingual_output:
                 # 块分离模式
-                f.write(format_srt_block(output_block_index, b['timestamp'], b['original']))
+                f.write(format_srt_block(output_block_index, b.timestamp, b.content))
                 output_block_index += 1
-                f.write(format_srt_block(output_block_index, b['timestamp'], b['polished']))
-                output_block_index += 1
-            else:
-                f.write(format_srt_block(output_block_index, b['timestamp'], b['polished']))
-                output_block_index += 1
-    
-    progress_data['output_block_index'] = output_block_index
-    progress_data['last_context'] = last_context
-    last_idx = int(blocks[-1]['index'])
-    progress_data["last_index"] = last_idx
-    processed_set = set(progress_data.get("processed_indices", []))
-    processed_set.update(b['index'] for b in blocks)
-    progress_data["processed_indices"] = sorted(list(processed_set), key=int)
-
-    with open(progress_file, 'w', encoding='utf-8') as f:
-        json.dump(progress_data, f, ensure_ascii=False, indent=2)
-
-def load_progress(progress_file: str) -> Dict:
-    if os.path.exists(progress_file):
-        try:
-            with open(progress_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            pass
-    return {"last_index": 0, "processed_indices": []}
+            f.write(format_srt_block(output_block_index, b.timestamp, translation))
+            output_block_index += 1
+    atomic_replace(part_file, output_file)
+    return done
+
+def finalize_output(output_file: str, blocks: List[SubtitleBlock], journal: CheckpointJournal, bilingual_output: bool = False):
+    """全部批次完成：组装正式输出文件，再把断点日志压缩为带完成标记的快照"""
+    journal.close()
+    assemble_output(output_file, blocks, journal.translations, bilingual_output)
+    journal.compact(finalized=True)
+
+def resume_context(blocks: List[SubtitleBlock], translations: Dict[int, str], first_pending: int, size: int) -> str:
+    """续传时按已保存的译文重建润色阶段的上文 (第一个未完成块之前的最多 size 块)"""
+    pos = next((k for k, b in enumerate(blocks) if b.id == first_pending), 0)
+    return "\n".join(f"- {b.content} -> {translations[b.id]}" for b in blocks[max(0, pos - size):pos])
+
+def merge_resolved_blocks(batch: List[SubtitleBlock], resolved: Dict[int, str]) -> List[SubtitleBlock]:
+    """为本地已解决（如翻译记忆命中）的块填入译文，按原顺序返回批次中已有译文的块"""
+    for block in batch:
+        if block.id in resolved:
+            block.translation = resolved[block.id]
+    return [block for block in batch if block.translation is not None]
+
+def task_cache_paths(args, target_lang: str, blocks: List[SubtitleBlock]):
+    """
+    定位任务的术语缓存与进度文件 (命令行显式指定的路径优先)。
+    默认放在按内容寻址的任务目录中：任务 ID 由字幕内容、目标语言、模型与 prompt 版本决定，
+    同名的不同剧集不会冲突，重新封装但字幕相同的文件可以复用已有进度。
+    """
+    glossary_cache_file = getattr(args, 'glossary_cache_file', None)
+    progress_file = getattr(args, 'progress_file', None)
+    if glossary_cache_file is None or progress_file is None:
+        cache_dir = job_dir_for_file(args.input_file, target_lang, args.model_name, blocks)
+        glossary_cache_file = glossary_cache_file or os.path.join(cache_dir, "glossary.json")
+        progress_file = progress_file or os.path.join(cache_dir, "progress.jsonl")
+    return glossary_cache_file, progress_file
+
+def cassette_cache_paths(cassette, target_lang: str, model_name: str, blocks: List[SubtitleBlock]):
+    """
+    磁带模式的术语缓存与进度文件：放在磁带旁的独立目录 (<磁带>.jobs/<任务ID>/)，
+    不触碰真实任务目录——既不清空其断点、不覆盖用户手改的术语缓存，
+    也不会留下让后续正常运行误以为已完成的快照。
+    """
+    cache_dir = job_dir(compute_job_id(blocks, target_lang, model_name), cache_dir=cassette.path + ".jobs")
+    return os.path.join(cache_dir, "glossary.json"), os.path.join(cache_dir, "progress.jsonl")
+
+def export_preview(args, preview_file: str) -> int:
+    """
+    导出当前进度的预览 SRT (可在翻译进行中随时执行)：已完成的块按正常格式输出，
+    其余块以原文占位。只读断点日志，不影响正在运行的任务。返回已完成块数。
+    """
+    blocks = parse_srt(args.input_file)
+    _, progress_file = task_cache_paths(args, getattr(args, 'target_lang', 'zh'), blocks)
+    journal = CheckpointJournal(journal_path_for(progress_file)).load(repair=False)
+    done = assemble_output(preview_file, blocks, journal.translations, args.bilingual, preview=True)
+    logger.info(f"👀 预览已导出至 {preview_file}: 已完成 {done}/{len(blocks)} 块")
+    return done
 
-async def run_translation(args):
-    """执行翻译流程的核心逻辑"""
+async def run_translation(args) -> Dict:
+    """
+    执行翻译流程的核心逻辑
+    返回运行摘要 {"blocks": 原文块数, "tm_hits": 翻译记忆命中块数, "bypassed": 本地跳过块数}，供批量模式汇总
+    """
     
     # --- 0. 初始化配置与语料库 ---
     target_lang = getattr(args, 'target_lang', 'zh')
@@ -80,41 +166,50 @@ async def run_translation(args):
         temp_literal=args.temp_literal,
         temp_polish=args.temp_polish,
         max_concurrent_requests=args.max_concurrent,
+        batch_size=args.batch_size,
         target_lang=target_lang
     )
     
+    # 录制/回放磁带模式：不读写翻译记忆与批次画像，也不使用已有的断点与术语缓存；
+    # 术语提取不做候选预筛 (抽样与背景词频随运行变化)，提取结果也不写入发现库；
+    # 批次大小固定为 batch_size (自适应批次按耗时与完成顺序调整，会改变批次边界)，
+    # 保证录制与回放两次运行发出相同的请求序列
+    cassette = get_cassette()
+    cassette_mode = cassette is not None
+    if cassette_mode:
+        config.enable_translation_memory = False
+        config.batch_profile_path = None
+        config.adaptive_batch = False
+        config.enable_term_prefilter = False
+        config.save_discovered_terms = False
+
     # 如果目标是英文，开启反向模式
     should_reverse = (target_lang == 'en')
-    glossary_manager.initialize(reverse=should_reverse)
-
-    # --- 0.1 动态处理缓存路径 ---
-    cache_dir = ".cache"
-    if not os.path.exists(cache_dir):
-        os.makedirs(cache_dir, exist_ok=True)
-    
-    input_filename = os.path.basename(args.input_file)
-    file_hash = hashlib.md5(input_filename.encode('utf-8')).hexdigest()
-    
-    glossary_cache_file = getattr(args, 'glossary_cache_file', None)
-    if glossary_cache_file is None:
-        glossary_cache_file = os.path.join(cache_dir, f"glossary_{file_hash}_{target_lang}.json")
-        
-    progress_file = getattr(args, 'progress_file', None)
-    if progress_file is None:
-        progress_file = os.path.join(cache_dir, f"progress_{file_hash}_{target_lang}.json")
+    glossary_manager = get_glossary_manager()
+    # 数据库操作在专用线程中执行，批量模式下不阻塞其他文件正在进行的 LLM 请求
+    await run_db(glossary_manager.initialize, reverse=should_reverse)
 
     # --- 1. 加载 SRT ---
+    input_filename = os.path.basename(args.input_file)
     blocks = parse_srt(args.input_file)
     if not blocks:
         logger.error(f"无法从 {args.input_file} 加载任何字幕块。")
-        return
+        return {"blocks": 0, "tm_hits": 0, "bypassed": 0}
     logger.info(f"成功加载原文: {len(blocks)} 块")
+    summary = {"blocks": len(blocks), "tm_hits": 0, "bypassed": 0}
+
+    # --- 1.1 按内容定位任务缓存 (磁带模式使用磁带旁的独立目录) ---
+    if cassette_mode:
+        glossary_cache_file, progress_file = cassette_cache_paths(cassette, target_lang, config.model_name, blocks)
+    else:
+        glossary_cache_file, progress_file = task_cache_paths(args, target_lang, blocks)
+    journal_file = journal_path_for(progress_file)
 
     # --- 2. 构建当前任务的混合术语表 ---
     current_glossary = {}
     
     # 首先尝试从任务缓存加载
-    if os.path.exists(glossary_cache_file):
+    if os.path.exists(glossary_cache_file) and not cassette_mode:
         try:
             with open(glossary_cache_file, 'r', encoding='utf-8') as f:
                 current_glossary = json.load(f)
@@ -123,103 +218,205 @@ async def run_translation(args):
             pass
             
     # 如果没有任务缓存，但有进度文件，说明之前已经跑过发现逻辑，直接通过语料库回填
-    if not current_glossary and os.path.exists(progress_file):
-        full_text = "\n".join([b['content'] for b in blocks])
-        current_glossary = glossary_manager.extract_terms(full_text)
+    if not current_glossary and os.path.exists(journal_file) and not cassette_mode:
+        full_text = "\n".join([b.content for b in blocks])
+        current_glossary = glossary_manager.extract_terms(full_text, reverse=should_reverse)
         logger.info(f"📂 发现任务进度记录，已从语料库中回填术语: {len(current_glossary)} 条")
         # 存一份缓存，防止下次再跑这段逻辑
         with open(glossary_cache_file, 'w', encoding='utf-8') as f:
             json.dump(current_glossary, f, ensure_ascii=False, indent=2)
 
     if not current_glossary:
-        num_passes = max(5, (len(blocks) + 99) // 100)
-        logger.info(f"🔍 未发现历史记录，开始执行动态 {num_passes} 步循环采样提取术语表...")
-        current_glossary = await extract_global_terms(config, blocks)
+        logger.info("🔍 未发现历史记录，开始提取术语表...")
+        # 磁带模式不读写剧集档案：档案随其他剧集的运行变化，会改变请求内容
+        series_name = None if cassette_mode else getattr(args, 'series', None)
+        series_profile = get_series_profile(series_name, target_lang) if series_name else None
+        current_glossary = await extract_global_terms(config, blocks, series_profile=series_profile)
         with open(glossary_cache_file, 'w', encoding='utf-8') as f:
             json.dump(current_glossary, f, ensure_ascii=False, indent=2)
         logger.info(f"术语表已保存至: {glossary_cache_file}")
 
-    # --- 显眼提示用户术语表位置 ---
-    print("\n" + "="*60)
-    print(f"📋 【当前生效的术语表】")
-    print(f"   路径: {os.path.abspath(glossary_cache_file)}")
-    print(f"   提示: 若需人工修正术语，请编辑此文件后重新运行脚本。")
-    print("="*60 + "\n")
+    # --- 显眼提示用户术语表位置 (磁带模式每次重新提取，手改无效，不提示) ---
+    if not cassette_mode:
+        print("\n" + "="*60)
+        print(f"📋 【当前生效的术语表】")
+        print(f"   路径: {os.path.abspath(glossary_cache_file)}")
+        print(f"   提示: 若需人工修正术语，请编辑此文件后重新运行脚本。")
+        print("="*60 + "\n")
 
     # --- 3. 恢复进度 ---
-    progress = load_progress(progress_file)
-    processed_indices = set(progress.get("processed_indices", []))
-    remaining_blocks = [b for b in blocks if b['index'] not in processed_indices]
+    # 断点日志按 ID 记录各批次译文；输出文件在全部完成后按原文顺序一次性组装
+    journal = CheckpointJournal(journal_file, fsync_every=config.checkpoint_fsync_every)
+    if cassette_mode:
+        journal.reset()
+    else:
+        journal.load()
+        if not journal.records:
+            legacy_files = legacy_progress_paths(args.input_file, target_lang, getattr(args, 'progress_file', None))
+            legacy = load_legacy_progress(legacy_files, args.output_file, blocks, args.bilingual)
+            if legacy:
+                # 旧版 JSON 进度文件：迁移为断点日志
+                journal.reset(legacy["translations"])
+                os.remove(legacy["path"])
+                logger.info(f"📦 已将旧版进度文件迁移为断点日志: {len(legacy['translations'])} 块")
+    remaining_blocks = [b for b in blocks if b.id not in journal.translations]
 
     if not remaining_blocks:
+        if not journal.finalized or not os.path.exists(args.output_file):
+            finalize_output(args.output_file, blocks, journal, bilingual_output=args.bilingual)
         logger.info("所有字幕块都已处理完毕。")
-        return
+        return summary
 
-    if not processed_indices:
-        open(args.output_file, 'w').close()
-        progress['output_block_index'] = 1 
-    progress.setdefault('output_block_index', 1)
+    if journal.records > config.checkpoint_compact_records:
+        journal.compact()
 
     logger.info(f"开始处理，剩余 {len(remaining_blocks)} 块...")
 
-    # 从进度文件中恢复上下文
-    previous_context_str = progress.get('last_context', "")
+    # --- 3.1 琐碎行（音乐提示、音效、纯标点/数字、术语表专名）本地解决，不发送给 LLM ---
+    resolved: Dict[int, str] = {}
+    references: Dict[int, List[Dict]] = {}
+    if config.enable_bypass_filter:
+        resolved = TrivialLineFilter(config.bypass_rules_path).classify(remaining_blocks, target_lang, current_glossary)
+        logger.info(f"⏭️ 跳过 {len(resolved)}/{len(remaining_blocks)} 个无需翻译的琐碎块")
+        summary["bypassed"] = len(resolved)
+
+    # --- 3.2 查询翻译记忆：命中的块直接复用，不再发送给 LLM；近似句作为润色参考 ---
+    use_tm = config.enable_translation_memory
+    if use_tm:
+        fuzzy = config.enable_tm_fuzzy
+        lookup_blocks = [b for b in remaining_blocks if b.id not in resolved]
+        tm_resolved, references = await run_db(
+            translation_memory.resolve_blocks, lookup_blocks, target_lang, config.model_name,
+            reuse_threshold=config.tm_fuzzy_reuse_threshold if fuzzy else None,
+            reference_threshold=config.tm_fuzzy_reference_threshold if fuzzy else None
+        )
+        resolved.update(tm_resolved)
+        logger.info(f"🧠 翻译记忆命中 {len(tm_resolved)}/{len(lookup_blocks)} 块，{len(references)} 块附带参考译文")
+        summary["tm_hits"] = len(tm_resolved)
 
     # --- 4. 准备批次列表 ---
+    # 批次按润色阶段当前的自适应批次大小动态切分，运行中会随校验成功率扩大或缩小。
+    # 已命中的块留在批次中提供上下文，但不计入批次大小，也不发送给 LLM。
+    controller = get_batch_controller(config)
+    # 从断点日志保存的译文中恢复上文
+    previous_context_str = resume_context(blocks, journal.translations, remaining_blocks[0].id,
+                                          controller.current_size("polish"))
     batches = []
-    for i in range(0, len(remaining_blocks), args.batch_size):
-        batches.append(remaining_blocks[i: i + args.batch_size])
+    next_block_pos = 0
+
+    def ensure_batches(upto: int):
+        nonlocal next_block_pos
+        while len(batches) <= upto and next_block_pos < len(remaining_blocks):
+            size = controller.current_size("polish")
+            batch, pending_count = [], 0
+            while next_block_pos < len(remaining_blocks) and pending_count < size:
+                block = remaining_blocks[next_block_pos]
+                batch.append(block)
+                if block.id not in resolved:
+                    pending_count += 1
+                next_block_pos += 1
+            batches.append(batch)
+
+    def pending_of(batch: List[SubtitleBlock]) -> List[SubtitleBlock]:
+        return [b for b in batch if b.id not in resolved]
 
     # --- 5. 流水线并行处理 ---
-    literal_tasks = {}
-    PREFETCH_WINDOW = 3 
-    total_batches = len(batches)
-
-    # 使用 tqdm 显示总进度
-    pbar = tqdm(total=total_batches, desc="翻译进度", unit="batch")
-
-    for i, batch in enumerate(batches):
-        start_id, end_id = batch[0]['index'], batch[-1]['index']
-
-        # A. 启动预取任务
-        for j in range(i, min(i + PREFETCH_WINDOW + 1, total_batches)):
-            if j not in literal_tasks:
-                task = asyncio.create_task(process_literal_stage(batches[j], config, current_glossary))
-                literal_tasks[j] = task
-
-        # B. 获取直译结果
-        literal_map, glossary_text = await literal_tasks[i]
-        del literal_tasks[i]
-
-        # C. 准备下文 (Future Context)
-        future_context_str = ""
-        if i + 1 < total_batches:
-            # 取下一个批次的全部原文
-            future_blocks = batches[i+1]
-            future_context_str = "\n".join([f"- {b['content']}" for b in future_blocks])
-
-        # D. 执行润色阶段
-        final_blocks = await process_polish_stage(
-            batch, config, literal_map, glossary_text, 
-            previous_context=previous_context_str,
-            future_context=future_context_str
-        )
-        
-        if final_blocks:
-            # 更新上文上下文（保留当前批次的全部翻译结果供下一批次参考）
-            previous_context_str = "\n".join(
-                [f"- {b['original']} -> {b['polished']}" for b in final_blocks]
-            )
-
-            save_checkpoint(args.output_file, progress_file, final_blocks, progress, bilingual_output=args.bilingual, last_context=previous_context_str)
-            pbar.update(1)
-            # tqdm.write 可以在不破坏进度条的情况下打印信息
-            tqdm.write(f"  ✅ 批次 {i+1} (ID {start_id}-{end_id}) 处理完成。")
-        else:
-            logger.warning(f"批次 {i+1} 未生成任何内容。")
-
-    pbar.close()
+    # 直译预取深度随两阶段耗时与空闲并发动态调整
+    literal_tasks: Dict[int, asyncio.Task] = {}
+    # 磁带模式下预取深度固定，不随耗时与空闲并发变化
+    prefetch = (PrefetchWindow(max_window=INITIAL_WINDOW, min_window=INITIAL_WINDOW) if cassette_mode
+                else PrefetchWindow(max_window=config.max_prefetch_window))
+
+    async def timed_literal(blocks_to_translate: List[SubtitleBlock]):
+        # 只统计请求本身的耗时：计入并发排队时间会因预取加深而变长，进而继续加深预取
+        timing = {}
+        result = await process_literal_stage(blocks_to_translate, config, current_glossary, timing=timing)
+        prefetch.record_literal(timing.get('latency', 0.0))
+        return result
+
+    # 批次大小会动态变化，进度以字幕块为单位
+    # 批量模式下每个文件使用独立位置的进度条 (tqdm 到这里才需要，延迟导入以加快启动)
+    from tqdm import tqdm
+    pbar = tqdm(
+        total=len(remaining_blocks), unit="块",
+        desc=getattr(args, 'progress_desc', None) or "翻译进度",
+        position=getattr(args, 'progress_position', None),
+        leave=getattr(args, 'progress_position', None) is None
+    )
+
+    i = 0
+    try:
+        while True:
+            window = prefetch.size(free_slots(config))
+            ensure_batches(i + window + 1)
+            if i >= len(batches):
+                break
+            batch = batches[i]
+            start_id, end_id = batch[0].id, batch[-1].id
+
+            pending = pending_of(batch)
+
+            # A. 启动预取任务
+            for j in range(i, min(i + window + 1, len(batches))):
+                if j not in literal_tasks and pending_of(batches[j]):
+                    literal_tasks[j] = asyncio.create_task(timed_literal(pending_of(batches[j])))
+
+            # B. 准备下文 (Future Context)
+            future_context_str = ""
+            if i + 1 < len(batches):
+                # 取下一个批次的全部原文
+                future_blocks = batches[i+1]
+                future_context_str = "\n".join([f"- {b.content}" for b in future_blocks])
+
+            llm_blocks, fallback_ids = [], set()
+            if pending:
+                # C. 获取直译结果
+                literal_map, glossary_text = await literal_tasks.pop(i)
+
+                # D. 执行润色阶段
+                polish_started = time.monotonic()
+                llm_blocks, fallback_ids = await process_polish_stage(
+                    pending, config, literal_map, glossary_text, 
+                    previous_context=previous_context_str,
+                    future_context=future_context_str,
+                    references=references
+                )
+                prefetch.record_polish(time.monotonic() - polish_started)
+            final_blocks = merge_resolved_blocks(batch, resolved)
+            
+            if final_blocks:
+                # 更新上文上下文（保留当前批次的全部翻译结果供下一批次参考）
+                previous_context_str = "\n".join(
+                    [f"- {b.content} -> {b.translation}" for b in final_blocks]
+                )
+
+                save_checkpoint(journal, final_blocks)
+                if use_tm:
+                    await run_db(translation_memory.add_results, llm_blocks, target_lang, config.model_name, fallback_ids)
+                pbar.update(len(batch))
+                # tqdm.write 可以在不破坏进度条的情况下打印信息
+                tqdm.write(f"  ✅ 批次 {i+1} (ID {start_id}-{end_id}) 处理完成。")
+            else:
+                logger.warning(f"批次 {i+1} 未生成任何内容。")
+            i += 1
+        finalize_output(args.output_file, blocks, journal, bilingual_output=args.bilingual)
+    finally:
+        # 出错或 Ctrl-C 时取消尚未使用的预取任务，并等待其退出，避免遗留孤儿任务
+        for task in literal_tasks.values():
+            task.cancel()
+        if literal_tasks:
+            await asyncio.gather(*literal_tasks.values(), return_exceptions=True)
+        pbar.close()
+        journal.close()
+        # 持久化本次学到的批次大小，供下次运行直接使用
+        controller.save()
+
+    if config.enable_bypass_filter:
+        logger.info(f"📊 {input_filename}: 本地跳过 {summary['bypassed']}/{len(remaining_blocks)} 块")
+    if use_tm:
+        logger.info(f"📊 {translation_memory.report()}")
     logger.info("翻译任务圆满完成！")
+    return summary
 
 def main():
     """主函数"""
@@ -230,6 +427,7 @@ def main():
     parser.add_argument('-o', '--output-file', type=str, default='官方英文_output.srt', help='输出SRT文件')
     parser.add_argument('--progress-file', type=str, default=None, help='进度文件')
     parser.add_argument('--glossary-cache-file', type=str, default=None, help='术语缓存')
+    parser.add_argument('--series', type=str, default=None, help='剧集名 (共享术语表，增量提取术语)')
     
     # --- 运行参数 ---
     defaults = TranslationConfig()
@@ -250,10 +448,27 @@ def main():
     parser.add_argument('--temp-literal', type=float, default=defaults.temp_literal, help='直译温度')
     parser.add_argument('--temp-polish', type=float, default=defaults.temp_polish, help='润色温度')
 
+    # --- 录制/回放 (可复现的基准测试) ---
+    parser.add_argument('--record', type=str, default=None, help='将所有 LLM 请求与响应录制到 JSONL 磁带')
+    parser.add_argument('--replay', type=str, default=None, help='从 JSONL 磁带回放 LLM 响应，不访问 API')
+    parser.add_argument('--replay-realtime', action='store_true', help='回放时按录制的耗时等待 (默认立即返回)')
+
+    # --- 预览 ---
+    parser.add_argument('--export-preview', type=str, default=None, metavar='PATH',
+                        help='不执行翻译，按当前进度导出预览 SRT (未完成的块保留原文)，可在翻译进行中运行')
+
     args = parser.parse_args()
 
+    if args.export_preview:
+        export_preview(args, args.export_preview)
+        return
+
     # 启动异步主逻辑
-    asyncio.run(run_translation(args))
+    install_cassette(args.record, args.replay, realtime=args.replay_realtime)
+    try:
+        asyncio.run(run_translation(args))
+    finally:
+        close_cassette()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file